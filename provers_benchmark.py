@@ -1,21 +1,15 @@
+from __future__ import annotations
+
 import argparse
-import copy
-import csv
 import os
 import sys
 import time
-from collections import Counter
-from enum import Enum
-from itertools import chain
-
-from dataclasses_json import DataClassJsonMixin
-from dataclasses import is_dataclass, asdict
+from typing import Iterable, Callable, Optional, TYPE_CHECKING
 
-from provers_benchmark.config import read_config, TestInput, Translator
-from provers_benchmark.benchmark import run_benchmark, translate
-from provers_benchmark.utils import command_name, find_translator, executable_name
-from provers_benchmark.log import init_log, get_logger
-from provers_benchmark.statistics.stats import Statistics, SATStatus, TestRunStatistics
+if TYPE_CHECKING:
+    from provers_benchmark.config import BenchmarkConfig
+    from provers_benchmark.progress import Progress
+    from provers_benchmark.scheduler import Job, ResultCallback
 
 
 def parse_args():
@@ -25,61 +19,107 @@ def parse_args():
                         version="%(prog)s Pre-alpha 0.1",
                         help="Prints current version")
     parser.add_argument("-f", "--file", default="config.yaml", help="config file")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of tests run concurrently (overrides general.jobs from config)")
+    parser.add_argument("--resume", action="store_true",
+                        help="run only tests that are not in results stream yet (or were invalidated by change of "
+                             "test suite, its version, command, input file or timeout) and merge them with it")
+    parser.add_argument("--regenerate-results", action="store_true",
+                        help="only regenerate aggregate json/csv results from results stream (e.g. after crash)")
+    parser.add_argument("--coordinator", metavar="QUEUE",
+                        help="put tests to queue (SQLite file on storage shared with workers) and collect results "
+                             "of workers from it instead of running tests")
+    parser.add_argument("--worker", metavar="QUEUE",
+                        help="run tests from queue of coordinator, config must be the same as coordinator's")
+    parser.add_argument("--local-workers", type=int, default=0,
+                        help="with --coordinator, start this many workers on this machine")
+    parser.add_argument("--plan", action="store_true",
+                        help="only print the job matrix: files, translations needed and cached, estimated time "
+                             "(with --resume only of tests that are not done yet), no test is run")
 
     return parser.parse_args()
 
 
-def save_stats_to_json(stats: Statistics, path: str):
-    out_file = path + '.json'
-    logger.info(f'writing results to {out_file}')
-    with open(out_file, 'w') as outfile:
-        outfile.write(stats.to_json())
-
-
-def save_stats_to_csv(stats: Statistics, path: str):
-    """Not all statistics are saved to csv"""
-    out_file = path + '.csv'
-    logger.info(f'writing results to {out_file}')
-    with open(out_file, 'w') as csv_file:
-        rows = []
-        for test_run in stats.test_runs:
-            test_run_dict = test_run.to_dict()
-            del test_run_dict['output']['stderr']
-            del test_run_dict['output']['stdout']
-            more_nested_items = True
-            while more_nested_items:
-                more_nested_items = False
-                for key, val in test_run_dict.copy().items():
-                    if isinstance(val, Enum):
-                        test_run_dict[key] = val.value
-                    elif isinstance(val, dict):
-                        more_nested_items = True
-                        for nested_key, item in val.items():
-                            test_run_dict[key + '.' + nested_key] = item
-                        del test_run_dict[key]
-                    elif isinstance(val, DataClassJsonMixin):
-                        more_nested_items = True
-                        for nested_key, item in val.to_dict():
-                            test_run_dict[key + '.' + nested_key] = item
-                        del test_run_dict[key]
-                    elif is_dataclass(val):
-                        more_nested_items = True
-                        for nested_key, item in asdict(val):
-                            test_run_dict[key + '.' + nested_key] = item
-                        del test_run_dict[key]
-
-            rows.append(test_run_dict)
-        all_keys_in_csv = set().union(*[list(row.keys()) for row in rows])
-        csv_writer = csv.DictWriter(csv_file, fieldnames=sorted(all_keys_in_csv))
-        csv_writer.writeheader()
-        for row in rows:
-            csv_writer.writerow(row)
+def run_jobs(config: BenchmarkConfig, jobs: Iterable[Job], on_result: ResultCallback, workers: int,
+             prefetch: bool = True, digest: Optional[Callable[[str], str]] = None, progress: Optional[Progress] = None):
+    """Run jobs on this machine, with prefetch translations of upcoming jobs are started ahead.
+    Modules of harness and feature extraction are imported only if config uses them.
+    Progress gets started jobs and hit rates of caches, finished jobs are passed to it by on_result
+    """
+    from provers_benchmark.cache import TranslationCache
+    from provers_benchmark.pipeline import TranslationPipeline
+    from provers_benchmark.scheduler import Scheduler
+    from provers_benchmark.utils import file_digest
 
-    logger.info(f'Benchmark was running for {time.time() - start:.2f} seconds in total')
+    digest = digest or file_digest
+
+    cache = TranslationCache(
+        config.general.cache_path,
+        max_size=config.general.cache_max_size * 1024 * 1024 if config.general.cache_max_size is not None else None,
+        max_age=config.general.cache_max_age * 24 * 60 * 60 if config.general.cache_max_age is not None else None,
+        digest=digest,
+        failure_ttl=config.general.cache_failure_ttl * 60 * 60 if config.general.cache_failure_ttl is not None
+        else None)
+    if config.general.async_harness:
+        from provers_benchmark.async_runner import AsyncScheduler, run_job_async as run
+    else:
+        from provers_benchmark.benchmark import run_job as run
+    scheduler = AsyncScheduler(workers=workers, cores_per_job=config.general.cores_per_job) \
+        if config.general.async_harness else Scheduler(workers=workers, cores_per_job=config.general.cores_per_job)
+    translations = TranslationPipeline(config, cache, workers=config.general.translation_jobs,
+                                       queue_depth=config.general.translation_queue_depth,
+                                       cpu_affinity=scheduler.cores.spare)
+    features = None
+    if config.general.extract_features:
+        from provers_benchmark.features import FeatureExtractor
+        features = FeatureExtractor(os.path.join(config.general.cache_path, 'features.db'),
+                                    workers=config.general.feature_jobs,
+                                    queue_depth=config.general.translation_queue_depth,
+                                    digest=digest)
+    if progress is not None:
+        progress.workers = scheduler.workers
+        progress.add_cache('translations', lambda: (cache.stats.hits + cache.stats.failures, cache.stats.misses))
+        if features is not None:
+            progress.add_cache('features', lambda: (features.hits, features.misses))
+    if prefetch:
+        jobs = translations.prefetch(jobs)
+        if features is not None:
+            jobs = features.prefetch(jobs)
+    # translations reserved by prefetch are released also when job failed before it asked for them
+    if config.general.async_harness:
+        async def runner(job: Job, cores):
+            try:
+                return await run(job, config, translations=translations, cpu_affinity=cores, features=features)
+            finally:
+                translations.release(job)
+    else:
+        def runner(job: Job, cores):
+            try:
+                return run(job, config, translations=translations, cpu_affinity=cores, features=features)
+            finally:
+                translations.release(job)
+    try:
+        scheduler.run(jobs, runner=runner, on_result=on_result,
+                      on_start=progress.job_started if progress is not None else None)
+    finally:
+        translations.close()
+        cache.close()
+        if features is not None:
+            features.close()
 
 
 if __name__ == '__main__':
     args = parse_args()
+    # imported only after arguments are parsed, so that -h does not wait for them
+    from provers_benchmark.config import read_config
+    from provers_benchmark.discovery import FileManifest
+    from provers_benchmark.log import init_log, get_logger
+    from provers_benchmark.progress import Progress, ProgressReporter, estimate_jobs
+    from provers_benchmark.results import ResultStream, regenerate_results
+    from provers_benchmark.resume import with_keys, completed_job_keys
+    from provers_benchmark.scheduler import iter_jobs
+    from provers_benchmark.statistics.stats import Statistics, SATStatus
+
     init_log()
     logger = get_logger()
 
@@ -93,58 +133,155 @@ if __name__ == '__main__':
 
     inputs = len(config.test_inputs)
     translators = len(config.translators)
-    files = sum(len(test_inputs.files) for test_inputs in config.test_inputs)
     test_suites = len(config.test_suites)
     # test_cases = sum(len(test_suite.test_runs) for test_suite in config.test_suites)
     logger.info(f'Starting with {inputs} inputs, '
                 f'{translators} translators, '
-                f'{files} files, '
                 f'{test_suites} test suites, ')
 
-    start = time.time()
-    stats = Statistics()
-    for test_input in config.test_inputs:
-        test_runs_for_input = []
-        for test_suite in config.test_suites:
-            for file in test_input.files:
-                minimal_statistics, formula_info = test_input.get_file_statistics(file)
-                if test_suite.required_format != test_input.format:
-                    translator = find_translator(from_format=test_input.format, to_format=test_suite.required_format,
-                                                 available_translators=config.translators)
-                    file = translate(translator=translator, input_file=file)
-                    minimal_statistics.translated_with = translator
-                exec_stats, out_stats = run_benchmark(test_suite, input_path=file, timeout=config.general.test_timeout)
-                test_runs_for_input.append(
-                    TestRunStatistics(name=test_suite.name,
-                                      program_name=executable_name(test_suite.command),
-                                      program_version=test_suite.version,
-                                      command=test_suite.command, execution_statistics=exec_stats,
-                                      minimal_input_statistics=minimal_statistics,
-                                      input_formula_statistics=formula_info, output=out_stats
-                                      )
-                )
-        stats_copy = copy.copy(stats)
-        stats_copy.test_runs = test_runs_for_input
-        if config.general.result_each_input_to_separate_file and config.general.result_as_json:
-            save_stats_to_json(stats_copy, f'{config.general.result_path}-{test_input.name}')
-        if config.general.result_each_input_to_separate_file and config.general.result_as_csv:
-            save_stats_to_csv(stats_copy, f'{config.general.result_path}-{test_input.name}')
-        stats.test_runs.extend(test_runs_for_input)
-
-    statuses = [i.output.status for i in stats.test_runs]
-    c = Counter(statuses)
-    unsat = len([i for i in stats.test_runs if i.output.status == SATStatus.UNSATISFIABLE])
-    logger.info(f'{c[SATStatus.SATISFIABLE]} tests were SATisfiable, '
-                f'{c[SATStatus.UNSATISFIABLE]} were UNSATisfiable, '
-                f'{c[SATStatus.TIMEOUT]} ended with timeout, '
-                f'{c[SATStatus.OUT_OF_MEMORY]} went out of memory, '
-                f'{c[SATStatus.ERROR]} ended with error, '
-                f'{c[SATStatus.UNKOWN]} are unknown. ')
-
     if dir := os.path.dirname(config.general.result_path):
         os.makedirs(dir, exist_ok=True)
 
-    if not config.general.result_each_input_to_separate_file and config.general.result_as_json:
-        save_stats_to_json(stats, config.general.result_path)
-    if not config.general.result_each_input_to_separate_file and config.general.result_as_csv:
-        save_stats_to_csv(stats, config.general.result_path)
+    start = time.time()
+    manifest = FileManifest(config.general.input_manifest_path or
+                            os.path.join(config.general.cache_path, 'files.db'))
+    progress = Progress(workers=args.jobs or config.general.jobs)
+    progress.add_cache('input_manifest', lambda: (manifest.hits, manifest.misses))
+
+    def start_reporter(exported: bool = True) -> ProgressReporter:
+        return ProgressReporter(progress, interval=config.general.status_interval,
+                                status_path=config.general.status_path if exported else None,
+                                host=config.general.metrics_host,
+                                port=config.general.metrics_port if exported else None)
+
+    if args.worker:
+        from provers_benchmark.distributed import WorkQueue, run_worker
+
+        queue = WorkQueue(args.worker, lease_time=config.general.lease_time)
+        # status file and metrics port belong to coordinator, workers share its config
+        reporter = start_reporter(exported=False)
+
+        def run_leased(leased: Iterable[Job], on_result: ResultCallback):
+            def on_leased_result(job: Job, test_run):
+                on_result(job, test_run)
+                progress.job_finished(job, test_run)
+
+            run_jobs(config, progress.track(leased), on_leased_result, workers=args.jobs or config.general.jobs,
+                     prefetch=False, digest=manifest.digest, progress=progress)
+
+        try:
+            # jobs are leased one by one, translating ahead would lease jobs other workers could run
+            run_worker(queue, list(iter_jobs(config)), timeout=config.general.test_timeout, run=run_leased,
+                       digest=manifest.digest)
+        finally:
+            reporter.close()
+            queue.close()
+            manifest.close()
+        sys.exit(0)
+
+    # jobs are expanded and keyed lazily, as the scheduler consumes them
+    jobs = with_keys(iter_jobs(config), timeout=config.general.test_timeout, digest=manifest.digest)
+    job_indexes = {}
+    stream_path = f'{config.general.result_path}.jsonl'
+
+    def indexed(jobs: Iterable[Job]) -> Iterable[Job]:
+        for job in jobs:
+            job_indexes[job.key] = job.index
+            yield job
+
+    def regenerate():
+        regenerate_results(stream_path=stream_path,
+                           result_path=config.general.result_path,
+                           each_input_to_separate_file=config.general.result_each_input_to_separate_file,
+                           as_json=config.general.result_as_json, as_csv=config.general.result_as_csv,
+                           as_npz=config.general.result_as_npz,
+                           job_indexes=job_indexes)
+
+    if args.regenerate_results:
+        for _ in indexed(jobs):
+            pass
+        manifest.close()
+        regenerate()
+        sys.exit(0)
+
+    if args.plan:
+        from provers_benchmark.cache import TranslationCache
+        from provers_benchmark.plan import build_plan, format_plan
+        from provers_benchmark.scheduler import CorePool
+
+        # cache is only read, it is not closed so nothing is evicted or saved
+        cache = TranslationCache(config.general.cache_path, digest=manifest.digest,
+                                 failure_ttl=config.general.cache_failure_ttl * 60 * 60
+                                 if config.general.cache_failure_ttl is not None else None)
+        try:
+            workers = CorePool(workers=args.jobs or config.general.jobs, cores_per_job=config.general.cores_per_job).size
+            plan = build_plan(config, jobs, cache, stream_path=stream_path, workers=workers, resume=args.resume)
+        finally:
+            manifest.close()
+        print(format_plan(plan))
+        sys.exit(0)
+
+    jobs_to_run = indexed(jobs)
+    if args.resume:
+        completed = completed_job_keys(stream_path)
+        jobs_to_run = (job for job in jobs_to_run if job.key not in completed)
+        logger.info(f'Resuming: {len(completed)} tests are already done')
+    jobs_to_run = progress.track(jobs_to_run)
+
+    # input files are streamed, so number of jobs is estimated from files recorded in manifest by previous runs
+    done = None
+    if args.resume:
+        from provers_benchmark.plan import previous_times
+        done = {name: len(times) for name, times in previous_times(stream_path)[1].items()}
+    files = sum(manifest.count(test_input.patterns) for test_input in config.test_inputs)
+    progress.expect(estimate_jobs(config, files, done))
+
+    results = ResultStream(config.general.result_path, with_csv=config.general.result_as_csv,
+                           fsync_every=config.general.result_fsync_every, append=args.resume)
+    results.write_header(Statistics())
+
+    def on_result(job, test_run):
+        results.write(job.index, test_run, key=job.key, input_digest=job.input_digest)
+        progress.job_finished(job, test_run)
+
+    reporter = start_reporter()
+    try:
+        if args.coordinator:
+            from provers_benchmark.distributed import WorkQueue, run_coordinator
+
+            queue = WorkQueue(args.coordinator, lease_time=config.general.lease_time)
+            worker_command = [sys.executable, sys.argv[0], '-f', args.file, '--worker', args.coordinator]
+            if args.jobs:
+                worker_command += ['-j', str(args.jobs)]
+            try:
+                run_coordinator(queue, list(jobs_to_run), on_result, resume=args.resume,
+                                local_workers=worker_command, local_worker_count=args.local_workers)
+            finally:
+                queue.close()
+        else:
+            run_jobs(config, jobs_to_run, on_result, workers=args.jobs or config.general.jobs, digest=manifest.digest,
+                     progress=progress)
+    finally:
+        reporter.close()
+        results.close()
+        manifest.close()
+
+    statuses = progress.statuses
+
+    logger.info(f'{statuses[SATStatus.SATISFIABLE]} tests were SATisfiable, '
+                f'{statuses[SATStatus.UNSATISFIABLE]} were UNSATisfiable, '
+                f'{statuses[SATStatus.TIMEOUT]} ended with timeout, '
+                f'{statuses[SATStatus.OUT_OF_MEMORY]} went out of memory, '
+                f'{statuses[SATStatus.ERROR]} ended with error, '
+                f'{statuses[SATStatus.UNKOWN]} are unknown. ')
+
+    regenerate()
+    if config.general.result_database:
+        from provers_benchmark.store import ResultsDatabase
+
+        database = ResultsDatabase(config.general.result_database)
+        try:
+            database.import_file(stream_path)
+        finally:
+            database.close()
+    logger.info(f'Benchmark was running for {time.time() - start:.2f} seconds in total')
@@ -0,0 +1,30 @@
+"""Analysis of benchmark results: PAR-k, cactus data, virtual best solver, speedups and regressions.
+Run as python -m provers_benchmark.analysis (python -m provers_benchmark.analysis.compare to compare two result sets),
+requires numpy
+"""
+from .matrix import ResultMatrix, load_matrix, load_columns, build_matrix
+from .metrics import solved_counts, par_k, median_memory, cactus, virtual_best, VirtualBest, speedups, \
+    group_by_input, group_by_feature
+from .regression import Comparison, PairedTest, compare, suite_pairs, sign_test, wilcoxon_signed_rank
+
+__all__ = [
+    'ResultMatrix',
+    'load_matrix',
+    'load_columns',
+    'build_matrix',
+    'solved_counts',
+    'par_k',
+    'median_memory',
+    'cactus',
+    'virtual_best',
+    'VirtualBest',
+    'speedups',
+    'group_by_input',
+    'group_by_feature',
+    'Comparison',
+    'PairedTest',
+    'compare',
+    'suite_pairs',
+    'sign_test',
+    'wilcoxon_signed_rank',
+]
@@ -0,0 +1,99 @@
+import argparse
+import csv
+import sys
+from typing import Optional, Dict
+
+import numpy
+
+from provers_benchmark.analysis.matrix import ResultMatrix, load_matrix
+from provers_benchmark.analysis.metrics import solved_counts, par_k, median_memory, cactus, virtual_best, speedups, \
+    group_by_input, group_by_feature
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.statistics.stats import SATStatus
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m provers_benchmark.analysis",
+                                     description="Summarize benchmark results: solved instances, PAR-k scores, "
+                                                 "virtual best solver and speedups")
+    parser.add_argument("files", nargs='+', help="result files (.npz, .json or .jsonl results stream)")
+    parser.add_argument("-t", "--timeout", type=float, default=None,
+                        help="timeout used to penalize unsolved instances (default: the longest time of timed out "
+                             "test, or the longest time at all)")
+    parser.add_argument("-k", type=float, default=2, help="penalty factor of PAR-k score (default: 2)")
+    parser.add_argument("--baseline", help="test suite to compute speedups against")
+    parser.add_argument("--by-input", action="store_true", help="also summarize every test input separately")
+    parser.add_argument("--by-feature", metavar="FEATURE",
+                        help="also summarize groups of instances by quantiles of input formula statistic")
+    parser.add_argument("--bins", type=int, default=4, help="number of groups for --by-feature (default: 4)")
+    parser.add_argument("--cactus", metavar="FILE", help="write cactus plot data (suite, solved, time) to csv file")
+    parser.add_argument("--list-features", action="store_true", help="list numeric input formula statistics")
+    return parser.parse_args()
+
+
+def infer_timeout(matrix: ResultMatrix) -> float:
+    timed_out = matrix.time[matrix.status == SATStatus.TIMEOUT.value]
+    times = timed_out if timed_out.size else matrix.time
+    return float(numpy.nanmax(times)) if not numpy.isnan(times).all() else 0.0
+
+
+def summary(matrix: ResultMatrix, timeout: float, k: float, baseline: Optional[str]) -> str:
+    header = ['suite', 'solved', f'PAR-{k:g}', 'median MB', 'fastest', 'unique']
+    vbs = virtual_best(matrix)
+    columns = [matrix.suites, solved_counts(matrix), par_k(matrix, timeout, k), median_memory(matrix) / 2 ** 20,
+               vbs.fastest, vbs.unique]
+    if baseline is not None:
+        speedup, common = speedups(matrix, baseline)
+        header.append(f'speedup vs {baseline}')
+        columns.append([f'{value:.3g} ({count})' if count else '-' for value, count in zip(speedup, common)])
+    rows = [[str(cell) if not isinstance(cell, float) else f'{cell:.3f}' for cell in row] for row in zip(*columns)]
+    rows.append(['virtual best', str(vbs.solved), f'{vbs.par_k(timeout, k):.3f}', '', '', '']
+                + ([''] if baseline is not None else []))
+    rows = [header] + [[cell.replace('nan', '-') for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ['  '.join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width)
+                       in enumerate(zip(row, widths))) for row in rows]
+    return '\n'.join(lines)
+
+
+def print_groups(matrix: ResultMatrix, groups: Dict[str, numpy.ndarray], timeout: float, k: float,
+                 baseline: Optional[str]):
+    for name, mask in groups.items():
+        print(f'\n{name} ({int(mask.sum())} instances)')
+        print(summary(matrix.select(mask), timeout, k, baseline))
+
+
+def save_cactus(matrix: ResultMatrix, path: str):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['suite', 'solved', 'time'])
+        for suite, times in zip(matrix.suites, cactus(matrix)):
+            writer.writerows((suite, solved, time) for solved, time in enumerate(times, start=1))
+
+
+def main():
+    args = parse_args()
+    try:
+        matrix = load_matrix(args.files)
+        if args.list_features:
+            print('\n'.join(sorted(matrix.features)))
+            return
+        if args.by_feature is not None and args.by_feature not in matrix.features:
+            raise BenchmarkException(f'Unknown feature "{args.by_feature}", see --list-features')
+        timeout = args.timeout if args.timeout is not None else infer_timeout(matrix)
+        print(f'{len(matrix.suites)} suites, {len(matrix.instances)} instances, timeout {timeout:g}s')
+        print(summary(matrix, timeout, args.k, args.baseline))
+        if args.by_input:
+            print_groups(matrix, {f'input {name}': mask for name, mask in group_by_input(matrix).items()},
+                         timeout, args.k, args.baseline)
+        if args.by_feature is not None:
+            print_groups(matrix, group_by_feature(matrix, args.by_feature, args.bins), timeout, args.k, args.baseline)
+        if args.cactus is not None:
+            save_cactus(matrix, args.cactus)
+    except BenchmarkException as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
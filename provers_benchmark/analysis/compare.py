@@ -0,0 +1,120 @@
+"""Compare two result sets (or two suites of one result set) and exit with REGRESSION_EXIT_CODE when candidate
+is significantly worse than baseline, so it can gate upgrades of provers
+"""
+import argparse
+import csv
+import sys
+from typing import List
+
+import numpy
+
+from provers_benchmark.analysis.matrix import load_matrix
+from provers_benchmark.analysis.regression import Comparison, compare, suite_pairs
+from provers_benchmark.errors import BenchmarkException
+
+REGRESSION_EXIT_CODE = 3
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m provers_benchmark.analysis.compare",
+                                     description="Pair test runs of baseline and candidate by instance and report "
+                                                 "significant regressions: instances no longer solved, conflicting "
+                                                 "answers, slowdowns and memory increases (Wilcoxon signed-rank test "
+                                                 f"of per instance ratios). Exits with {REGRESSION_EXIT_CODE} "
+                                                 f"if there is any regression")
+    parser.add_argument("baseline", nargs='+', help="baseline result files (.npz, .json or .jsonl results stream)")
+    parser.add_argument("-c", "--candidate", nargs='+', default=None,
+                        help="candidate result files (default: compare suites of baseline files, see --pair)")
+    parser.add_argument("-p", "--pair", action="append", metavar="BASELINE=CANDIDATE",
+                        help="compare these suites (can be repeated, default: suites of the same name)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="significance level (default: 0.05)")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="smallest relative slowdown or memory increase reported as regression (default: 0.05)")
+    parser.add_argument("--min-time", type=float, default=0.1,
+                        help="compare times only on instances where one of suites took at least this many "
+                             "seconds (default: 0.1)")
+    parser.add_argument("--max-lost", type=int, default=None,
+                        help="regression if more instances are no longer solved, regardless of significance")
+    parser.add_argument("--top", type=int, default=5, help="number of the worst instances listed (default: 5)")
+    parser.add_argument("--instances", metavar="FILE", help="write per instance comparison to csv file")
+    return parser.parse_args()
+
+
+def _ratio(value: float, count: int, p_value: float) -> str:
+    return f'x{value:.3f} ({count}, p={p_value:.2g})' if count else '-'
+
+
+def summary(comparisons: List[Comparison], args) -> str:
+    header = ['baseline', 'candidate', 'instances', 'lost', 'gained', 'conflicting', 'time', 'memory', 'verdict']
+    rows = [header]
+    for comparison in comparisons:
+        regressions = comparison.regressions(args.alpha, args.threshold, args.max_lost)
+        rows.append([comparison.baseline, comparison.candidate, str(len(comparison.instances)),
+                     str(int(comparison.lost.sum())), str(int(comparison.gained.sum())),
+                     str(int(comparison.conflicting.sum())),
+                     _ratio(comparison.time.ratio, comparison.time.count, comparison.time.p_value),
+                     _ratio(comparison.memory.ratio, comparison.memory.count, comparison.memory.p_value),
+                     'REGRESSION' if regressions else 'ok'])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return '\n'.join('  '.join(cell.ljust(width) if i < 2 else cell.rjust(width) for i, (cell, width)
+                               in enumerate(zip(row, widths))) for row in rows)
+
+
+def details(comparison: Comparison, args) -> str:
+    lines = [f'\n{comparison.baseline} -> {comparison.candidate}:']
+    lines.extend(f'  {regression}' for regression in comparison.regressions(args.alpha, args.threshold,
+                                                                            args.max_lost))
+    for name, mask in (('conflicting', comparison.conflicting), ('no longer solved', comparison.lost)):
+        for i in numpy.flatnonzero(mask)[:args.top]:
+            lines.append(f'  {name}: {comparison.instances[i]} ({comparison.baseline_status[i]} -> '
+                         f'{comparison.candidate_status[i]})')
+    ratios = comparison.time.ratios
+    slowest = numpy.argsort(numpy.where(numpy.isnan(ratios), -numpy.inf, ratios))[::-1][:args.top]
+    for i in slowest:
+        if not ratios[i] > 1 + args.threshold:
+            break
+        lines.append(f'  slower: {comparison.instances[i]} {comparison.baseline_time[i]:.3f}s -> '
+                     f'{comparison.candidate_time[i]:.3f}s (x{ratios[i]:.2f})')
+    return '\n'.join(lines)
+
+
+def save_instances(comparisons: List[Comparison], path: str):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['baseline', 'candidate', 'input', 'path', 'baseline_status', 'candidate_status',
+                         'baseline_time', 'candidate_time', 'time_ratio', 'memory_ratio'])
+        for comparison in comparisons:
+            writer.writerows((comparison.baseline, comparison.candidate, *row) for row in zip(
+                comparison.inputs, comparison.instances, comparison.baseline_status, comparison.candidate_status,
+                comparison.baseline_time, comparison.candidate_time, comparison.time.ratios,
+                comparison.memory.ratios))
+
+
+def main():
+    args = parse_args()
+    try:
+        baseline = load_matrix(args.baseline)
+        if args.candidate is None:
+            if not args.pair:
+                raise BenchmarkException('Give candidate result files, or pairs of suites to compare with --pair')
+            candidate = baseline
+        else:
+            candidate = load_matrix(args.candidate)
+        comparisons = [compare(baseline, baseline_suite, candidate, candidate_suite, min_time=args.min_time)
+                       for baseline_suite, candidate_suite in suite_pairs(baseline, candidate, args.pair)]
+    except BenchmarkException as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(summary(comparisons, args))
+    regressed = [comparison for comparison in comparisons
+                 if comparison.regressions(args.alpha, args.threshold, args.max_lost)]
+    for comparison in regressed:
+        print(details(comparison, args))
+    if args.instances is not None:
+        save_instances(comparisons, args.instances)
+    if regressed:
+        sys.exit(REGRESSION_EXIT_CODE)
+
+
+if __name__ == '__main__':
+    main()
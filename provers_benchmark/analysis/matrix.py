@@ -0,0 +1,116 @@
+"""Test runs as suite x instance matrices. Instance is a file of test input, so the same file
+in two test inputs (e.g. translated differently) is two instances
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+import numpy
+
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.results import load_npz, read_stream, test_runs_to_arrays, decode_arrays
+from provers_benchmark.statistics.schema import FORMULA_STATISTICS
+from provers_benchmark.statistics.stats import Statistics, SATStatus
+
+SOLVED_STATUSES = (SATStatus.SATISFIABLE.value, SATStatus.UNSATISFIABLE.value)
+
+
+@dataclass
+class ResultMatrix:
+    suites: numpy.ndarray
+    """(S,) test suite names"""
+    instances: numpy.ndarray
+    """(I,) paths of input files"""
+    inputs: numpy.ndarray
+    """(I,) test input name of each instance"""
+    time: numpy.ndarray
+    """(S, I) execution time (median of repeated runs), NaN if suite was not run on instance"""
+    memory: numpy.ndarray
+    """(S, I) peak memory in bytes, NaN if not known"""
+    status: numpy.ndarray
+    """(S, I) status values (see SATStatus), empty string if suite was not run on instance"""
+    features: Dict[str, numpy.ndarray] = field(default_factory=dict)
+    """Numeric input_formula_statistics, feature name -> (I,) values, NaN if not known"""
+
+    @property
+    def solved(self) -> numpy.ndarray:
+        """(S, I) True where suite found an answer"""
+        return numpy.isin(self.status, SOLVED_STATUSES)
+
+    def select(self, instances: numpy.ndarray) -> 'ResultMatrix':
+        """Matrix with only given instances (boolean mask or indexes)"""
+        return ResultMatrix(suites=self.suites, instances=self.instances[instances], inputs=self.inputs[instances],
+                            time=self.time[:, instances], memory=self.memory[:, instances],
+                            status=self.status[:, instances],
+                            features={name: values[instances] for name, values in self.features.items()})
+
+
+def load_columns(path: str) -> Dict[str, numpy.ndarray]:
+    """Load results file as decoded columns. Supported are npz (fastest), json and jsonl results stream
+    (latest test run of every job)
+    """
+    if path.endswith('.npz'):
+        return load_npz(path)
+    if path.endswith('.jsonl'):
+        latest = {}
+        for item in read_stream(path):
+            if isinstance(item, Statistics):
+                continue
+            _, key, test_run, _ = item
+            latest[key or len(latest)] = test_run
+        test_runs = list(latest.values())
+    elif path.endswith('.json'):
+        with open(path) as file:
+            test_runs = Statistics.from_json(file.read()).test_runs
+    else:
+        raise BenchmarkException(f'Unsupported results file {path}, use .npz, .json or .jsonl')
+    return decode_arrays(test_runs_to_arrays(test_runs))
+
+
+def concatenate_columns(tables: Sequence[Dict[str, numpy.ndarray]]) -> Dict[str, numpy.ndarray]:
+    """Join columns of several result files, columns missing in some files are filled with NaN or empty string"""
+    dtypes = {}
+    for table in tables:
+        for name, values in table.items():
+            dtypes.setdefault(name, values.dtype)
+    columns = {}
+    for name, dtype in dtypes.items():
+        parts = []
+        for table in tables:
+            if name in table:
+                parts.append(table[name])
+            else:
+                missing = numpy.nan if dtype.kind == 'f' else ''
+                parts.append(numpy.full(len(table['name']), missing, dtype=dtype if dtype.kind == 'f' else str))
+        columns[name] = numpy.concatenate(parts)
+    return columns
+
+
+def build_matrix(columns: Dict[str, numpy.ndarray]) -> ResultMatrix:
+    """Scatter test runs into matrices, if suite was run on instance more than once, the later run is used"""
+    inputs = columns['minimal_input_statistics.name']
+    paths = columns['minimal_input_statistics.path']
+    suites, suite_index = numpy.unique(columns['name'], return_inverse=True)
+    _, first_run, instance_index = numpy.unique(numpy.char.add(numpy.char.add(inputs, '\n'), paths),
+                                                return_index=True, return_inverse=True)
+    shape = (len(suites), len(first_run))
+
+    def scatter(values: numpy.ndarray, fill) -> numpy.ndarray:
+        matrix = numpy.full(shape, fill, dtype=values.dtype if values.dtype.kind != 'f' else numpy.float64)
+        matrix[suite_index, instance_index] = values
+        return matrix
+
+    time = columns['execution_statistics.execution_time']
+    if 'repetitions.median' in columns:
+        # median of repeated runs is more reliable than time of the last run
+        time = numpy.where(numpy.isnan(columns['repetitions.median']), time, columns['repetitions.median'])
+    prefix = f'{FORMULA_STATISTICS}.'
+    return ResultMatrix(suites=suites, instances=paths[first_run], inputs=inputs[first_run],
+                        time=scatter(time, numpy.nan),
+                        memory=scatter(columns['execution_statistics.peak_memory'], numpy.nan),
+                        status=scatter(columns['output.status'], ''),
+                        features={name[len(prefix):]: values[first_run] for name, values in columns.items()
+                                  if name.startswith(prefix) and values.dtype.kind == 'f'})
+
+
+def load_matrix(paths: List[str]) -> ResultMatrix:
+    return build_matrix(concatenate_columns([load_columns(path) for path in paths]))
@@ -0,0 +1,117 @@
+"""Metrics computed over whole ResultMatrix at once, all per suite results are (S,) arrays"""
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy
+
+from provers_benchmark.analysis.matrix import ResultMatrix
+from provers_benchmark.errors import BenchmarkException
+
+
+def solved_counts(matrix: ResultMatrix) -> numpy.ndarray:
+    return matrix.solved.sum(axis=1)
+
+
+def penalized_times(matrix: ResultMatrix, timeout: float, k: float = 2) -> numpy.ndarray:
+    """(S, I) execution times, k * timeout where instance was not solved (or not run)"""
+    return numpy.where(matrix.solved, matrix.time, k * timeout)
+
+
+def par_k(matrix: ResultMatrix, timeout: float, k: float = 2) -> numpy.ndarray:
+    """Penalized average runtime: unsolved instances count as k * timeout"""
+    if not matrix.instances.size:
+        return numpy.full(len(matrix.suites), numpy.nan)
+    return penalized_times(matrix, timeout, k).mean(axis=1)
+
+
+def median_memory(matrix: ResultMatrix) -> numpy.ndarray:
+    """Median peak memory over solved instances, NaN for suites without solved instances"""
+    memory = numpy.where(matrix.solved, matrix.memory, numpy.nan)
+    medians = numpy.full(len(matrix.suites), numpy.nan)
+    known = ~numpy.isnan(memory).all(axis=1)
+    medians[known] = numpy.nanmedian(memory[known], axis=1)
+    return medians
+
+
+def cactus(matrix: ResultMatrix) -> List[numpy.ndarray]:
+    """For every suite sorted times of solved instances. i-th time is time needed to solve i + 1 instances"""
+    times = numpy.sort(numpy.where(matrix.solved, matrix.time, numpy.inf), axis=1)
+    return [times[suite, :count] for suite, count in enumerate(solved_counts(matrix))]
+
+
+@dataclass
+class VirtualBest:
+    """Virtual best solver - on every instance the fastest suite that solved it"""
+    time: numpy.ndarray
+    """(I,) time of the fastest suite, NaN if no suite solved instance"""
+    suite: numpy.ndarray
+    """(I,) index of the fastest suite, -1 if no suite solved instance"""
+    fastest: numpy.ndarray
+    """(S,) number of instances where suite was the fastest"""
+    unique: numpy.ndarray
+    """(S,) number of instances solved only by suite"""
+
+    @property
+    def solved(self) -> int:
+        return int((self.suite >= 0).sum())
+
+    def par_k(self, timeout: float, k: float = 2) -> float:
+        if not self.time.size:
+            return numpy.nan
+        return float(numpy.where(self.suite >= 0, self.time, k * timeout).mean())
+
+
+def virtual_best(matrix: ResultMatrix) -> VirtualBest:
+    solved = matrix.solved
+    times = numpy.where(solved, matrix.time, numpy.inf)
+    suites = len(matrix.suites)
+    if not matrix.instances.size:
+        empty = numpy.zeros(0)
+        return VirtualBest(time=empty, suite=empty.astype(int), fastest=numpy.zeros(suites, dtype=int),
+                           unique=numpy.zeros(suites, dtype=int))
+    best = times.argmin(axis=0)
+    best_time = times[best, numpy.arange(times.shape[1])]
+    solved_by_any = numpy.isfinite(best_time)
+    best = numpy.where(solved_by_any, best, -1)
+    only_one = solved.sum(axis=0) == 1
+    return VirtualBest(time=numpy.where(solved_by_any, best_time, numpy.nan), suite=best,
+                       fastest=numpy.bincount(best[solved_by_any], minlength=suites),
+                       unique=(solved & only_one).sum(axis=1))
+
+
+def speedups(matrix: ResultMatrix, baseline: str) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Geometric mean of baseline time / suite time over instances solved by both,
+    returns speedups and number of instances they are computed from
+    """
+    if baseline not in matrix.suites:
+        raise BenchmarkException(f'Unknown baseline suite "{baseline}", available: {", ".join(matrix.suites)}')
+    baseline_index = int(numpy.flatnonzero(matrix.suites == baseline)[0])
+    solved = matrix.solved
+    common = solved & solved[baseline_index] & (matrix.time > 0) & (matrix.time[baseline_index] > 0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        log_ratios = numpy.where(common, numpy.log(matrix.time[baseline_index] / matrix.time), 0)
+        counts = common.sum(axis=1)
+        return numpy.exp(log_ratios.sum(axis=1) / counts), counts
+
+
+def group_by_input(matrix: ResultMatrix) -> Dict[str, numpy.ndarray]:
+    """Test input name -> mask of its instances"""
+    return {name: matrix.inputs == name for name in numpy.unique(matrix.inputs)}
+
+
+def group_by_feature(matrix: ResultMatrix, feature: str, bins: int = 4) -> Dict[str, numpy.ndarray]:
+    """Split instances into (at most) bins groups of similar size by quantiles of feature,
+    instances without feature value are left out
+    """
+    values = matrix.features[feature]
+    known = ~numpy.isnan(values)
+    if not known.any():
+        return {}
+    edges = numpy.unique(numpy.quantile(values[known], numpy.linspace(0, 1, bins + 1)))
+    # instance falls to bin i if edges[i] <= value < edges[i + 1], the last bin includes its upper edge
+    bin_index = numpy.clip(numpy.searchsorted(edges, values, side='right') - 1, 0, max(len(edges) - 2, 0))
+    groups = {}
+    for i in range(max(len(edges) - 1, 1)):
+        upper = edges[min(i + 1, len(edges) - 1)]
+        groups[f'{feature} in [{edges[i]:g}, {upper:g}]'] = known & (bin_index == i)
+    return groups
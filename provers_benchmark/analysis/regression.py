@@ -0,0 +1,193 @@
+"""Paired comparison of two test suites (e.g. two versions of a prover) on instances both were run on:
+status changes, per instance time and memory ratios and paired tests telling whether differences are significant
+"""
+import math
+from dataclasses import dataclass, field
+from typing import List, Tuple, Optional
+
+import numpy
+
+from provers_benchmark.analysis.matrix import ResultMatrix, SOLVED_STATUSES
+from provers_benchmark.errors import BenchmarkException
+
+EXACT_WILCOXON_LIMIT = 50
+"""Up to this number of nonzero differences p-value of Wilcoxon test is exact, above it normal approximation is used"""
+
+
+def sign_test(positive: int, negative: int) -> float:
+    """Two-sided p-value of exact sign (binomial) test"""
+    n = positive + negative
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, i) for i in range(min(positive, negative) + 1))
+    return min(1.0, 2 * tail / 2 ** n)
+
+
+def wilcoxon_signed_rank(differences: numpy.ndarray) -> float:
+    """Two-sided p-value of Wilcoxon signed-rank test that differences are symmetric around zero.
+    Zero differences are dropped, tied absolute differences get their average rank
+    """
+    differences = differences[differences != 0]
+    n = len(differences)
+    if n == 0:
+        return 1.0
+    absolute = numpy.abs(differences)
+    order = numpy.argsort(absolute, kind='mergesort')
+    _, first, counts = numpy.unique(absolute[order], return_index=True, return_counts=True)
+    # doubled average ranks are integers even with ties
+    doubled_ranks = numpy.empty(n, dtype=numpy.int64)
+    doubled_ranks[order] = numpy.repeat(2 * first + counts + 1, counts)
+    statistic = int(doubled_ranks[differences > 0].sum())
+    if n <= EXACT_WILCOXON_LIMIT:
+        # distribution of sum of doubled ranks with random signs
+        distribution = numpy.zeros(int(doubled_ranks.sum()) + 1)
+        distribution[0] = 1
+        for rank in doubled_ranks:
+            distribution[rank:] = distribution[rank:] + distribution[:-rank]
+        distribution /= distribution.sum()
+        lower = distribution[:statistic + 1].sum()
+        upper = distribution[statistic:].sum()
+        return float(min(1.0, 2 * min(lower, upper)))
+    # moments of the doubled statistic, i.e. 2x mean and 4x variance of the usual one
+    mean = doubled_ranks.sum() / 2
+    variance = n * (n + 1) * (2 * n + 1) / 6 - (counts ** 3 - counts).sum() / 12
+    if variance <= 0:
+        return 1.0
+    # continuity correction of 1/2 (1 for the doubled statistic)
+    z = max(abs(statistic - mean) - 1, 0) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
+
+
+@dataclass
+class PairedTest:
+    """Candidate / baseline ratios of one metric on instances where both values are known"""
+    metric: str
+    ratios: numpy.ndarray
+    """(I,) candidate / baseline, NaN where instance is not compared"""
+    count: int = 0
+    ratio: float = math.nan
+    """Geometric mean of ratios, above 1 means that candidate is slower (uses more memory)"""
+    worse: int = 0
+    """Number of instances where candidate is worse"""
+    better: int = 0
+    p_value: float = 1.0
+    """Wilcoxon signed-rank test of log ratios"""
+
+    def is_regression(self, alpha: float, threshold: float) -> bool:
+        return self.p_value < alpha and self.ratio > 1 + threshold
+
+
+def paired_test(metric: str, baseline: numpy.ndarray, candidate: numpy.ndarray, mask: numpy.ndarray) -> PairedTest:
+    mask = mask & (baseline > 0) & (candidate > 0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratios = numpy.where(mask, candidate / baseline, numpy.nan)
+    test = PairedTest(metric=metric, ratios=ratios, count=int(mask.sum()))
+    if test.count:
+        log_ratios = numpy.log(ratios[mask])
+        test.ratio = float(numpy.exp(log_ratios.mean()))
+        test.worse = int((log_ratios > 0).sum())
+        test.better = int((log_ratios < 0).sum())
+        test.p_value = wilcoxon_signed_rank(log_ratios)
+    return test
+
+
+@dataclass
+class Comparison:
+    baseline: str
+    candidate: str
+    instances: numpy.ndarray
+    """(I,) paths of instances both suites were run on"""
+    inputs: numpy.ndarray
+    """(I,) test input name of each instance"""
+    baseline_status: numpy.ndarray
+    candidate_status: numpy.ndarray
+    baseline_time: numpy.ndarray
+    candidate_time: numpy.ndarray
+    time: PairedTest
+    memory: PairedTest
+    lost: numpy.ndarray = field(init=False)
+    """(I,) solved by baseline, not by candidate"""
+    gained: numpy.ndarray = field(init=False)
+    """(I,) solved by candidate, not by baseline"""
+    conflicting: numpy.ndarray = field(init=False)
+    """(I,) one suite found the formula satisfiable, the other one unsatisfiable"""
+    status_p_value: float = field(init=False)
+    """Sign test of lost and gained instances"""
+
+    def __post_init__(self):
+        baseline_solved = numpy.isin(self.baseline_status, SOLVED_STATUSES)
+        candidate_solved = numpy.isin(self.candidate_status, SOLVED_STATUSES)
+        self.lost = baseline_solved & ~candidate_solved
+        self.gained = candidate_solved & ~baseline_solved
+        self.conflicting = baseline_solved & candidate_solved & (self.baseline_status != self.candidate_status)
+        self.status_p_value = sign_test(int(self.lost.sum()), int(self.gained.sum()))
+
+    def regressions(self, alpha: float = 0.05, threshold: float = 0.05, max_lost: Optional[int] = None) -> List[str]:
+        """Descriptions of significant regressions. Lost instances are regression when they outnumber gained ones
+        significantly, or when there are more than max_lost of them. Conflicting answers are always regression
+        """
+        regressions = []
+        lost, gained = int(self.lost.sum()), int(self.gained.sum())
+        if self.conflicting.any():
+            regressions.append(f'{int(self.conflicting.sum())} conflicting answer(s)')
+        if (lost > gained and self.status_p_value < alpha) or (max_lost is not None and lost > max_lost):
+            regressions.append(f'{lost} instance(s) no longer solved ({gained} newly solved, '
+                               f'p={self.status_p_value:.3g})')
+        for test in (self.time, self.memory):
+            if test.is_regression(alpha, threshold):
+                regressions.append(f'{test.metric} x{test.ratio:.3f} on {test.count} instance(s) '
+                                   f'(p={test.p_value:.3g})')
+        return regressions
+
+
+def _instance_keys(matrix: ResultMatrix) -> numpy.ndarray:
+    return numpy.char.add(numpy.char.add(matrix.inputs.astype(str), '\n'), matrix.instances.astype(str))
+
+
+def _suite_index(matrix: ResultMatrix, suite: str) -> int:
+    if suite not in matrix.suites:
+        raise BenchmarkException(f'Unknown suite "{suite}", available: {", ".join(matrix.suites)}')
+    return int(numpy.flatnonzero(matrix.suites == suite)[0])
+
+
+def compare(baseline: ResultMatrix, baseline_suite: str, candidate: ResultMatrix, candidate_suite: str,
+            min_time: float = 0.0) -> Comparison:
+    """Compare baseline_suite from baseline results with candidate_suite from candidate results (they can be
+    the same matrix) on instances both were run on. Time is compared on instances solved by both where at least
+    one of them took min_time (shorter times are mostly noise), memory on instances solved by both
+    """
+    b, c = _suite_index(baseline, baseline_suite), _suite_index(candidate, candidate_suite)
+    _, b_instances, c_instances = numpy.intersect1d(_instance_keys(baseline), _instance_keys(candidate),
+                                                    assume_unique=True, return_indices=True)
+    b_status, c_status = baseline.status[b, b_instances], candidate.status[c, c_instances]
+    # empty status - suite was not run on instance
+    ran = (b_status != '') & (c_status != '')
+    b_instances, c_instances = b_instances[ran], c_instances[ran]
+    b_status, c_status = b_status[ran], c_status[ran]
+    b_time, c_time = baseline.time[b, b_instances], candidate.time[c, c_instances]
+    both_solved = numpy.isin(b_status, SOLVED_STATUSES) & numpy.isin(c_status, SOLVED_STATUSES)
+    with numpy.errstate(invalid='ignore'):
+        long_enough = numpy.fmax(b_time, c_time) >= min_time
+    return Comparison(baseline=baseline_suite, candidate=candidate_suite,
+                      instances=baseline.instances[b_instances], inputs=baseline.inputs[b_instances],
+                      baseline_status=b_status, candidate_status=c_status, baseline_time=b_time, candidate_time=c_time,
+                      time=paired_test('execution_time', b_time, c_time, both_solved & long_enough),
+                      memory=paired_test('peak_memory', baseline.memory[b, b_instances],
+                                         candidate.memory[c, c_instances], both_solved))
+
+
+def suite_pairs(baseline: ResultMatrix, candidate: ResultMatrix, pairs: Optional[List[str]] = None) \
+        -> List[Tuple[str, str]]:
+    """Parse BASELINE=CANDIDATE suite pairs, without them suites of the same name in both results are paired"""
+    if pairs:
+        parsed = []
+        for pair in pairs:
+            baseline_suite, separator, candidate_suite = pair.partition('=')
+            if not separator or not baseline_suite or not candidate_suite:
+                raise BenchmarkException(f'Wrong suite pair "{pair}", use BASELINE=CANDIDATE')
+            parsed.append((baseline_suite, candidate_suite))
+        return parsed
+    common = [str(suite) for suite in baseline.suites if suite in candidate.suites]
+    if not common:
+        raise BenchmarkException('Results have no suite in common, pair suites with BASELINE=CANDIDATE')
+    return [(suite, suite) for suite in common]
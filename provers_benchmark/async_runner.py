@@ -0,0 +1,246 @@
+"""Asyncio harness: all running tests are supervised by one event loop, instead of a thread per test
+(and two output reader threads per process). Output pipes are read in chunks by the loop, process exit, verdicts
+and timeouts wake up the task of the test. Processes are started and accounted the same way as by run_benchmark
+(MonitoredProcess reaped with wait4), so results of both harnesses are comparable
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, FrozenSet, Callable, Iterable, Awaitable, IO, Tuple, Dict, TYPE_CHECKING
+
+from provers_benchmark.benchmark import BenchmarkRun, benchmark_arguments, new_test_run, SURVIVOR_POLL_INTERVAL
+from provers_benchmark.capture import CaptureBuffer, LineSplitter, CHUNK_SIZE
+from provers_benchmark.config import TestSuite, BenchmarkConfig, Portfolio
+from provers_benchmark.errors import TranslationError
+from provers_benchmark.portfolio import Race, race_result, split_cores
+from provers_benchmark.repetition import RepetitionPolicy, run_repeated_async
+from provers_benchmark.scheduler import Job, CorePool, ResultCallback, JobCallback, member_jobs, failed_test_run
+from provers_benchmark.statistics.stats import ExecutionStatistics, OutputStatistics, SATStatus, TestRunStatistics, \
+    PortfolioStatistics
+
+if TYPE_CHECKING:
+    from provers_benchmark.features import FeatureExtractor
+    from provers_benchmark.pipeline import TranslationPipeline
+
+logger = logging.getLogger('ProverBenchmark')
+
+
+async def capture_stream(pipe: IO[bytes], buffer: CaptureBuffer, on_line: Optional[Callable[[str], None]] = None,
+                         chunk_size: int = CHUNK_SIZE):
+    """Read pipe in chunks into buffer until writer closes it (or task is cancelled), pipe is closed then.
+    If on_line is given, it is called with every line as soon as it is read
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=chunk_size)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    lines = LineSplitter(on_line) if on_line is not None else None
+    try:
+        while chunk := await reader.read(chunk_size):
+            buffer.write(chunk)
+            if lines is not None:
+                lines.feed(chunk)
+        if lines is not None:
+            lines.close()
+    finally:
+        transport.close()
+        buffer.close()
+
+
+async def run_benchmark_async(test_suite: TestSuite, input_path: str, timeout: int,
+                              cpu_affinity: Optional[FrozenSet[int]] = None, sampling_interval: float = 0.1,
+                              use_cgroups: bool = False, cgroup_root: Optional[str] = None,
+                              spill_path: Optional[str] = None, memory_limit: Optional[int] = None,
+                              timeseries_path: Optional[str] = None, timeseries_max_points: int = 4096,
+                              race: Optional[Race] = None, cpu_limit: Optional[float] = None,
+                              kill_grace_period: float = 1) -> Tuple[ExecutionStatistics, OutputStatistics]:
+    """Same as provers_benchmark.benchmark.run_benchmark, but process is supervised by running event loop.
+    Blocking steps (sampling, killing survivors, collecting statistics) run in default executor of the loop
+    """
+    run = BenchmarkRun(test_suite, input_path, timeout, cpu_affinity=cpu_affinity, use_cgroups=use_cgroups,
+                       cgroup_root=cgroup_root, spill_path=spill_path, memory_limit=memory_limit,
+                       timeseries_path=timeseries_path, timeseries_max_points=timeseries_max_points, race=race,
+                       cpu_limit=cpu_limit, kill_grace_period=kill_grace_period)
+    loop = asyncio.get_running_loop()
+    wake_up = asyncio.Event()
+    with contextlib.ExitStack() as stack:
+        proc = run.start(stack)
+        fds = proc.wakeup_fds()
+        for fd in fds:
+            loop.add_reader(fd, wake_up.set)
+        try:
+            # verdicts are found by capture task and race is answered from tasks of other members, both in this loop
+            verdict = run.listen(proc, wake_up=wake_up.set)
+            captures = [loop.create_task(capture_stream(proc.stdout, run.buffers['stdout'], on_line=verdict.feed)),
+                        loop.create_task(capture_stream(proc.stderr, run.buffers['stderr']))]
+            next_sample = proc.start_time + sampling_interval if sampling_interval > 0 else None
+            while not run.stop(proc, verdict):
+                wake_up_time = run.wake_up_time(proc, verdict)
+                if next_sample is not None:
+                    wake_up_time = min(wake_up_time, next_sample)
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(wake_up.wait(), timeout=max(wake_up_time - time.perf_counter(), 0))
+                wake_up.clear()
+                if proc.wait_for_exit(timeout=0):
+                    break
+                now = time.perf_counter()
+                if next_sample is not None and now >= next_sample:
+                    # walks whole process tree, must not stall other tests supervised by the loop
+                    await loop.run_in_executor(None, proc.sample)
+                    next_sample = now + sampling_interval
+            while not proc.wait_for_exit(timeout=0):
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(wake_up.wait(), timeout=run.time_to_kill())
+                wake_up.clear()
+                run.escalate(proc)
+        finally:
+            for fd in fds:
+                loop.remove_reader(fd)
+        # looking up and killing survivors scans all processes and waits for them to exit
+        while await loop.run_in_executor(None, run.terminating, proc):
+            await asyncio.sleep(SURVIVOR_POLL_INTERVAL)
+        await loop.run_in_executor(None, run.exited, proc)
+        _, still_open = await asyncio.wait(captures, timeout=1)
+        if still_open:
+            run.output_left_open()
+            for capture in still_open:
+                capture.cancel()
+            await asyncio.wait(still_open)
+    # removing cgroup waits for its processes and timeseries are written to disk
+    return await loop.run_in_executor(None, run.finish, proc, verdict)
+
+
+async def _features(features: FeatureExtractor, path: str, input_format: str) -> Dict:
+    future = features.submit(path, input_format)
+    if future is None:
+        return {}
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception as e:
+        logger.warning(f'Extracting features of {path} failed: {e}')
+        return {}
+
+
+async def run_portfolio_async(job: Job, config: BenchmarkConfig, translations: TranslationPipeline,
+                              cpu_affinity: Optional[FrozenSet[int]] = None) \
+        -> Tuple[ExecutionStatistics, OutputStatistics, PortfolioStatistics]:
+    """Same as provers_benchmark.benchmark.run_portfolio, members are tasks of running event loop"""
+    logger.info(f'Portfolio race: "{job.test_suite.name}" with input "{job.file}"')
+    race = Race()
+    jobs = member_jobs(job)
+
+    async def run_member(member_job: Job, cores: Optional[FrozenSet[int]]):
+        try:
+            file = await translations.translated_input_async(member_job)
+        except TranslationError as e:
+            return ExecutionStatistics(), OutputStatistics(status=SATStatus.ERROR, stderr=str(e))
+        return await run_benchmark_async(input_path=file, cpu_affinity=cores, race=race,
+                                         **benchmark_arguments(member_job, config))
+
+    results = await asyncio.gather(*(run_member(member_job, cores)
+                                     for member_job, cores in zip(jobs, split_cores(cpu_affinity, len(jobs)))))
+    return race_result(race, [(member_job.test_suite.name, *result) for member_job, result in zip(jobs, results)])
+
+
+async def run_job_async(job: Job, config: BenchmarkConfig, translations: TranslationPipeline,
+                        cpu_affinity: Optional[FrozenSet[int]] = None, features: Optional[FeatureExtractor] = None) \
+        -> TestRunStatistics:
+    """Same as provers_benchmark.benchmark.run_job, translations and features are awaited"""
+    test_input, test_suite = job.test_input, job.test_suite
+    minimal_statistics, formula_info = test_input.get_file_statistics(job.file)
+    if not formula_info and features is not None:
+        formula_info = await _features(features, job.file, test_input.format)
+    test_run = new_test_run(job, translations, minimal_statistics, formula_info)
+    policy = RepetitionPolicy.from_config(config.general, test_suite)
+    if isinstance(test_suite, Portfolio):
+        races = []
+
+        async def run():
+            execution_statistics, output, portfolio_statistics = await run_portfolio_async(
+                job, config, translations, cpu_affinity)
+            races.append(portfolio_statistics)
+            return execution_statistics, output
+
+        test_run.execution_statistics, test_run.output, test_run.repetitions = \
+            await run_repeated_async(run, policy=policy)
+        test_run.portfolio = races[-1]
+        return test_run
+    try:
+        file = await translations.translated_input_async(job)
+    except TranslationError as e:
+        test_run.execution_statistics = ExecutionStatistics()
+        test_run.output = OutputStatistics(status=SATStatus.ERROR, stderr=str(e))
+        return test_run
+    test_run.execution_statistics, test_run.output, test_run.repetitions = await run_repeated_async(
+        lambda: run_benchmark_async(input_path=file, cpu_affinity=cpu_affinity, **benchmark_arguments(job, config)),
+        policy=policy)
+    return test_run
+
+
+AsyncJobRunner = Callable[[Job, Optional[FrozenSet[int]]], Awaitable[TestRunStatistics]]
+
+
+class AsyncScheduler:
+    """Run jobs as tasks of one event loop, at most workers at once, each on its cores from CorePool.
+    Jobs are taken from (possibly blocking) iterator and results are passed to on_result in a helper thread,
+    so neither waiting for next job nor writing results (e.g. fsync of results stream) stalls running tests
+    """
+
+    def __init__(self, workers: int = 1, cores_per_job: int = 1):
+        self.cores = CorePool(workers=workers, cores_per_job=cores_per_job)
+        self.workers = self.cores.size
+
+    async def _run_one(self, runner: AsyncJobRunner, job: Job, slots: asyncio.Queue,
+                       on_start: Optional[JobCallback]) -> TestRunStatistics:
+        cores = await slots.get()
+        try:
+            if on_start is not None:
+                on_start(job)
+            return await runner(job, cores)
+        finally:
+            slots.put_nowait(cores)
+
+    async def run_async(self, jobs: Iterable[Job], runner: AsyncJobRunner, on_result: ResultCallback,
+                        on_start: Optional[JobCallback] = None):
+        """Run all jobs, on_result is called in order in which jobs finished, on_start (in event loop) when job got
+        its cores.
+        At most 2 * workers jobs are taken from jobs at once, so jobs can be consumed lazily
+        """
+        logger.info(f'Running jobs as asyncio tasks, {self.workers} at once')
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Queue()
+        for _ in range(self.workers):
+            slots.put_nowait(self.cores.acquire())
+        max_pending = 2 * self.workers
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='benchmark-io') as io:
+            pending = {}
+            jobs = iter(jobs)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending:
+                    job = await loop.run_in_executor(io, next, jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    pending[loop.create_task(self._run_one(runner, job, slots, on_start))] = job
+
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job = pending.pop(task)
+                    try:
+                        test_run = task.result()
+                    except Exception as e:
+                        logger.exception(f'Job "{job.test_suite.name}" with input "{job.file}" failed',
+                                         exc_info=task.exception())
+                        test_run = failed_test_run(job, e)
+                    await loop.run_in_executor(io, on_result, job, test_run)
+
+    def run(self, jobs: Iterable[Job], runner: AsyncJobRunner, on_result: ResultCallback,
+            on_start: Optional[JobCallback] = None):
+        """Run all jobs in new event loop, see run_async"""
+        asyncio.run(self.run_async(jobs, runner, on_result, on_start))
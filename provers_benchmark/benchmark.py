@@ -1,81 +1,472 @@
+from __future__ import annotations
+
+import contextlib
 import logging
+import math
 import os
+import re
+import resource
+import signal
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, FrozenSet, TYPE_CHECKING, Tuple, List, Callable, Dict, Any
 
-import psutil
-
-from provers_benchmark.config import Translator, InputMode, OutputMode, TestSuite, CACHE_LOCATION
-from provers_benchmark.non_blocking_stream_reader import NonBlockingStreamReader
-from provers_benchmark.parsers import find_output_parser
+from provers_benchmark.cache import TranslationCache
+from provers_benchmark.capture import CaptureBuffer, StreamCapture
+from provers_benchmark.config import Translator, InputMode, OutputMode, TestSuite, BenchmarkConfig, Portfolio
+from provers_benchmark.errors import TranslationError
+from provers_benchmark.parsers import find_output_parser, VerdictListener
+from provers_benchmark.portfolio import Race, race_result, split_cores
+from provers_benchmark.repetition import RepetitionPolicy, run_repeated
+from provers_benchmark.scheduler import Job, member_jobs
+from provers_benchmark.statistics.cgroup import Cgroup
 from provers_benchmark.statistics.monitored_process import MonitoredProcess
-from provers_benchmark.statistics.stats import OutputStatistics, SATStatus
-from provers_benchmark.utils import build_command, command_name, executable_name
+from provers_benchmark.statistics.stats import OutputStatistics, SATStatus, TestRunStatistics, ExecutionStatistics, \
+    PortfolioStatistics, MinimalSATStatistics
+from provers_benchmark.statistics.timeseries import TimeSeries
+from provers_benchmark.utils import build_command, executable_name
+
+if TYPE_CHECKING:
+    from provers_benchmark.features import FeatureExtractor
+    from provers_benchmark.pipeline import TranslationPipeline
 
 logger = logging.getLogger('ProverBenchmark')
 
 
-def get_cache_location(translator: Translator, input_file: str):
-    command = os.path.basename(command_name(translator.command))
-    cache_dir = os.path.join(CACHE_LOCATION, command, f'{translator.from_format}-{translator.to_format}')
-    os.makedirs(cache_dir, exist_ok=True)
-    return os.path.join(cache_dir, str(hash(input_file)))
-
-
-def translate(translator: Translator, input_file: str):
-    output_file = get_cache_location(translator=translator, input_file=input_file)
-
-    command = build_command(translator.command, input_file, translator.input_mode, output_file, translator.output_mode)
-    stdin = subprocess.DEVNULL if translator.input_mode == InputMode.ARGUMENT else open(input_file)
-    stdout = subprocess.DEVNULL if translator.output_mode == OutputMode.ARGUMENT else open(output_file, 'w')
-    p = subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE, shell=True, text=True)
-    out, err = p.communicate()
-    if p.returncode == 0:
-        logger.info(f'Translated {input_file} to {output_file} from {translator.from_format} to {translator.to_format}')
-        return output_file
-    else:
-        logger.error(f'error in translating "{command}": {err}')
-        return None, err
-
-
-def run_benchmark(test_suite: TestSuite, input_path: str, timeout: int):
-    logger.info(f'Benchmarking: "{test_suite.name}" with input "{input_path}"')
-    out_stats = OutputStatistics()
-    command = build_command(test_suite.command, input_path, test_suite.input_mode, output_file=None, output_mode=None)
-    stdin = subprocess.DEVNULL if test_suite.input_mode == InputMode.ARGUMENT else open(input_path)
-    with MonitoredProcess(command, stdin=stdin, stdout=subprocess.PIPE,
-                          stderr=subprocess.PIPE, text=True, shell=True) as proc:
-        nbsr_stdout = NonBlockingStreamReader(stream=proc.stdout)
-        nbsr_stderr = NonBlockingStreamReader(stream=proc.stderr)
-        last_read = time.time()
-        while proc.poll() is None:
-            time.sleep(0.1)
-            if proc.exec_stats.execution_time > timeout:
-                proc.kill()
+_ALLOCATION_FAILURE = re.compile(r'out of memory|cannot allocate memory|bad_alloc|memory exhausted', re.IGNORECASE)
+"""Messages of processes that failed to allocate memory, used to detect OOM when memory is limited by rlimit"""
+
+
+SURVIVOR_POLL_INTERVAL = 0.05
+"""Seconds between checks whether descendants of terminated process exited"""
+
+_CPU_LIMIT_SIGNALS = {-signal.SIGXCPU, 128 + signal.SIGXCPU}
+"""Return codes of process (or of shell whose child was) killed by SIGXCPU of exceeded RLIMIT_CPU"""
+
+
+def _preexec(cpu_affinity: Optional[FrozenSet[int]] = None, address_space_limit: Optional[int] = None,
+             cpu_limit: Optional[float] = None, kill_grace_period: float = 1):
+    """Function run in child before exec: pin it to cores, limit its address space (in bytes) and cpu time
+    (in seconds, SIGXCPU when it is exceeded, SIGKILL kill_grace_period later)
+    """
+    if not cpu_affinity and address_space_limit is None and cpu_limit is None:
+        return None
+
+    def preexec():
+        if cpu_affinity:
+            os.sched_setaffinity(0, cpu_affinity)
+        if address_space_limit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (address_space_limit, address_space_limit))
+        if cpu_limit is not None:
+            soft = math.ceil(cpu_limit)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + max(math.ceil(kill_grace_period), 1)))
+
+    return preexec
+
+
+def translate(translator: Translator, input_file: str, cache: TranslationCache,
+              cpu_affinity: Optional[FrozenSet[int]] = None) -> str:
+    """Translate input_file (or take it from cache) and return path of translated file.
+    Raise TranslationError if translation fails. Failures are cached as well, unless translator was killed
+    by a signal (e.g. by OOM killer), which is likely to be transient
+    """
+    key = cache.key(translator=translator, input_file=input_file)
+    with cache.key_lock(key):
+        if entry := cache.lookup(key):
+            if entry.failed:
+                raise TranslationError(entry.error)
+            return cache.output_path(key)
+
+        output_file = cache.output_path(key)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        # translate to temporary file, so that partially written translation is never visible in cache
+        tmp_file = f'{output_file}.tmp-{os.getpid()}-{threading.get_ident()}'
+        command = build_command(translator.command, input_file, translator.input_mode, tmp_file,
+                                translator.output_mode)
+        with contextlib.ExitStack() as stack:
+            stdin = subprocess.DEVNULL if translator.input_mode == InputMode.ARGUMENT else \
+                stack.enter_context(open(input_file))
+            stdout = subprocess.DEVNULL if translator.output_mode == OutputMode.ARGUMENT else \
+                stack.enter_context(open(tmp_file, 'w'))
+            p = subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE, shell=True, text=True,
+                                 preexec_fn=_preexec(cpu_affinity))
+            out, err = p.communicate()
+        if p.returncode == 0:
+            os.replace(tmp_file, output_file)
+            cache.store(key, input_path=input_file)
+            logger.info(f'Translated {input_file} to {output_file} from {translator.from_format} to {translator.to_format}')
+            return output_file
+        else:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            error = f'error in translating "{command}": {err}'
+            if p.returncode > 0:
+                cache.store(key, input_path=input_file, error=error)
+            else:
+                error += f' (killed by signal {-p.returncode}, not cached)'
+            logger.error(error)
+            raise TranslationError(error)
+
+
+class BenchmarkRun:
+    """One run of test suite on input, shared by threaded (run_benchmark) and asyncio harness
+    (provers_benchmark.async_runner): command, limits and output buffers before process starts, decisions to kill it
+    while it runs and its statistics after it exits
+    """
+
+    def __init__(self, test_suite: TestSuite, input_path: str, timeout: int,
+                 cpu_affinity: Optional[FrozenSet[int]] = None, use_cgroups: bool = False,
+                 cgroup_root: Optional[str] = None, spill_path: Optional[str] = None,
+                 memory_limit: Optional[int] = None, timeseries_path: Optional[str] = None,
+                 timeseries_max_points: int = 4096, race: Optional[Race] = None, cpu_limit: Optional[float] = None,
+                 kill_grace_period: float = 1):
+        logger.info(f'Benchmarking: "{test_suite.name}" with input "{input_path}"')
+        self.test_suite = test_suite
+        self.input_path = input_path
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.kill_grace_period = kill_grace_period
+        self._kill_at: Optional[float] = None
+        """When process that got SIGTERM gets SIGKILL"""
+        self.timeseries_path = timeseries_path
+        self.race = race
+        self.out_stats = OutputStatistics()
+        self.lost_race = False
+        self.command = build_command(test_suite.command, input_path, test_suite.input_mode, output_file=None,
+                                     output_mode=None)
+        self.parser = find_output_parser(executable=executable_name(self.command))
+        self.cgroup = Cgroup.create(cgroup_root) if use_cgroups else None
+        self.limited_by_cgroup = memory_limit is not None and self.cgroup is not None and \
+            self.cgroup.limit_memory(memory_limit)
+        if memory_limit is not None and not self.limited_by_cgroup:
+            logger.debug(f'Memory of "{test_suite.name}" is limited by RLIMIT_AS, not by cgroup')
+        self.preexec_fn = _preexec(cpu_affinity, address_space_limit=None if self.limited_by_cgroup else memory_limit,
+                                   cpu_limit=cpu_limit, kill_grace_period=kill_grace_period)
+        self.timeseries = TimeSeries(max_points=timeseries_max_points) if timeseries_path else None
+        self.buffers = {}
+        for stream_name in ('stdout', 'stderr'):
+            self.buffers[stream_name] = CaptureBuffer(
+                head_size=test_suite.output_head_kb * 1024, tail_size=test_suite.output_tail_kb * 1024,
+                spill_path=f'{spill_path}.{stream_name}' if test_suite.spill_output and spill_path else None,
+                compress=test_suite.compress_spilled_output)
+
+    def start(self, stack: contextlib.ExitStack) -> MonitoredProcess:
+        """Start process in its own session (and process group, so that all its descendants can be killed),
+        it (and its input file) are closed with stack
+        """
+        stdin = subprocess.DEVNULL if self.test_suite.input_mode == InputMode.ARGUMENT else \
+            stack.enter_context(open(self.input_path))
+        return stack.enter_context(MonitoredProcess(self.command, stdin=stdin, stdout=subprocess.PIPE,
+                                                    stderr=subprocess.PIPE, shell=True, preexec_fn=self.preexec_fn,
+                                                    start_new_session=True, cgroup=self.cgroup,
+                                                    timeseries=self.timeseries))
+
+    def listen(self, proc: MonitoredProcess, wake_up: Callable[[], None]) -> VerdictListener:
+        """Listener of verdicts in stdout of proc, wake_up wakes up harness when verdict is found
+        (or when other member of race answered)
+        """
+        name = self.test_suite.name
+        if self.race is not None:
+            self.race.register(name, wake_up)
+
+        def on_verdict():
+            if self.race is not None:
+                self.race.answer(name, verdict.verdict)
+            wake_up()
+
+        verdict = VerdictListener(self.parser, start=proc.start_time, on_verdict=on_verdict)
+        return verdict
+
+    def _terminate_at(self, proc: MonitoredProcess, verdict: VerdictListener) -> Optional[float]:
+        if verdict.time_to_verdict is None or self.test_suite.terminate_after_verdict is None:
+            return None
+        return proc.start_time + verdict.time_to_verdict + self.test_suite.terminate_after_verdict
+
+    def wake_up_time(self, proc: MonitoredProcess, verdict: VerdictListener) -> float:
+        """Latest time.perf_counter() at which harness has to check running process again"""
+        wake_up = proc.start_time + self.timeout
+        if (terminate_at := self._terminate_at(proc, verdict)) is not None:
+            wake_up = min(wake_up, terminate_at)
+        return wake_up
+
+    def stop(self, proc: MonitoredProcess, verdict: VerdictListener) -> bool:
+        """Terminate process if it lost race, timed out, exceeded cpu limit (in its last sample) or is still running
+        terminate_after_verdict seconds after verdict. Whole process group gets SIGTERM, see escalate.
+        Return True if it was terminated
+        """
+        now = time.perf_counter()
+        if self.race is not None and self.race.lost(self.test_suite.name):
+            self.lost_race = True
+        elif (terminate_at := self._terminate_at(proc, verdict)) is not None and now >= terminate_at:
+            self.out_stats.terminated_after_verdict = True
+            self.out_stats.limit = 'terminate_after_verdict'
+        elif now >= proc.start_time + self.timeout:
+            self.out_stats.status = SATStatus.TIMEOUT
+            self.out_stats.limit = 'wall_time'
+        elif self.cpu_limit is not None and (proc.exec_stats.cpu_time or 0) >= self.cpu_limit:
+            self.out_stats.status = SATStatus.TIMEOUT
+            self.out_stats.limit = 'cpu_time'
+        else:
+            return False
+        if self.kill_grace_period > 0:
+            proc.signal_tree(signal.SIGTERM)
+            self.out_stats.killed_with = 'SIGTERM'
+            self._kill_at = now + self.kill_grace_period
+        else:
+            proc.signal_tree(signal.SIGKILL)
+            self.out_stats.killed_with = 'SIGKILL'
+        return True
+
+    def time_to_kill(self) -> Optional[float]:
+        """Seconds until terminated process gets SIGKILL, None if it is not waiting for it"""
+        if self._kill_at is None:
+            return None
+        return max(self._kill_at - time.perf_counter(), 0)
+
+    def escalate(self, proc: MonitoredProcess):
+        """SIGKILL whole process group of terminated process, if it is still running after grace period"""
+        if self._kill_at is not None and time.perf_counter() >= self._kill_at:
+            logger.debug(f'"{self.command}" is still running {self.kill_grace_period}" after SIGTERM, killing it')
+            proc.signal_tree(signal.SIGKILL)
+            self.out_stats.killed_with = 'SIGKILL'
+            self._kill_at = None
+
+    def terminating(self, proc: MonitoredProcess) -> bool:
+        """Whether descendants of exited process that got SIGTERM are still running and have time to exit
+        before SIGKILL
+        """
+        return self._kill_at is not None and time.perf_counter() < self._kill_at and bool(proc.survivors())
+
+    def exited(self, proc: MonitoredProcess):
+        """Kill descendants left behind by exited process, before its output is collected"""
+        self.out_stats.survivors = proc.kill_survivors()
+        if self.out_stats.survivors and self._kill_at is not None:
+            self.out_stats.killed_with = 'SIGKILL'
+        if self.out_stats.survivors:
+            logger.warning(f'"{self.command}" left {self.out_stats.survivors} running process(es) behind, '
+                           f'they were killed')
+
+    def output_left_open(self):
+        logger.warning(f'Output of "{self.command}" is still open after it exited, '
+                       f'probably some of its child processes are still running')
+
+    def finish(self, proc: MonitoredProcess, verdict: VerdictListener) -> Tuple[ExecutionStatistics, OutputStatistics]:
+        """Statistics of exited (and closed) process"""
+        out_stats = self.out_stats
+        for stream_name, buffer in self.buffers.items():
+            setattr(out_stats, stream_name, buffer.text())
+            setattr(out_stats, f'{stream_name}_bytes', buffer.total_bytes)
+            setattr(out_stats, f'{stream_name}_truncated', buffer.truncated)
+            setattr(out_stats, f'{stream_name}_path', buffer.spill_path)
+        execution_statistics = proc.get_statistics()
+        if self.timeseries is not None:
+            os.makedirs(os.path.dirname(self.timeseries_path) or '.', exist_ok=True)
+            execution_statistics.timeseries_path = self.timeseries.save(self.timeseries_path)
+        oom_killed = False
+        if self.cgroup is not None:
+            oom_killed = self.cgroup.oom_kills() > 0
+            self.cgroup.remove()
+
+        out_stats.time_to_verdict = verdict.time_to_verdict
+        if verdict.verdict is not None:
+            # verdict printed before process was killed (or exited) is final
+            out_stats.status = verdict.verdict
+        elif oom_killed:
+            out_stats.status = SATStatus.OUT_OF_MEMORY
+            out_stats.limit = 'memory'
+        elif self.lost_race:
+            out_stats.status = SATStatus.UNKOWN
+        elif out_stats.status != SATStatus.TIMEOUT:
+            if self.cpu_limit is not None and (execution_statistics.returncode in _CPU_LIMIT_SIGNALS or
+                                               (execution_statistics.cpu_time or 0) >= self.cpu_limit):
+                # killed by RLIMIT_CPU
                 out_stats.status = SATStatus.TIMEOUT
-                break
-            if psutil.virtual_memory().free < 100 * 1024 * 1024:  # 100MB
-                proc.kill()
+                out_stats.limit = 'cpu_time'
+            else:
+                out_stats.status = self.parser.parse_output(returncode=execution_statistics.returncode,
+                                                            stdout=out_stats.stdout, stderr=out_stats.stderr)
+            if self.memory_limit is not None and not self.limited_by_cgroup and \
+                    execution_statistics.returncode != 0 and \
+                    out_stats.status in {SATStatus.ERROR, SATStatus.UNKOWN} and \
+                    _ALLOCATION_FAILURE.search(out_stats.stderr + out_stats.stdout):
                 out_stats.status = SATStatus.OUT_OF_MEMORY
+                out_stats.limit = 'memory'
+        if not self.test_suite.save_stdout:
+            out_stats.stdout = None
+        if not self.test_suite.save_stderr:
+            out_stats.stderr = None
+        verdict_time = f', verdict after {out_stats.time_to_verdict:.2f}"' \
+            if out_stats.time_to_verdict is not None else ''
+        lost = ', lost portfolio race' if self.lost_race else ''
+        limit = f', {out_stats.limit} limit' if out_stats.limit is not None else ''
+        logger.info(f'Benchmarking done: returncode {execution_statistics.returncode}, '
+                    f'SAT: {out_stats.status}, '
+                    f'time: {execution_statistics.execution_time:.2f}"{verdict_time}{lost}{limit}')
+        return execution_statistics, out_stats
+
+
+def run_benchmark(test_suite: TestSuite, input_path: str, timeout: int, cpu_affinity: Optional[FrozenSet[int]] = None,
+                  sampling_interval: float = 0.1, use_cgroups: bool = False, cgroup_root: Optional[str] = None,
+                  spill_path: Optional[str] = None, memory_limit: Optional[int] = None,
+                  timeseries_path: Optional[str] = None, timeseries_max_points: int = 4096,
+                  race: Optional[Race] = None, cpu_limit: Optional[float] = None,
+                  kill_grace_period: float = 1) -> Tuple[ExecutionStatistics, OutputStatistics]:
+    """Run test_suite on input_path, if cpu_affinity is given process (and its children) runs only on these cores.
+    Harness sleeps until process exits, timeout elapses or it is time to sample resources (every sampling_interval
+    seconds, 0 disables sampling).
+    With use_cgroups, process tree runs in its own cgroup v2 (created in cgroup_root) and its resources are accounted
+    from there, if cgroups are not available rusage of reaped process is used.
+    Only head and tail of output is kept in memory, if test_suite.spill_output is set,
+    whole stdout and stderr are written to spill_path.stdout and spill_path.stderr.
+    Stdout is parsed line by line while process runs, so that verdict is known as soon as it is printed.
+    Process that is still running test_suite.terminate_after_verdict seconds after verdict is killed.
+    Memory of process tree is limited to memory_limit bytes by its cgroup (memory.max), process is then OUT_OF_MEMORY
+    when kernel OOM killer killed it. Without cgroup each process gets RLIMIT_AS instead, process is OUT_OF_MEMORY
+    when it failed with message about failed allocation.
+    If timeseries_path is given, every resource sample is recorded and saved there (at most timeseries_max_points)
+    In portfolio race, SAT/UNSAT verdict is reported to race and process is killed as soon as other member answered,
+    it then ends as UNKNOWN unless it printed verdict too
+    Cpu time of each process is limited to cpu_limit seconds by RLIMIT_CPU, cpu time of whole tree is checked
+    whenever it is sampled, process is then TIMEOUT.
+    Process runs in its own process group, which is terminated with SIGTERM and killed with SIGKILL if it is still
+    running kill_grace_period seconds later. Descendants still running after process exited are killed too
+    """
+    run = BenchmarkRun(test_suite, input_path, timeout, cpu_affinity=cpu_affinity, use_cgroups=use_cgroups,
+                       cgroup_root=cgroup_root, spill_path=spill_path, memory_limit=memory_limit,
+                       timeseries_path=timeseries_path, timeseries_max_points=timeseries_max_points, race=race,
+                       cpu_limit=cpu_limit, kill_grace_period=kill_grace_period)
+    with contextlib.ExitStack() as stack:
+        proc = run.start(stack)
+        verdict = run.listen(proc, wake_up=proc.interrupt_wait)
+        captures = [StreamCapture(proc.stdout, run.buffers['stdout'], on_line=verdict.feed),
+                    StreamCapture(proc.stderr, run.buffers['stderr'])]
+        next_sample = proc.start_time + sampling_interval if sampling_interval > 0 else None
+        while not run.stop(proc, verdict):
+            wake_up = run.wake_up_time(proc, verdict)
+            if next_sample is not None:
+                wake_up = min(wake_up, next_sample)
+            if proc.wait_for_exit(timeout=max(wake_up - time.perf_counter(), 0)):
                 break
-            if time.time() - last_read > 1:
-                out_stats.stdout = ''.join(nbsr_stdout.readall())
-                out_stats.stderr = ''.join(nbsr_stderr.readall())
-                last_read = time.time()
-        out_stats.stdout += ''.join(nbsr_stdout.readall())
-        # we want all stderr
-        out_stats.stderr += ''.join(nbsr_stderr.readall())
-    execution_statistics = proc.get_statistics()
-
-    if out_stats.status not in {SATStatus.OUT_OF_MEMORY, SATStatus.TIMEOUT}:
-        parser = find_output_parser(executable=executable_name(command))
-        out_stats.status = parser.parse_output(returncode=execution_statistics.returncode, stdout=out_stats.stdout,
-                                               stderr=out_stats.stderr)
-    if not test_suite.save_stdout:
-        out_stats.stdout = None
-    if not test_suite.save_stderr:
-        out_stats.stdout = None
-    logger.info(f'Benchmarking done: returncode {execution_statistics.returncode}, '
-                f'SAT: {out_stats.status}, '
-                f'time: {execution_statistics.execution_time:.2f}"')
-    return execution_statistics, out_stats
+            now = time.perf_counter()
+            if next_sample is not None and now >= next_sample:
+                proc.sample()
+                next_sample = now + sampling_interval
+        # pending interrupt (e.g. from portfolio race) wakes up wait_for_exit before process exits
+        while not proc.wait_for_exit(timeout=run.time_to_kill()):
+            run.escalate(proc)
+        while run.terminating(proc):
+            time.sleep(SURVIVOR_POLL_INTERVAL)
+        run.exited(proc)
+        for capture in captures:
+            if not capture.join(timeout=1):
+                run.output_left_open()
+    return run.finish(proc, verdict)
+
+
+def job_file_path(directory: str, job: Job) -> str:
+    """Path (without extension) of file with additional data of job in directory"""
+    suite_name = re.sub(r'[^\w.-]+', '_', job.test_suite.name)
+    return os.path.join(directory, f'{suite_name}-{job.key or job.index}')
+
+
+def benchmark_arguments(job: Job, config: BenchmarkConfig) -> Dict[str, Any]:
+    """Arguments of run_benchmark for job (not a portfolio) with limits and paths from config,
+    except of input path, cores and race
+    """
+    test_suite = job.test_suite
+    memory_limit = test_suite.memory_limit if test_suite.memory_limit is not None else config.general.memory_limit
+    if memory_limit is not None:
+        memory_limit *= 1024 * 1024
+    cpu_limit = test_suite.cpu_limit if test_suite.cpu_limit is not None else config.general.cpu_limit
+    return dict(test_suite=test_suite, timeout=config.general.test_timeout,
+                sampling_interval=config.general.sampling_interval,
+                use_cgroups=config.general.use_cgroups, cgroup_root=config.general.cgroup_root,
+                spill_path=job_file_path(config.general.spilled_output_path, job),
+                memory_limit=memory_limit, cpu_limit=cpu_limit, kill_grace_period=config.general.kill_grace_period,
+                timeseries_path=job_file_path(config.general.timeseries_path, job)
+                if config.general.record_timeseries else None,
+                timeseries_max_points=config.general.timeseries_max_points)
+
+
+def run_portfolio(job: Job, config: BenchmarkConfig, translations: TranslationPipeline,
+                  cpu_affinity: Optional[FrozenSet[int]] = None) \
+        -> Tuple[ExecutionStatistics, OutputStatistics, PortfolioStatistics]:
+    """Race members of portfolio job on its input, each member in its own harness thread. Cores of job are split
+    among members if there are enough of them. Member whose input could not be translated ends with error
+    and does not take part in race
+    """
+    logger.info(f'Portfolio race: "{job.test_suite.name}" with input "{job.file}"')
+    race = Race()
+    jobs = member_jobs(job)
+    results: List[Optional[Tuple[ExecutionStatistics, OutputStatistics]]] = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='portfolio-member') as executor:
+        futures = {}
+        for i, (member_job, cores) in enumerate(zip(jobs, split_cores(cpu_affinity, len(jobs)))):
+            try:
+                file = translations.translated_input(member_job)
+            except TranslationError as e:
+                results[i] = ExecutionStatistics(), OutputStatistics(status=SATStatus.ERROR, stderr=str(e))
+                continue
+            futures[i] = executor.submit(run_benchmark, input_path=file, cpu_affinity=cores, race=race,
+                                         **benchmark_arguments(member_job, config))
+        for i, future in futures.items():
+            results[i] = future.result()
+    return race_result(race, [(member_job.test_suite.name, *result) for member_job, result in zip(jobs, results)])
+
+
+def new_test_run(job: Job, translations: TranslationPipeline, minimal_statistics: MinimalSATStatistics,
+                 formula_info: Dict) -> TestRunStatistics:
+    """Test run of job with statistics of its input, before it is run"""
+    test_suite = job.test_suite
+    translators = dict.fromkeys(translator.command for member_job in member_jobs(job)
+                                if (translator := translations.translator_for(member_job)))
+    if translators:
+        minimal_statistics.translated_with = ' & '.join(translators)
+    return TestRunStatistics(name=test_suite.name,
+                             program_name='portfolio' if isinstance(test_suite, Portfolio)
+                             else executable_name(test_suite.command),
+                             program_version=test_suite.version,
+                             command=test_suite.command,
+                             minimal_input_statistics=minimal_statistics,
+                             input_formula_statistics=formula_info)
+
+
+def run_job(job: Job, config: BenchmarkConfig, translations: TranslationPipeline,
+            cpu_affinity: Optional[FrozenSet[int]] = None, features: Optional[FeatureExtractor] = None) \
+        -> TestRunStatistics:
+    """Benchmark job on its input translated by translation pipeline. If translation failed, test run ends with error.
+    Formula statistics not precomputed in <file>.json are taken from features extractor.
+    Portfolio job is a race of its members, see run_portfolio
+    """
+    test_input, test_suite = job.test_input, job.test_suite
+    minimal_statistics, formula_info = test_input.get_file_statistics(job.file)
+    if not formula_info and features is not None:
+        formula_info = features.features(job.file, test_input.format)
+    test_run = new_test_run(job, translations, minimal_statistics, formula_info)
+    policy = RepetitionPolicy.from_config(config.general, test_suite)
+    if isinstance(test_suite, Portfolio):
+        races = []
+
+        def run():
+            execution_statistics, output, portfolio_statistics = run_portfolio(job, config, translations,
+                                                                               cpu_affinity)
+            races.append(portfolio_statistics)
+            return execution_statistics, output
+
+        test_run.execution_statistics, test_run.output, test_run.repetitions = run_repeated(run, policy=policy)
+        # statistics of the last measured race, like execution_statistics
+        test_run.portfolio = races[-1]
+        return test_run
+    try:
+        file = translations.translated_input(job)
+    except TranslationError as e:
+        test_run.execution_statistics = ExecutionStatistics()
+        test_run.output = OutputStatistics(status=SATStatus.ERROR, stderr=str(e))
+        return test_run
+    test_run.execution_statistics, test_run.output, test_run.repetitions = run_repeated(
+        lambda: run_benchmark(input_path=file, cpu_affinity=cpu_affinity, **benchmark_arguments(job, config)),
+        policy=policy)
+    return test_run
@@ -0,0 +1,251 @@
+"""Persistent cache of translated inputs.
+Entries are keyed on digest of input file content and translator (formats, command, version and executable),
+so cache survives between runs and is invalidated when input or translator changes.
+Failed translations are cached as well (for failure_ttl seconds), index of all entries is kept in manifest.json
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Set, Callable, Iterator, Tuple
+
+from provers_benchmark.config import Translator
+from provers_benchmark.utils import command_name, which, file_digest
+
+logger = logging.getLogger('ProverBenchmark')
+
+MANIFEST_SAVE_INTERVAL = 5
+"""Seconds between saving manifest to disk, it is always saved in close()"""
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    input_path: str
+    """Input file path at the time of translation, informational only"""
+    output: Optional[str]
+    """Translated file name relative to cache directory, None for failed translation"""
+    error: Optional[str] = None
+    size: int = 0
+    created: float = 0
+    last_used: float = 0
+
+    @property
+    def failed(self) -> bool:
+        return self.output is None
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    misses: int = 0
+    failures: int = 0
+    """Hits of cached failed translations"""
+    evicted: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.failures + self.misses
+        return (self.hits + self.failures) / lookups if lookups else 0
+
+
+def translator_fingerprint(translator: Translator) -> str:
+    executable = which(command_name(translator.command))
+    executable_info = ''
+    if executable:
+        stat = os.stat(executable)
+        executable_info = f'{os.path.realpath(executable)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return '\0'.join([translator.from_format, translator.to_format, translator.command,
+                      translator.version, executable_info])
+
+
+def atomic_write(path: str, data: str):
+    tmp_path = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    with open(tmp_path, 'w') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class TranslationCache:
+    def __init__(self, path: str, max_size: Optional[int] = None, max_age: Optional[float] = None,
+                 digest: Callable[[str], str] = file_digest, failure_ttl: Optional[float] = None):
+        """
+        path: cache directory
+        max_size: maximal size of cached files in bytes, least recently used entries are evicted first
+        max_age: entries not used for max_age seconds are evicted
+        digest: digest of input file content (e.g. FileManifest.digest)
+        failure_ttl: failed translations are translated again failure_ttl seconds after they failed,
+            None keeps them until they are evicted
+        """
+        self.path = os.path.join(path, 'translations')
+        self.max_size = max_size
+        self.max_age = max_age
+        self.failure_ttl = failure_ttl
+        self._digest = digest
+        self.stats = CacheStatistics()
+        self._manifest_path = os.path.join(self.path, 'manifest.json')
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        """Lock of every key being translated and number of threads holding or waiting for it"""
+        self._last_save = time.time()
+        self._dirty = False
+        self._removed: Set[str] = set()
+        os.makedirs(self.path, exist_ok=True)
+        self._entries: Dict[str, CacheEntry] = self._read_manifest()
+
+    def _read_manifest(self) -> Dict[str, CacheEntry]:
+        try:
+            with open(self._manifest_path) as manifest:
+                return {key: CacheEntry(**entry) for key, entry in json.load(manifest).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError) as e:
+            logger.warning(f'Translation cache manifest {self._manifest_path} is corrupted, ignoring it: {e}')
+            return {}
+
+    @contextmanager
+    def _manifest_file_lock(self):
+        """Lock manifest against other benchmark processes sharing cache"""
+        with open(self._manifest_path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def key(self, translator: Translator, input_file: str) -> str:
+        digest = hashlib.sha256(translator_fingerprint(translator).encode())
+        digest.update(self._digest(input_file).encode())
+        return digest.hexdigest()
+
+    def output_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    @contextmanager
+    def key_lock(self, key: str) -> Iterator[None]:
+        """Lock held while key is translated, so that same file is not translated twice at once.
+        Lock is dropped once no thread holds or waits for it
+        """
+        with self._lock:
+            lock, users = self._key_locks.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._key_locks[key]
+                if users > 1:
+                    self._key_locks[key] = (lock, users - 1)
+                else:
+                    del self._key_locks[key]
+
+    def _usable(self, key: str, entry: CacheEntry) -> bool:
+        """Translated file of entry exists, or failure of entry has not expired yet"""
+        if entry.failed:
+            return self.failure_ttl is None or time.time() - entry.created < self.failure_ttl
+        return os.path.exists(self.output_path(key))
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._usable(key, entry):
+                del self._entries[key]
+                self._removed.add(key)
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if entry.failed:
+                self.stats.failures += 1
+            else:
+                self.stats.hits += 1
+            entry.last_used = time.time()
+            self._dirty = True
+            return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Entry of key, without counting lookup and marking entry as used (e.g. for planning)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._usable(key, entry):
+                return None
+            return entry
+
+    def store(self, key: str, input_path: str, error: Optional[str] = None) -> CacheEntry:
+        """Add entry for translation that was written to output_path(key), or failed translation if error is given"""
+        now = time.time()
+        output = None if error is not None else os.path.relpath(self.output_path(key), self.path)
+        size = os.path.getsize(self.output_path(key)) if output else 0
+        entry = CacheEntry(key=key, input_path=input_path, output=output, error=error, size=size,
+                           created=now, last_used=now)
+        with self._lock:
+            self._entries[key] = entry
+            self._removed.discard(key)
+            self._dirty = True
+        if now - self._last_save > MANIFEST_SAVE_INTERVAL:
+            self.save()
+        return entry
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            with self._manifest_file_lock():
+                # merge entries added by other processes in the meantime
+                entries = self._read_manifest()
+                for key in self._removed:
+                    entries.pop(key, None)
+                for key, entry in self._entries.items():
+                    if key not in entries or entries[key].last_used < entry.last_used:
+                        entries[key] = entry
+                self._entries = entries
+                self._removed.clear()
+                atomic_write(self._manifest_path,
+                             json.dumps({key: asdict(entry) for key, entry in entries.items()}))
+            self._last_save = time.time()
+            self._dirty = False
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        if not entry.failed:
+            try:
+                os.remove(self.output_path(key))
+            except FileNotFoundError:
+                pass
+        self._removed.add(key)
+        self.stats.evicted += 1
+        self._dirty = True
+
+    def evict(self):
+        """Remove entries older than max_age, then least recently used entries until cache fits in max_size"""
+        with self._lock:
+            if self.max_age is not None:
+                oldest_allowed = time.time() - self.max_age
+                for key in [key for key, entry in self._entries.items() if entry.last_used < oldest_allowed]:
+                    self._remove(key)
+            if self.max_size is not None:
+                total_size = sum(entry.size for entry in self._entries.values())
+                for entry in sorted(self._entries.values(), key=lambda entry: entry.last_used):
+                    if total_size <= self.max_size:
+                        break
+                    total_size -= entry.size
+                    self._remove(entry.key)
+
+    def close(self):
+        self.evict()
+        self.save()
+        logger.info(f'Translation cache: {self.stats.hits} hits, {self.stats.misses} misses, '
+                    f'{self.stats.failures} cached failures, {self.stats.evicted} evicted '
+                    f'(hit rate {self.stats.hit_rate:.0%})')
@@ -0,0 +1,135 @@
+"""Bounded capture of process output. Output is read as raw bytes in large chunks,
+only head and tail are kept in memory, the whole stream can be spilled to (compressed) file
+"""
+import gzip
+import os
+import threading
+from typing import Optional, IO, Callable
+
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_SIZE = 64 * 1024
+"""Longer lines are split before passing them to on_line"""
+
+
+class CaptureBuffer:
+    """Keeps first head_size and last tail_size bytes of stream, optionally writes whole stream to spill_path"""
+
+    def __init__(self, head_size: int, tail_size: int, spill_path: Optional[str] = None, compress: bool = False):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.total_bytes = 0
+        self.spill_path = None
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._lock = threading.Lock()
+        self._spill = None
+        if spill_path is not None:
+            os.makedirs(os.path.dirname(spill_path) or '.', exist_ok=True)
+            self.spill_path = spill_path + '.gz' if compress else spill_path
+            # fast compression level, output of provers is very repetitive anyway
+            self._spill = gzip.open(self.spill_path, 'wb', compresslevel=1) if compress else \
+                open(self.spill_path, 'wb')
+
+    def write(self, chunk: bytes):
+        with self._lock:
+            self._write(chunk)
+
+    def _write(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        if self._spill is not None:
+            self._spill.write(chunk)
+        if len(self._head) < self.head_size:
+            taken = self.head_size - len(self._head)
+            self._head += chunk[:taken]
+            chunk = chunk[taken:]
+        if chunk and self.tail_size:
+            self._tail += chunk
+            if len(self._tail) > 2 * self.tail_size:
+                # trim only from time to time, so that trimming cost is amortized over many chunks
+                del self._tail[:-self.tail_size]
+
+    @property
+    def truncated(self) -> bool:
+        """True if some bytes were dropped from memory"""
+        return self.total_bytes > self.head_size + self.tail_size
+
+    def text(self) -> str:
+        """Head and tail of stream, with marker in place of dropped bytes"""
+        with self._lock:
+            return self._text()
+
+    def _text(self) -> str:
+        tail = self._tail[-self.tail_size:] if self.tail_size else b''
+        if not self.truncated:
+            return (bytes(self._head) + bytes(tail)).decode(errors='replace')
+        dropped = self.total_bytes - len(self._head) - len(tail)
+        return f'{self._head.decode(errors="replace")}' \
+               f'\n[... {dropped} bytes truncated ...]\n' \
+               f'{bytes(tail).decode(errors="replace")}'
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class LineSplitter:
+    """Splits chunks of bytes into decoded lines"""
+
+    def __init__(self, on_line: Callable[[str], None]):
+        self.on_line = on_line
+        self._partial = bytearray()
+
+    def feed(self, chunk: bytes):
+        self._partial += chunk
+        *lines, rest = self._partial.split(b'\n')
+        for line in lines:
+            self.on_line(line.decode(errors='replace'))
+        if len(rest) > MAX_LINE_SIZE:
+            self.on_line(rest.decode(errors='replace'))
+            rest = b''
+        self._partial = bytearray(rest)
+
+    def close(self):
+        if self._partial:
+            self.on_line(self._partial.decode(errors='replace'))
+            self._partial = bytearray()
+
+
+class StreamCapture:
+    """Read binary stream in background thread into CaptureBuffer, until writer closes it.
+    If on_line is given, it is called with every line as soon as it is read
+    """
+
+    def __init__(self, stream: IO[bytes], buffer: CaptureBuffer, chunk_size: int = CHUNK_SIZE,
+                 on_line: Optional[Callable[[str], None]] = None):
+        self.buffer = buffer
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._lines = LineSplitter(on_line) if on_line is not None else None
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        fd = self._stream.fileno()
+        try:
+            while chunk := os.read(fd, self._chunk_size):
+                self.buffer.write(chunk)
+                if self._lines is not None:
+                    self._lines.feed(chunk)
+            if self._lines is not None:
+                self._lines.close()
+        finally:
+            self.buffer.close()
+            # stream is closed here and not by process owner, thread might still be reading it
+            # when orphaned descendants of process keep it open
+            self._stream.close()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until whole stream is read. Return False if stream is still open after timeout"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
@@ -1,17 +1,17 @@
 from __future__ import annotations
 
-import glob
 import json
 import logging
 import os
 from dataclasses import dataclass, field
 from enum import Enum, EnumMeta
-from functools import partial
-from typing import Optional, Dict, List, Type, Tuple
+from functools import partial, cached_property
+from typing import Optional, Dict, List, Type, Tuple, Iterator
 
 import dacite
 import yaml
 
+from provers_benchmark.discovery import iter_files, has_match
 from provers_benchmark.errors import BenchmarkConfigException, DaciteArgumentValueError, UnsupportedSolver
 from provers_benchmark.parsers.parsers import get_all_output_parsers
 from provers_benchmark.statistics.stats import MinimalSATStatistics
@@ -79,6 +79,22 @@ def _check_output_mode(output_mode: OutputMode, command: str):
         )
 
 
+def _check_repetitions(config) -> List[BenchmarkConfigException]:
+    """Check repetition settings of GeneralConfig or TestSuite (where they may be None)"""
+    errors = []
+    if config.warmup_runs is not None and config.warmup_runs < 0:
+        errors.append(BenchmarkConfigException('warmup_runs can not be negative',
+                                               field_paths={'warmup_runs': config.warmup_runs}))
+    if config.repetitions is not None and config.repetitions < 1:
+        errors.append(BenchmarkConfigException('at least one repetition is required',
+                                               field_paths={'repetitions': config.repetitions}))
+    if config.max_repetitions is not None and config.max_repetitions < (config.repetitions or 1):
+        errors.append(BenchmarkConfigException('max_repetitions must not be lower than repetitions',
+                                               field_paths={'repetitions': config.repetitions,
+                                                            'max_repetitions': config.max_repetitions}))
+    return errors
+
+
 @dataclass
 class Translator:
     """Translate text to different syntax by calling executable
@@ -95,6 +111,8 @@ class Translator:
     """
     input_mode: InputMode
     output_mode: OutputMode
+    version: str = ''
+    """Bump to invalidate cached translations"""
 
     def validate(self) -> List[BenchmarkConfigException]:
         errors = []
@@ -124,9 +142,29 @@ class TestSuite:
     """Append standard output of command to statistics"""
     save_stderr: bool = True
     """Append standard error of command to statistics"""
+    output_head_kb: int = 64
+    """Only first output_head_kb and last output_tail_kb of stdout and stderr are kept in memory (and statistics)"""
+    output_tail_kb: int = 64
+    spill_output: bool = False
+    """Write whole stdout and stderr to files in general.spilled_output_path"""
+    compress_spilled_output: bool = True
+    terminate_after_verdict: Optional[float] = None
+    """Kill prover that is still running this many seconds after it printed verdict, None to let it finish"""
+    memory_limit: Optional[int] = None
+    """Memory limit in MB of this test suite, None to use general.memory_limit"""
+    cpu_limit: Optional[int] = None
+    """CPU time limit in seconds of this test suite, None to use general.cpu_limit"""
+    warmup_runs: Optional[int] = None
+    """Repetition settings of this test suite, see GeneralConfig. None to use the general ones"""
+    repetitions: Optional[int] = None
+    max_repetitions: Optional[int] = None
+    target_ci_width: Optional[float] = None
+    repetition_budget: Optional[float] = None
+    standalone: bool = True
+    """Run test suite on its own, set to False for test suites that should run only as members of portfolios"""
 
     def validate(self) -> List[BenchmarkConfigException]:
-        errors = []
+        errors = _check_repetitions(self)
         if not which(command_name(self.command)):
             errors.append(BenchmarkConfigException(f'command is not found',
                                                    field_paths={'command': self.command}))
@@ -140,6 +178,42 @@ class TestSuite:
         return errors
 
 
+@dataclass
+class Portfolio:
+    """Test suites raced on the same input: they run concurrently, the first SAT/UNSAT verdict wins
+    and the other members are killed
+    """
+    name: str
+    """Unique name, also among test suites"""
+    test_suites: List[str]
+    """Names of member test suites, at least two"""
+    version: str = ''
+    members: List[TestSuite] = field(default_factory=list, init=False, repr=False)
+    """Member test suites, resolved from test_suites by BenchmarkConfig"""
+
+    @property
+    def command(self) -> str:
+        return ' & '.join(member.command for member in self.members)
+
+    def validate(self, test_suites: List[TestSuite]) -> List[BenchmarkConfigException]:
+        errors = []
+        if len(self.test_suites) < 2:
+            errors.append(BenchmarkConfigException('portfolio needs at least two test suites',
+                                                   field_paths={'test_suites': self.test_suites}))
+        if len(set(self.test_suites)) != len(self.test_suites):
+            errors.append(BenchmarkConfigException('test suites of portfolio must be unique',
+                                                   field_paths={'test_suites': self.test_suites}))
+        names = {test_suite.name for test_suite in test_suites}
+        for name in self.test_suites:
+            if name not in names:
+                errors.append(BenchmarkConfigException(f'test suite "{name}" is not defined',
+                                                       field_paths={'test_suites': self.test_suites}))
+        if self.name in names:
+            errors.append(BenchmarkConfigException(f'name "{self.name}" is already used by test suite',
+                                                   field_paths={'name': self.name}))
+        return errors
+
+
 @dataclass
 class TestInput:
     patterns: List[str]
@@ -155,20 +229,25 @@ class TestInput:
     def validate(self) -> List[BenchmarkConfigException]:
         errors = []
         for pattern in self.patterns:
-            if not glob.glob(pattern, recursive=True):
+            if not has_match(pattern):
                 errors.append(BenchmarkConfigException(f'file pattern {pattern} did not match any files',
-                                                       field_paths={'files': self.files}))
+                                                       field_paths={'patterns': self.patterns}))
 
         return errors
 
-    @property
-    def files(self):
-        files = []
-        for pattern in self.patterns:
-            files.extend(glob.glob(pattern, recursive=True))
-        return files
+    def iter_files(self) -> Iterator[str]:
+        """Files matching patterns, directories are walked only as files are consumed"""
+        return iter_files(self.patterns)
+
+    @cached_property
+    def files(self) -> List[str]:
+        """Files matching patterns, discovered on first access"""
+        return list(self.iter_files())
 
     def get_file_statistics(self, file_path: str) -> Tuple[MinimalSATStatistics, Dict]:
+        """Minimal statistics and formula statistics precomputed in <file>.json (empty if there is no such file,
+        see provers_benchmark.features for built-in extraction)
+        """
         min_stats = MinimalSATStatistics(name=self.name, path=file_path, format=self.format)
 
         try:
@@ -176,8 +255,7 @@ class TestInput:
                 formula_info = json.load(formula_info_file)
             return min_stats, formula_info
         except FileNotFoundError:
-            logger.warning(
-                f'Statistics for {os.path.abspath(file_path)} not available (not found file {os.path.abspath(file_path)}.json)')
+            logger.debug(f'Precomputed statistics for {os.path.abspath(file_path)} not available')
 
         return min_stats, {}
 
@@ -188,7 +266,99 @@ class GeneralConfig:
     result_each_input_to_separate_file: bool = False
     result_as_json: bool = True
     result_as_csv: bool = True
+    result_as_npz: bool = False
+    """Also save results in columnar numpy format (.npz), requires numpy"""
+    result_database: Optional[str] = None
+    """SQLite database (see provers_benchmark.store) to which results are added after benchmark finishes"""
+    result_fsync_every: int = 10
+    """Results stream is synced to disk after this many finished tests"""
+    status_path: Optional[str] = None
+    """Json file with live progress (jobs done, running and queued, throughput, ETA, status counts, cache hit rates),
+    rewritten every status_interval seconds
+    """
+    status_interval: float = 60
+    """Seconds between progress reports (log line and status file)"""
+    metrics_port: Optional[int] = None
+    """Serve live progress in Prometheus text format on http://metrics_host:metrics_port/metrics"""
+    metrics_host: str = '127.0.0.1'
+    """Address metrics are served on, 0.0.0.0 to make them reachable from other machines"""
     test_timeout: int = 300
+    memory_limit: Optional[int] = None
+    """Memory limit in MB of each test (whole process tree with cgroups, otherwise address space of each process),
+    None for no limit
+    """
+    cpu_limit: Optional[int] = None
+    """CPU time limit in seconds of each test, None for no limit. Each process gets RLIMIT_CPU and cpu time of whole
+    process tree is checked whenever it is sampled, test that exceeded it ends with timeout
+    """
+    kill_grace_period: float = 1
+    """Test that exceeded a limit gets SIGTERM (with its whole process group), SIGKILL if it is still running
+    this many seconds later
+    """
+    jobs: int = 1
+    """Number of tests run concurrently"""
+    cores_per_job: int = 1
+    """Each concurrently running test is pinned to this many cores, 0 disables pinning"""
+    async_harness: bool = False
+    """Supervise all running tests from one asyncio event loop instead of a thread (and two output reader threads)
+    per test, cheaper with hundreds of tests running at once
+    """
+    sampling_interval: float = 0.1
+    """Seconds between resource usage samples of running test, 0 disables sampling"""
+    record_timeseries: bool = False
+    """Record every resource sample of each test (memory, cpu, threads, io over time) to timeseries_path"""
+    timeseries_path: str = 'timeseries'
+    timeseries_max_points: int = 4096
+    """Longer time series are downsampled"""
+    use_cgroups: bool = True
+    """Run each test in its own cgroup v2 to account resources of whole process tree. 
+    If cgroups are not delegated, resources are accounted with rusage of reaped process
+    """
+    cgroup_root: Optional[str] = None
+    """Delegated cgroup in which cgroups for tests are created, by default cgroup of benchmark process"""
+    translation_jobs: int = 1
+    """Number of translations run concurrently, ahead of benchmarking"""
+    translation_queue_depth: int = 100
+    """How many tests ahead of currently benchmarked ones get their input translated"""
+    spilled_output_path: str = 'outputs'
+    """Directory with whole outputs of test suites with spill_output"""
+    cache_path: str = CACHE_LOCATION
+    """Directory with cached translations"""
+    cache_max_size: Optional[int] = None
+    """Maximal size of translation cache in MB, least recently used translations are evicted first"""
+    cache_max_age: Optional[int] = None
+    """Translations not used for this many days are evicted from cache"""
+    cache_failure_ttl: Optional[float] = 24
+    """Failed translations are retried this many hours after they failed, None keeps failures cached until evicted
+    (translations killed by a signal are never cached)
+    """
+    extract_features: bool = True
+    """Extract input_formula_statistics of TPTP, LADR and DIMACS inputs that have no precomputed <file>.json.
+    Features are cached in features.db in cache_path
+    """
+    feature_jobs: int = 1
+    """Processes extracting features ahead of tests, 0 extracts them in test threads"""
+    input_manifest_path: Optional[str] = None
+    """SQLite file with size, mtime and digest of input files, so that unchanged files are not read again to
+    compute keys of tests and translations. Default: files.db in cache_path
+    """
+    lease_time: float = 60
+    """In distributed mode, job of worker that did not send heartbeat for this many seconds is run by other worker"""
+    warmup_runs: int = 0
+    """Runs of each test before the measured ones, they are not recorded"""
+    repetitions: int = 1
+    """Measured runs of each test, in adaptive mode the minimal number of them"""
+    max_repetitions: Optional[int] = None
+    """Enables adaptive mode: test is repeated until 95% confidence interval of mean execution time is narrower than
+    target_ci_width, but at most max_repetitions times
+    """
+    target_ci_width: float = 0.02
+    """Half-width of confidence interval relative to mean, 0.02 means mean +- 2%"""
+    repetition_budget: Optional[float] = None
+    """No more repetitions of test are started after this many seconds of measured runs"""
+
+    def validate(self) -> List[BenchmarkConfigException]:
+        return _check_repetitions(self)
 
 
 @dataclass
@@ -197,9 +367,20 @@ class BenchmarkConfig:
     test_inputs: List[TestInput]
     test_suites: List[TestSuite]
     translators: Optional[List[Translator]] = field(default_factory=list)
+    portfolios: List[Portfolio] = field(default_factory=list)
+    """Groups of test suites raced on each input, see Portfolio"""
+
+    def __post_init__(self):
+        test_suites = {test_suite.name: test_suite for test_suite in self.test_suites}
+        for portfolio in self.portfolios:
+            portfolio.members = [test_suites[name] for name in portfolio.test_suites if name in test_suites]
 
     def validate(self) -> List[BenchmarkConfigException]:
         errors = []
+        for e in self.general.validate():
+            e.update_field_path('general')
+            errors.append(e)
+
         for t in self.translators:
             for e in t.validate():
                 e.update_field_path('translators')
@@ -223,6 +404,19 @@ class BenchmarkConfig:
                 e.update_field_path('test_inputs')
                 errors.append(e)
 
+        for p in self.portfolios:
+            for e in p.validate(self.test_suites):
+                e.update_field_path('portfolios')
+                errors.append(e)
+
+        portfolio_names = [p.name for p in self.portfolios]
+        repeated_names = {'name': name for name in set(portfolio_names) if portfolio_names.count(name) > 1}
+        if repeated_names:
+            e = BenchmarkConfigException(f'value portfolio.name must be unique',
+                                         field_paths=repeated_names)
+            e.update_field_path('portfolios')
+            errors.append(e)
+
         for test_suite in self.test_suites:
             for test_input in self.test_inputs:
                 if test_suite.required_format != test_input.format and not find_translator(
@@ -0,0 +1,118 @@
+"""Discovery of input files: patterns are walked lazily, and size, mtime and content digest of every file
+are kept in a persistent manifest, so unchanged files are not read again in later runs
+"""
+import glob
+import logging
+import os
+import sqlite3
+import threading
+from typing import Iterable, Iterator, Dict, Optional, List, Tuple
+
+from provers_benchmark.utils import file_digest
+
+logger = logging.getLogger('ProverBenchmark')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+'''
+
+WRITE_BATCH = 1000
+"""Changed manifest entries are written in transactions of this many files"""
+
+
+def iter_files(patterns: Iterable[str]) -> Iterator[str]:
+    """Files matching patterns (recursive wildcards supported) in the order of patterns, directories are skipped.
+    Directories are read only as files are consumed
+    """
+    for pattern in patterns:
+        for path in glob.iglob(pattern, recursive=True):
+            if not os.path.isdir(path):
+                yield path
+
+
+def has_match(pattern: str) -> bool:
+    """Whether pattern matches any file, stops at the first one"""
+    return next(iter_files([pattern]), None) is not None
+
+
+class FileManifest:
+    """Path, size, mtime and sha256 of input files in SQLite file. Digest is computed again only for files
+    whose size or mtime changed since it was recorded. Safe to use from several threads
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._verified: Dict[str, str] = {}
+        """Digests of files already checked in this run, the files are not expected to change during benchmark"""
+        self._pending: List[Tuple[str, int, int, str]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, path: str) -> str:
+        """sha256 of file content, from manifest if file did not change"""
+        absolute = os.path.abspath(path)
+        with self._lock:
+            if (digest := self._verified.get(absolute)) is not None:
+                return digest
+            stat = os.stat(absolute)
+            row = self._connection.execute('SELECT size, mtime_ns, digest FROM files WHERE path = ?',
+                                           (absolute,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            digest = row[2]
+            with self._lock:
+                self.hits += 1
+                self._verified[absolute] = digest
+            return digest
+        # hashing is done outside of lock, so that threads hash different files at once
+        digest = file_digest(absolute)
+        with self._lock:
+            self.misses += 1
+            self._verified[absolute] = digest
+            self._pending.append((absolute, stat.st_size, stat.st_mtime_ns, digest))
+            if len(self._pending) >= WRITE_BATCH:
+                self._write_pending()
+        return digest
+
+    def _write_pending(self):
+        with self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) '
+                                         'VALUES (?, ?, ?, ?)', self._pending)
+        self._pending.clear()
+
+    def get(self, path: str) -> Optional[Tuple[int, int, str]]:
+        """Recorded (size, mtime_ns, digest) of file, without checking whether it changed"""
+        with self._lock:
+            return self._connection.execute('SELECT size, mtime_ns, digest FROM files WHERE path = ?',
+                                            (os.path.abspath(path),)).fetchone()
+
+    def count(self, patterns: Iterable[str]) -> int:
+        """Recorded files matching patterns, without walking any directory. It is only an estimate: files may have
+        been added or removed since they were recorded, and wildcards also match across directories
+        """
+        # * of SQLite GLOB matches any characters, including path separator
+        globs = [os.path.abspath(pattern).replace('**/', '*').replace('**', '*') for pattern in patterns]
+        with self._lock:
+            return sum(self._connection.execute('SELECT COUNT(*) FROM files WHERE path GLOB ?',
+                                                (pattern,)).fetchone()[0] for pattern in globs)
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write_pending()
+
+    def close(self):
+        self.flush()
+        if self.hits or self.misses:
+            logger.info(f'Input manifest {self.path}: {self.hits} files unchanged, {self.misses} files hashed')
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,278 @@
+"""Distributed execution. Coordinator puts jobs to a durable queue in SQLite file on storage shared by all nodes,
+workers (started with the same config) lease jobs from it, run them and put results back.
+Workers renew their leases with heartbeats, jobs of worker that stopped sending them are run by other workers
+"""
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Dict, Callable, Iterable, Iterator
+
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.resume import job_key
+from provers_benchmark.scheduler import Job, ResultCallback, available_cores
+from provers_benchmark.statistics.stats import TestRunStatistics, HardwareStatistics
+from provers_benchmark.utils import file_digest
+
+logger = logging.getLogger('ProverBenchmark')
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    job_index INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, job_index);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    test_run TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+def worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class WorkQueue:
+    """Jobs (identified by their keys) and results in SQLite file. Every change is a short transaction,
+    so queue can be shared by many processes, also on different nodes if file system supports POSIX locks
+    """
+
+    def __init__(self, path: str, lease_time: float = 60):
+        """lease_time: seconds after which job of worker that did not send heartbeat can be leased again"""
+        self.path = path
+        self.lease_time = lease_time
+        # autocommit mode, transactions are started explicitly
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        # connection is shared by worker threads
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def reset(self):
+        with self._transaction() as connection:
+            for table in ('jobs', 'results', 'meta'):
+                connection.execute(f'DELETE FROM {table}')
+
+    def enqueue(self, jobs: Iterable[Job]):
+        """Add jobs, jobs that are already done stay done. Unfinished jobs that are not among given ones
+        (e.g. from older version of config) are removed
+        """
+        with self._transaction() as connection:
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS current (key TEXT PRIMARY KEY)')
+            connection.execute('DELETE FROM current')
+            rows = [(job.key, job.index) for job in jobs]
+            connection.executemany('INSERT OR IGNORE INTO current (key) VALUES (?)', ((key,) for key, _ in rows))
+            connection.execute(f"DELETE FROM jobs WHERE state != '{DONE}' AND key NOT IN (SELECT key FROM current)")
+            connection.executemany('INSERT INTO jobs (key, job_index) VALUES (?, ?) '
+                                   'ON CONFLICT (key) DO UPDATE SET job_index = excluded.job_index', rows)
+
+    def lease(self, worker: str) -> Optional[Tuple[str, int]]:
+        """Lease next pending job (or job with expired lease), return its key and index"""
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(f"SELECT key, job_index FROM jobs WHERE state = '{PENDING}' "
+                                     f"OR (state = '{LEASED}' AND lease_expires < ?) "
+                                     f"ORDER BY job_index LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            connection.execute(f"UPDATE jobs SET state = '{LEASED}', worker = ?, lease_expires = ?, "
+                               f"attempts = attempts + 1 WHERE key = ?", (worker, now + self.lease_time, row[0]))
+        return row
+
+    def heartbeat(self, worker: str):
+        """Renew leases of all jobs of worker"""
+        with self._transaction() as connection:
+            connection.execute(f"UPDATE jobs SET lease_expires = ? WHERE worker = ? AND state = '{LEASED}'",
+                               (time.time() + self.lease_time, worker))
+
+    def complete(self, worker: str, key: str, test_run: TestRunStatistics):
+        """Store result of job. Result of job that was already completed by other worker (after lease expired) is
+        dropped
+        """
+        with self._transaction() as connection:
+            row = connection.execute('SELECT state, worker FROM jobs WHERE key = ?', (key,)).fetchone()
+            if row is None or row[0] == DONE:
+                logger.warning(f'Dropping result of job {key}, it is already done (or no longer in queue)')
+                return
+            connection.execute('INSERT INTO results (key, worker, test_run) VALUES (?, ?, ?)',
+                               (key, worker, test_run.to_json()))
+            connection.execute(f"UPDATE jobs SET state = '{DONE}', worker = ? WHERE key = ?", (worker, key))
+
+    def fail_leased(self, worker: str, keys: Optional[Iterable[str]] = None) -> int:
+        """Mark jobs still leased by worker (only given ones if keys are given) as failed, they are not run again"""
+        with self._transaction() as connection:
+            if keys is None:
+                cursor = connection.execute(f"UPDATE jobs SET state = '{FAILED}' "
+                                            f"WHERE worker = ? AND state = '{LEASED}'", (worker,))
+            else:
+                cursor = connection.executemany(f"UPDATE jobs SET state = '{FAILED}' "
+                                                f"WHERE worker = ? AND state = '{LEASED}' AND key = ?",
+                                                ((worker, key) for key in keys))
+            return cursor.rowcount
+
+    def release(self, worker: str, key: str):
+        """Return leased job to queue, so that other worker can run it"""
+        with self._transaction() as connection:
+            connection.execute(f"UPDATE jobs SET state = '{PENDING}', worker = NULL "
+                               f"WHERE worker = ? AND state = '{LEASED}' AND key = ?", (worker, key))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        with self._lock:
+            return dict(self._connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+
+    def finished(self) -> bool:
+        counts = self.counts()
+        return not counts.get(PENDING) and not counts.get(LEASED)
+
+    def results_after(self, result_id: int) -> List[Tuple[int, str, str, str]]:
+        """(id, job key, worker, test run json) of results stored after result_id"""
+        with self._lock:
+            return self._connection.execute('SELECT id, key, worker, test_run FROM results WHERE id > ? ORDER BY id',
+                                            (result_id,)).fetchall()
+
+    def get_meta(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, name: str, value: str):
+        with self._transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+JobsRunner = Callable[[Iterable[Job], ResultCallback], None]
+
+
+def run_worker(queue: WorkQueue, jobs: List[Job], timeout: int, run: JobsRunner, poll_interval: float = 1,
+               digest: Callable[[str], str] = file_digest):
+    """Run jobs leased from queue until all jobs in queue are finished. jobs are all jobs expanded from config,
+    it must be the same config coordinator uses
+    """
+    worker = worker_id()
+    hardware = HardwareStatistics()
+    jobs_by_index = {job.index: job for job in jobs}
+    stopped = threading.Event()
+    leased = []
+    in_flight = set()
+
+    def send_heartbeats():
+        while not stopped.wait(queue.lease_time / 3):
+            queue.heartbeat(worker)
+
+    def leased_jobs() -> Iterator[Job]:
+        while (lease := queue.lease(worker)) is not None:
+            key, index = lease
+            job = jobs_by_index.get(index)
+            if job is not None:
+                job.input_digest = digest(job.file)
+                job.key = job_key(job, timeout=timeout, input_digest=job.input_digest)
+            if job is None or job.key != key:
+                queue.release(worker, key)
+                raise BenchmarkException(f'Job {index} in queue {queue.path} does not match config of worker, '
+                                         f'worker must use the same config (and input files) as coordinator')
+            leased.append(key)
+            in_flight.add(key)
+            yield job
+
+    def on_result(job: Job, test_run: TestRunStatistics):
+        test_run.worker = worker
+        test_run.hardware = hardware
+        queue.complete(worker, job.key, test_run)
+        in_flight.discard(job.key)
+
+    logger.info(f'Worker {worker} is taking jobs from {queue.path}')
+    threading.Thread(target=send_heartbeats, daemon=True).start()
+    try:
+        while not queue.finished():
+            leased.clear()
+            in_flight.clear()
+            run(leased_jobs(), on_result)
+            if in_flight:
+                # jobs that raised exception, running them again would most likely fail again
+                logger.error(f'{queue.fail_leased(worker, in_flight)} job(s) failed on worker {worker}')
+            if not leased:
+                # remaining jobs are leased by other workers, wait whether their leases expire
+                time.sleep(poll_interval)
+    finally:
+        stopped.set()
+    logger.info(f'Worker {worker} is done, no jobs left in queue')
+
+
+def start_local_workers(command: List[str], count: int) -> List[subprocess.Popen]:
+    """Start worker processes on this machine, each of them pinned to its own share of cores"""
+    cores = available_cores()
+    share = max(len(cores) // max(count, 1), 1)
+    workers = []
+    for i in range(count):
+        worker_cores = set(cores[i * share:(i + 1) * share] or cores)
+        workers.append(subprocess.Popen(command, preexec_fn=lambda cores=worker_cores: os.sched_setaffinity(0, cores)))
+    return workers
+
+
+def run_coordinator(queue: WorkQueue, jobs: List[Job], on_result: ResultCallback, resume: bool = False,
+                    local_workers: Optional[List[str]] = None, local_worker_count: int = 0, poll_interval: float = 1):
+    """Put jobs to queue and pass results of workers to on_result (in the order they were stored),
+    until all jobs are finished. With resume, jobs done in previous run of coordinator are kept in queue
+    """
+    if not resume:
+        queue.reset()
+    queue.enqueue(jobs)
+    jobs_by_key = {job.key: job for job in jobs}
+    counts = queue.counts()
+    logger.info(f'Queue {queue.path}: {counts.get(PENDING, 0)} jobs pending, {counts.get(DONE, 0)} done')
+    workers = start_local_workers(local_workers, local_worker_count) if local_workers else []
+    # results are passed on exactly once, even when coordinator is restarted
+    cursor = int(queue.get_meta('passed_results', '0'))
+    try:
+        while True:
+            finished = queue.finished()
+            for result_id, key, worker, test_run in queue.results_after(cursor):
+                if job := jobs_by_key.get(key):
+                    on_result(job, TestRunStatistics.from_json(test_run))
+                cursor = result_id
+            queue.set_meta('passed_results', str(cursor))
+            if finished:
+                break
+            if workers and all(worker.poll() is not None for worker in workers):
+                logger.warning('All local workers exited, waiting for remote workers')
+                workers = []
+            time.sleep(poll_interval)
+    finally:
+        for worker in workers:
+            if worker.wait() != 0:
+                logger.error(f'Local worker {worker.pid} exited with {worker.returncode}')
+    if failed := queue.counts().get(FAILED):
+        logger.error(f'{failed} job(s) failed on workers')
@@ -9,6 +9,10 @@ class BenchmarkException(Exception):
     pass
 
 
+class TranslationError(BenchmarkException):
+    pass
+
+
 class BenchmarkConfigException(BenchmarkException):
     def __init__(self, *args: object, field_paths: Dict[str, Any] = None) -> None:
         self.field_paths = field_paths if field_paths is not None else {}
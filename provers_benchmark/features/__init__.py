@@ -0,0 +1,15 @@
+"""Features of input formulas (clause, literal, atom, variable and symbol counts, ratios, term depth)
+extracted in one pass over TPTP, LADR and DIMACS files
+"""
+from .dimacs import dimacs_features
+from .extractor import FeatureExtractor, extract_features, is_supported
+from .formulas import tptp_features, ladr_features
+
+__all__ = [
+    'FeatureExtractor',
+    'extract_features',
+    'is_supported',
+    'tptp_features',
+    'ladr_features',
+    'dimacs_features',
+]
@@ -0,0 +1,69 @@
+from dataclasses import dataclass, field
+from typing import Set, Tuple, Dict, Union, Iterable
+
+
+@dataclass
+class FeatureCounter:
+    """Statistics accumulated formula by formula, so memory does not grow with size of input
+    (only with number of distinct symbols)
+    """
+    formulas: int = 0
+    """All formulas, clauses included"""
+    clauses: int = 0
+    """Formulas that are disjunctions of literals"""
+    unit_clauses: int = 0
+    horn_clauses: int = 0
+    literals: int = 0
+    positive_literals: int = 0
+    negative_literals: int = 0
+    max_clause_length: int = 0
+    atoms: int = 0
+    equality_atoms: int = 0
+    variables: int = 0
+    """Sum of numbers of distinct variables of formulas"""
+    variable_occurrences: int = 0
+    max_term_depth: int = 0
+    quantifiers: int = 0
+    includes: int = 0
+    unparsed_formulas: int = 0
+    predicates: Dict[Tuple[str, int], int] = field(default_factory=dict)
+    """Predicate symbols with their arities -> number of occurrences"""
+    functions: Set[Tuple[str, int]] = field(default_factory=set)
+    """Function symbols with their arities, constants have arity 0"""
+
+    def add_predicate(self, predicate: Tuple[str, int]):
+        if not predicate[0].startswith('$'):
+            self.predicates[predicate] = self.predicates.get(predicate, 0) + 1
+
+    def remove_predicate(self, predicate: Tuple[str, int]):
+        if predicate in self.predicates:
+            self.predicates[predicate] -= 1
+            if not self.predicates[predicate]:
+                del self.predicates[predicate]
+
+    def add_clause(self, polarities: Iterable[bool]):
+        length = positive = 0
+        for polarity in polarities:
+            length += 1
+            positive += polarity
+        self.clauses += 1
+        self.literals += length
+        self.positive_literals += positive
+        self.negative_literals += length - positive
+        self.unit_clauses += length == 1
+        self.horn_clauses += positive <= 1
+        self.max_clause_length = max(self.max_clause_length, length)
+
+    def features(self) -> Dict[str, Union[int, float]]:
+        features = {name: getattr(self, name) for name in (
+            'formulas', 'clauses', 'unit_clauses', 'horn_clauses', 'literals', 'positive_literals',
+            'negative_literals', 'max_clause_length', 'atoms', 'equality_atoms', 'variables', 'variable_occurrences',
+            'max_term_depth', 'quantifiers', 'includes', 'unparsed_formulas')}
+        features['predicate_symbols'] = len(self.predicates)
+        features['function_symbols'] = sum(1 for _, arity in self.functions if arity > 0)
+        features['constant_symbols'] = sum(1 for _, arity in self.functions if arity == 0)
+        features['literals_per_clause'] = self.literals / self.clauses if self.clauses else 0.0
+        features['clause_variable_ratio'] = self.clauses / self.variables if self.variables else 0.0
+        features['horn_ratio'] = self.horn_clauses / self.clauses if self.clauses else 0.0
+        features['equality_ratio'] = self.equality_atoms / self.atoms if self.atoms else 0.0
+        return features
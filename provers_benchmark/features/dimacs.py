@@ -0,0 +1,48 @@
+"""One pass feature extraction of propositional problems in DIMACS CNF format"""
+from typing import Iterable, Dict, Union
+
+from provers_benchmark.features.counter import FeatureCounter
+
+
+def dimacs_features(lines: Iterable[str]) -> Dict[str, Union[int, float]]:
+    """Features of DIMACS CNF problem. Clauses may span lines, variables used but not declared are counted too"""
+    counter = FeatureCounter()
+    declared_variables = declared_clauses = 0
+    used = bytearray()
+    clause_length = positive = 0
+    for line in lines:
+        if line[:1] in ('c', '%'):
+            continue
+        if line[:1] == 'p':
+            fields = line.split()
+            if len(fields) >= 4:
+                declared_variables, declared_clauses = int(fields[2]), int(fields[3])
+                used.extend(bytes(max(declared_variables + 1 - len(used), 0)))
+            continue
+        for literal in map(int, line.split()):
+            if literal == 0:
+                if clause_length:
+                    counter.clauses += 1
+                    counter.literals += clause_length
+                    counter.positive_literals += positive
+                    counter.unit_clauses += clause_length == 1
+                    counter.horn_clauses += positive <= 1
+                    counter.max_clause_length = max(counter.max_clause_length, clause_length)
+                clause_length = positive = 0
+                continue
+            variable = abs(literal)
+            if variable >= len(used):
+                used.extend(bytes(variable + 1 - len(used)))
+            used[variable] = 1
+            clause_length += 1
+            positive += literal > 0
+    counter.negative_literals = counter.literals - counter.positive_literals
+    counter.formulas = counter.clauses
+    counter.atoms = counter.literals
+    counter.variable_occurrences = counter.literals
+    used_variables = used.count(1)
+    counter.variables = max(declared_variables, used_variables)
+    features = counter.features()
+    features['used_variables'] = used_variables
+    features['declared_clauses'] = declared_clauses
+    return features
@@ -0,0 +1,148 @@
+"""Features of input files extracted in a process pool ahead of tests, cached on content digest"""
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from provers_benchmark.features.dimacs import dimacs_features
+from provers_benchmark.features.formulas import tptp_features, ladr_features
+from provers_benchmark.scheduler import Job
+from provers_benchmark.utils import file_digest
+
+logger = logging.getLogger('ProverBenchmark')
+
+Features = Dict[str, Union[int, float]]
+
+EXTRACTORS: Dict[str, Callable[[Iterable[str]], Features]] = {
+    'tptp': tptp_features,
+    'ladr': ladr_features,
+    'dimacs': dimacs_features,
+    'cnf': dimacs_features,
+}
+"""Lower case input format -> extractor"""
+
+EXTRACTOR_VERSION = 1
+"""Bump when extracted features change, cached features of older version are not used"""
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS features (
+    digest TEXT NOT NULL,
+    format TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    features TEXT NOT NULL,
+    PRIMARY KEY (digest, format, version)
+);
+'''
+
+
+def is_supported(input_format: str) -> bool:
+    return input_format.lower() in EXTRACTORS
+
+
+def extract_features(path: str, input_format: str) -> Features:
+    """Features of file in given format, file is read line by line"""
+    with open(path, errors='replace') as file:
+        return EXTRACTORS[input_format.lower()](file)
+
+
+class FeatureExtractor:
+    """Extracts features of input files in worker processes (or in calling thread if workers is 0) and caches them
+    in SQLite file, keyed on content digest and format, so every file is parsed once across runs
+    """
+
+    def __init__(self, path: str, workers: int = 1, queue_depth: int = 100,
+                 digest: Callable[[str], str] = file_digest):
+        """
+        path: SQLite file with cached features
+        queue_depth: how many jobs ahead features are extracted by prefetch
+        digest: digest of input file content (e.g. FileManifest.digest)
+        """
+        self.path = path
+        self.queue_depth = queue_depth
+        self._digest = digest
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        # forkserver, forking benchmark process with its running threads is not safe
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) \
+            if workers > 0 else None
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, digest: str, input_format: str) -> Optional[Features]:
+        row = self._connection.execute('SELECT features FROM features WHERE digest = ? AND format = ? AND version = ?',
+                                       (digest, input_format, EXTRACTOR_VERSION)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _store(self, key: Tuple[str, str], future: Future):
+        with self._lock:
+            del self._pending[key]
+            if future.exception() is None:
+                with self._connection:
+                    self._connection.execute('INSERT OR REPLACE INTO features (digest, format, version, features) '
+                                             'VALUES (?, ?, ?, ?)',
+                                             (*key, EXTRACTOR_VERSION, json.dumps(future.result())))
+
+    def submit(self, path: str, input_format: str) -> Optional[Future]:
+        """Start extraction of features of file (if they are not cached), None if format is not supported"""
+        if not is_supported(input_format):
+            return None
+        input_format = input_format.lower()
+        key = (self._digest(path), input_format)
+        with self._lock:
+            if (future := self._pending.get(key)) is not None:
+                return future
+            features = self._cached(*key)
+            future = Future()
+            if features is not None:
+                self.hits += 1
+                future.set_result(features)
+                return future
+            self.misses += 1
+            if self._executor is not None:
+                future = self._executor.submit(extract_features, path, input_format)
+            self._pending[key] = future
+        if self._executor is None:
+            try:
+                future.set_result(extract_features(path, input_format))
+            except Exception as e:
+                future.set_exception(e)
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def features(self, path: str, input_format: str) -> Features:
+        """Features of file, empty if format is not supported or extraction failed"""
+        future = self.submit(path, input_format)
+        if future is None:
+            return {}
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f'Extracting features of {path} failed: {e}')
+            return {}
+
+    def prefetch(self, jobs: Iterable[Job]) -> Iterator[Job]:
+        """Yield jobs, while features of inputs of next queue_depth jobs are already being extracted"""
+        ahead = deque()
+        for job in jobs:
+            self.submit(job.file, job.test_input.format)
+            ahead.append(job)
+            if len(ahead) > self.queue_depth:
+                yield ahead.popleft()
+        yield from ahead
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self.hits or self.misses:
+            logger.info(f'Formula features: {self.misses} files parsed, {self.hits} lookups served from cache')
+        with self._lock:
+            self._connection.close()
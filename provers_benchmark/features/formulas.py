@@ -0,0 +1,336 @@
+"""One pass feature extraction of first-order problems in TPTP (cnf, fof) and LADR syntax.
+Input is tokenized line by line and parsed formula by formula, only the current formula is kept in memory
+"""
+import re
+from itertools import chain
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, List, Tuple, Dict, Union, FrozenSet, Callable, Set, Pattern
+
+from provers_benchmark.features.counter import FeatureCounter
+
+_TOKEN = r"""
+    %.*
+   |({quoted}
+   |\$*\w+
+   |<=>|<~>|<->|=>|->|<=|<-|~\||~&|!=|[^\w\s])
+"""
+"""Comments match with empty group, whitespace does not match at all"""
+_SINGLE_QUOTED = r"'(?:[^'\\]|\\.)*'"
+_DOUBLE_QUOTED = r'"(?:[^"\\]|\\.)*"'
+_TPTP_TOKEN = re.compile(_TOKEN.format(quoted=f'{_SINGLE_QUOTED}|{_DOUBLE_QUOTED}'), re.VERBOSE)
+# in LADR ' is postfix operator (e.g. inverse x')
+_LADR_TOKEN = re.compile(_TOKEN.format(quoted=_DOUBLE_QUOTED), re.VERBOSE)
+
+
+def _strip_block_comments(lines: Iterable[str]) -> Iterator[str]:
+    in_comment = False
+    for line in lines:
+        if not in_comment and '/*' not in line:
+            yield line
+            continue
+        parts = []
+        position = 0
+        while position < len(line):
+            if in_comment:
+                end = line.find('*/', position)
+                if end < 0:
+                    break
+                in_comment = False
+                position = end + 2
+            else:
+                start = line.find('/*', position)
+                if start < 0:
+                    parts.append(line[position:])
+                    break
+                parts.append(line[position:start])
+                in_comment = True
+                position = start + 2
+        yield ' '.join(parts)
+
+
+def tokenize(lines: Iterable[str], token_pattern: Pattern = _TPTP_TOKEN) -> Iterator[str]:
+    """Tokens of lines, lines are split by regular expression at once (not token by token) for speed"""
+    return filter(None, chain.from_iterable(map(token_pattern.findall, _strip_block_comments(lines))))
+
+
+@dataclass(frozen=True)
+class Dialect:
+    negation: str
+    disjunction: str
+    binary: FrozenSet[str]
+    """Binary connectives"""
+    quantifiers: FrozenSet[str]
+    is_variable: Callable[[str], bool]
+    term_operators: bool
+    """Whether terms can be built with infix operators (e.g. x * y) and postfix ' """
+
+
+TPTP = Dialect(negation='~', disjunction='|',
+               binary=frozenset({'|', '&', '=>', '<=', '<=>', '<~>', '~|', '~&'}),
+               quantifiers=frozenset({'!', '?'}),
+               is_variable=lambda token: token[0].isupper() or token[0] == '_',
+               term_operators=False)
+
+LADR = Dialect(negation='-', disjunction='|',
+               binary=frozenset({'|', '&', '->', '<-', '<->'}),
+               quantifiers=frozenset({'all', 'exists'}),
+               # default LADR convention: free variables start with u - z
+               is_variable=lambda token: 'u' <= token[0] <= 'z',
+               term_operators=True)
+
+_NOT_TERM_OPERATORS = {'(', ')', '[', ']', ',', '.', '=', '!=', '#', ':'}
+"""Symbols that never build terms, other symbols after term in LADR are infix operators"""
+_PUNCTUATION = frozenset({'(', ')', ',', '.', '[', ']'})
+
+
+class ParseError(ValueError):
+    pass
+
+
+class FormulaParser:
+    """Recursive descent parser of single formula that records its features to counter"""
+
+    def __init__(self, tokens: Iterator[str], dialect: Dialect, counter: FeatureCounter):
+        self._tokens = tokens
+        self.dialect = dialect
+        self.counter = counter
+        self._lookahead: Optional[str] = next(tokens, None)
+        self._previous: Optional[str] = None
+        """Token consumed last"""
+        self._variables: Set[str] = set()
+        self._bound: Set[str] = set()
+        self._last_atom: Optional[Tuple[str, int, int]] = None
+        """Predicate atom parsed last, it may turn out to be a parenthesized term"""
+
+    def peek(self) -> Optional[str]:
+        return self._lookahead
+
+    def next(self) -> str:
+        token = self._lookahead
+        if token is None:
+            raise ParseError('unexpected end of input')
+        self._lookahead = next(self._tokens, None)
+        self._previous = token
+        return token
+
+    def expect(self, expected: str):
+        token = self.next()
+        if token != expected:
+            raise ParseError(f'expected "{expected}", found "{token}"')
+
+    def skip_statement(self):
+        """Skip tokens up to the end of statement (next full stop outside of parentheses). Nothing is skipped if
+        statement already ended (e.g. formula was cut short by full stop), so that next statement is not lost
+        """
+        if self._previous == '.':
+            return
+        depth = 0
+        while (token := self.peek()) is not None:
+            self.next()
+            if token in ('(', '['):
+                depth += 1
+            elif token in (')', ']'):
+                depth = max(depth - 1, 0)
+            elif token == '.' and depth == 0:
+                return
+
+    def formula(self):
+        """Parse formula and record its features"""
+        self._variables = set()
+        self._bound = set()
+        literals = self._formula()
+        self.counter.formulas += 1
+        if literals is not None:
+            self.counter.add_clause(literals)
+        self.counter.variables += len(self._variables)
+
+    def _formula(self) -> Optional[List[bool]]:
+        """Polarities of literals if formula is a disjunction of literals, None otherwise"""
+        literals = self._unary()
+        while self.peek() in self.dialect.binary:
+            connective = self.next()
+            right = self._unary()
+            if connective == self.dialect.disjunction and literals is not None and right is not None:
+                literals = literals + right
+            else:
+                literals = None
+        return literals
+
+    def _unary(self) -> Optional[List[bool]]:
+        token = self.peek()
+        if token == self.dialect.negation:
+            self.next()
+            inner = self._unary()
+            return [not inner[0]] if inner is not None and len(inner) == 1 else None
+        if token in self.dialect.quantifiers:
+            self._quantifier()
+            self._unary()
+            return None
+        if token == '(':
+            self.next()
+            atoms = self.counter.atoms
+            literals = self._formula()
+            self.expect(')')
+            if self.counter.atoms == atoms + 1 and self._last_atom is not None and \
+                    (self.peek() in ('=', '!=') or self._is_term_operator(self.peek())):
+                # e.g. (x * y) * z = e in LADR, what was parsed as atom is a term
+                self.counter.atoms -= 1
+                self.counter.remove_predicate(self._last_atom[:2])
+                return [self._atom(self._operators(*self._last_atom))]
+            return literals
+        return [self._atom()]
+
+    def _quantifier(self):
+        self.next()
+        self.counter.quantifiers += 1
+        if self.dialect is TPTP:
+            self.expect('[')
+            while True:
+                variable = self.next()
+                self._bound.add(variable)
+                if self.peek() == ':':
+                    # typed variable
+                    self.next()
+                    self.next()
+                if self.next() == ']':
+                    break
+            self.expect(':')
+        else:
+            self._bound.add(self.next())
+
+    def _atom(self, left: Optional[Tuple[str, int, int]] = None) -> bool:
+        """Parse atom (starting with already parsed term left), return its polarity (False for disequality)"""
+        self.counter.atoms += 1
+        self._last_atom = None
+        head, arity, depth = left if left is not None else self._term()
+        if self.peek() in ('=', '!='):
+            polarity = self.next() == '='
+            self._argument(head, arity, depth)
+            self._argument(*self._term())
+            self.counter.equality_atoms += 1
+            return polarity
+        self.counter.add_predicate((head, arity))
+        self._last_atom = (head, arity, depth)
+        return True
+
+    def _is_term_operator(self, token: Optional[str]) -> bool:
+        return self.dialect.term_operators and token is not None and token not in _NOT_TERM_OPERATORS and \
+            token not in self.dialect.binary and token != self.dialect.negation and \
+            not token[0].isalnum() and token[0] not in '$"'
+
+    def _term(self) -> Tuple[str, int, int]:
+        """Parse term, record symbols of its arguments. Return its head symbol, arity and depth"""
+        if not self.dialect.term_operators:
+            return self._primary_term()
+        return self._operators(*self._primary_term())
+
+    def _operators(self, head: str, arity: int, depth: int) -> Tuple[str, int, int]:
+        """Continue parsed term with infix and postfix operators following it"""
+        while self._is_term_operator(operator := self.peek()):
+            self.next()
+            self._argument(head, arity, depth)
+            if operator == "'":
+                head, arity, depth = operator, 1, depth + 1
+            else:
+                right = self._primary_term()
+                self._argument(*right)
+                head, arity, depth = operator, 2, max(depth, right[2]) + 1
+        return head, arity, depth
+
+    def _primary_term(self) -> Tuple[str, int, int]:
+        token = self.next()
+        if token == '(' and self.dialect.term_operators:
+            term = self._term()
+            self.expect(')')
+            return term
+        if token in _PUNCTUATION:
+            raise ParseError(f'unexpected "{token}"')
+        if self._lookahead != '(':
+            return token, 0, 1
+        self.next()
+        arity, depth = 0, 1
+        while True:
+            argument = self._term()
+            self._argument(*argument)
+            arity += 1
+            if argument[2] >= depth:
+                depth = argument[2] + 1
+            separator = self.next()
+            if separator == ')':
+                return token, arity, depth
+            if separator != ',':
+                raise ParseError(f'expected "," or ")", found "{separator}"')
+
+    def _argument(self, head: str, arity: int, depth: int):
+        """Record term in argument position"""
+        if depth > self.counter.max_term_depth:
+            self.counter.max_term_depth = depth
+        if arity == 0 and (head in self._bound or self.dialect.is_variable(head)):
+            self.counter.variable_occurrences += 1
+            self._variables.add(head)
+        elif not head.startswith('$'):
+            self.counter.functions.add((head, arity))
+
+
+_TPTP_FORMULAS = {'cnf', 'fof'}
+_TPTP_UNSUPPORTED = {'tff', 'thf', 'tcf', 'tpi'}
+
+
+def tptp_features(lines: Iterable[str]) -> Dict[str, Union[int, float]]:
+    """Features of TPTP problem, only cnf and fof formulas are analyzed. Included files are counted, not read"""
+    counter = FeatureCounter()
+    parser = FormulaParser(tokenize(lines), TPTP, counter)
+    while (token := parser.peek()) is not None:
+        parser.next()
+        if token == 'include':
+            counter.includes += 1
+            parser.skip_statement()
+        elif token in _TPTP_FORMULAS | _TPTP_UNSUPPORTED and parser.peek() == '(':
+            parser.next()
+            try:
+                # name and role
+                while parser.next() != ',':
+                    pass
+                while parser.next() != ',':
+                    pass
+                if token in _TPTP_UNSUPPORTED:
+                    raise ParseError(f'{token} formulas are not supported')
+                parser.formula()
+            except ParseError:
+                counter.unparsed_formulas += 1
+            # annotations
+            parser.skip_statement()
+        else:
+            parser.skip_statement()
+    return counter.features()
+
+
+_LADR_LISTS = {'formulas', 'clauses', 'assumptions', 'goals', 'sos', 'usable', 'demodulators', 'hints'}
+
+
+def ladr_features(lines: Iterable[str]) -> Dict[str, Union[int, float]]:
+    """Features of formulas in lists of LADR (Prover9) input, commands (set, assign, op, ...) are skipped"""
+    counter = FeatureCounter()
+    parser = FormulaParser(tokenize(lines, _LADR_TOKEN), LADR, counter)
+    in_list = False
+    while (token := parser.peek()) is not None:
+        if not in_list:
+            parser.next()
+            if token in _LADR_LISTS and parser.peek() == '(':
+                in_list = True
+            parser.skip_statement()
+        elif token == 'end_of_list':
+            in_list = False
+            parser.skip_statement()
+        else:
+            try:
+                parser.formula()
+                if parser.peek() == '#':
+                    # attributes, e.g. # label(goal)
+                    parser.skip_statement()
+                else:
+                    parser.expect('.')
+            except ParseError:
+                counter.unparsed_formulas += 1
+                parser.skip_statement()
+    return counter.features()
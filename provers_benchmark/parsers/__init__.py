@@ -1,6 +1,7 @@
-from .parsers import get_all_output_parsers, find_output_parser
+from .parsers import get_all_output_parsers, find_output_parser, VerdictListener
 
 __all__ = [
     'find_output_parser',
     'get_all_output_parsers',
+    'VerdictListener',
 ]
@@ -18,8 +18,18 @@ class InkresatParser(OutputParser):
         """
         if returncode != 0:
             return SATStatus.ERROR
-        if 'SATISFIABLE' in stdout:
-            return SATStatus.SATISFIABLE
-        elif 'UNSATISFIABLE' in stdout:
+        # UNSATISFIABLE contains SATISFIABLE, so it must be checked first
+        if 'UNSATISFIABLE' in stdout:
             return SATStatus.UNSATISFIABLE
+        elif 'SATISFIABLE' in stdout:
+            return SATStatus.SATISFIABLE
         return SATStatus.UNKOWN
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[SATStatus]:
+        line = line.strip()
+        if line == 'SATISFIABLE':
+            return SATStatus.SATISFIABLE
+        elif line == 'UNSATISFIABLE':
+            return SATStatus.UNSATISFIABLE
+        return None
@@ -1,8 +1,11 @@
+import re
 from typing import Optional
 
 from provers_benchmark.parsers.parsers import OutputParser
 from provers_benchmark.statistics.stats import SATStatus
 
+_EXIT_REASON = re.compile(r'^-+ process \d+ exit \((\w+)\) -+')
+
 
 class Prover9Parser(OutputParser):
     @staticmethod
@@ -31,3 +34,15 @@ class Prover9Parser(OutputParser):
             return SATStatus.TIMEOUT
         else:
             return SATStatus.UNSATISFIABLE
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[SATStatus]:
+        """Prover9 prints THEOREM PROVED when proof is found and
+        ------ process 1234 exit (reason) ------ when it terminates, reasons map to exit codes above.
+        Only found proof is an answer, other exit reasons are classified by parse_output after exit
+        """
+        if line.startswith('THEOREM PROVED'):
+            return SATStatus.SATISFIABLE
+        if (match := _EXIT_REASON.search(line)) and match.group(1) == 'max_proofs':
+            return SATStatus.SATISFIABLE
+        return None
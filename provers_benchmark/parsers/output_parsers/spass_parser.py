@@ -19,3 +19,11 @@ class SpassParser(OutputParser):
         elif 'SPASS beiseite: Completion found' in stdout:
             return SATStatus.UNSATISFIABLE
         return SATStatus.UNKOWN
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[SATStatus]:
+        if line.startswith('SPASS beiseite: Proof found'):
+            return SATStatus.SATISFIABLE
+        elif line.startswith('SPASS beiseite: Completion found'):
+            return SATStatus.UNSATISFIABLE
+        return None
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import threading
+import time
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Union, Optional
+from typing import Union, Optional, Type, Callable
 
 from provers_benchmark.statistics.stats import SATStatus
 
@@ -13,6 +15,41 @@ class OutputParser(ABC):
     def parse_output(returncode: int, stdout: Optional[str], stderr: Optional[str]) -> SATStatus:
         pass
 
+    @staticmethod
+    def parse_line(line: str) -> Optional[SATStatus]:
+        """Verdict from single line of stdout, as soon as it is printed. None if line does not decide verdict"""
+        return None
+
+
+class VerdictListener:
+    """Feeds stdout lines to parser while process runs and remembers first verdict and when it was found"""
+
+    def __init__(self, parser: Type[OutputParser], start: float, on_verdict: Optional[Callable[[], None]] = None):
+        """
+        start: time.perf_counter() when process started
+        on_verdict: called (from reading thread) when verdict is found
+        """
+        self.parser = parser
+        self.start = start
+        self.on_verdict = on_verdict
+        self.verdict: Optional[SATStatus] = None
+        self.time_to_verdict: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def feed(self, line: str):
+        if self.verdict is not None:
+            return
+        verdict = self.parser.parse_line(line)
+        if verdict is None:
+            return
+        with self._lock:
+            if self.verdict is not None:
+                return
+            self.time_to_verdict = time.perf_counter() - self.start
+            self.verdict = verdict
+        if self.on_verdict is not None:
+            self.on_verdict()
+
 
 class Parsers(Enum):
     PROVER9 = 'prover9'
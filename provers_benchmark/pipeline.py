@@ -0,0 +1,134 @@
+"""Translation stage that runs ahead of benchmarking, so that benchmark workers only consume ready translated inputs"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Tuple, Iterable, Iterator, Optional, FrozenSet, List
+
+from provers_benchmark.benchmark import translate
+from provers_benchmark.cache import TranslationCache
+from provers_benchmark.config import Translator, BenchmarkConfig
+from provers_benchmark.scheduler import Job, member_jobs
+from provers_benchmark.utils import find_translator
+
+logger = logging.getLogger('ProverBenchmark')
+
+
+def job_translator(job: Job, translators: List[Translator]) -> Optional[Translator]:
+    """Translator needed by job (not a portfolio, see member_jobs), None if job does not need translation"""
+    if job.test_suite.required_format == job.test_input.format:
+        return None
+    return find_translator(from_format=job.test_input.format, to_format=job.test_suite.required_format,
+                           available_translators=translators)
+
+
+TranslationKey = Tuple[str, str, str]
+"""File, from format and to format"""
+
+
+class TranslationPipeline:
+    """Translates inputs of upcoming jobs on its own pool of workers.
+    Each (file, from format, to format) is translated once, no matter how many test suites need it.
+    Translation is reserved for every job it was submitted for and forgotten once all of them released it
+    (later requests for it are served from translation cache)
+    """
+
+    def __init__(self, config: BenchmarkConfig, cache: TranslationCache, workers: int = 1, queue_depth: int = 100,
+                 cpu_affinity: Optional[FrozenSet[int]] = None):
+        """
+        workers: number of translations running at once
+        queue_depth: how many jobs ahead of benchmarking are translated
+        cpu_affinity: cores translators are pinned to, preferably cores not used for benchmarking
+        """
+        self.config = config
+        self.cache = cache
+        self.queue_depth = queue_depth
+        self.cpu_affinity = cpu_affinity
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='translation-worker')
+        self._translations: Dict[TranslationKey, Future] = {}
+        self._reservations: Dict[Tuple[int, str], TranslationKey] = {}
+        """(job index, test suite name) -> translation reserved for the job"""
+        self._consumers: Counter = Counter()
+        """Reservations of every translation"""
+        self._lock = threading.Lock()
+
+    def translator_for(self, job: Job) -> Optional[Translator]:
+        """Translator needed by job (not a portfolio, see member_jobs), None if job does not need translation"""
+        return job_translator(job, self.config.translators)
+
+    def _reserve(self, job: Job) -> Optional[Future]:
+        """Submit translation for job (not a portfolio) if it was not submitted yet and reserve it for the job"""
+        translator = self.translator_for(job)
+        if translator is None:
+            return None
+        key = (job.file, translator.from_format, translator.to_format)
+        with self._lock:
+            if key not in self._translations:
+                self._translations[key] = self._executor.submit(translate, translator=translator,
+                                                                input_file=job.file, cache=self.cache,
+                                                                cpu_affinity=self.cpu_affinity)
+            if (job.index, job.test_suite.name) not in self._reservations:
+                self._reservations[(job.index, job.test_suite.name)] = key
+                self._consumers[key] += 1
+            return self._translations[key]
+
+    def _release(self, job: Job):
+        with self._lock:
+            if (key := self._reservations.pop((job.index, job.test_suite.name), None)) is None:
+                return
+            self._consumers[key] -= 1
+            if self._consumers[key] <= 0:
+                del self._consumers[key]
+                del self._translations[key]
+
+    def release(self, job: Job):
+        """Release translations reserved for job (or members of portfolio job) that it did not consume,
+        e.g. because it failed before it asked for its input. Call it once job finished
+        """
+        for member_job in member_jobs(job):
+            self._release(member_job)
+
+    @property
+    def pending(self) -> int:
+        """Translations reserved for jobs that did not consume them yet"""
+        with self._lock:
+            return len(self._translations)
+
+    def prefetch(self, jobs: Iterable[Job]) -> Iterator[Job]:
+        """Yield jobs, while translations for next queue_depth jobs are already being translated"""
+        ahead = deque()
+        for job in jobs:
+            for member_job in member_jobs(job):
+                self._reserve(member_job)
+            ahead.append(job)
+            if len(ahead) > self.queue_depth:
+                yield ahead.popleft()
+        yield from ahead
+
+    def translated_input(self, job: Job) -> str:
+        """Path of input file for job (not a portfolio, see member_jobs), translated if needed. Blocks until translation is ready.
+        Raise TranslationError if translation failed
+        """
+        future = self._reserve(job)
+        if future is None:
+            return job.file
+        try:
+            return future.result()
+        finally:
+            self._release(job)
+
+    async def translated_input_async(self, job: Job) -> str:
+        """Same as translated_input, but awaits translation instead of blocking"""
+        future = self._reserve(job)
+        if future is None:
+            return job.file
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self._release(job)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,154 @@
+"""Dry run: the full job matrix with translations it needs, cache hits and estimated time, without starting a prover"""
+import datetime
+import json
+import os
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from provers_benchmark.cache import TranslationCache
+from provers_benchmark.config import BenchmarkConfig
+from provers_benchmark.pipeline import job_translator
+from provers_benchmark.repetition import RepetitionPolicy
+from provers_benchmark.scheduler import Job, member_jobs
+
+
+@dataclass
+class SuitePlan:
+    name: str
+    jobs: int = 0
+    done: int = 0
+    """Jobs whose key is already in results stream"""
+    translated: int = 0
+    """Jobs that need translated input"""
+    cached: int = 0
+    """Jobs whose all translations are cached (including cached failures)"""
+    known: int = 0
+    """Jobs whose time is estimated from their own previous result"""
+    estimated_time: float = 0
+    """Seconds of tests that will run"""
+
+
+@dataclass
+class Plan:
+    inputs: Dict[str, int] = field(default_factory=dict)
+    """Test input name -> number of its files"""
+    suites: Dict[str, SuitePlan] = field(default_factory=dict)
+    translations: int = 0
+    """Unique (file, translator) pairs needed"""
+    cached_translations: int = 0
+    failed_translations: int = 0
+    """Cached translations that failed, their jobs end with error"""
+    workers: int = 1
+    resume: bool = False
+
+    @property
+    def estimated_time(self) -> float:
+        return sum(suite.estimated_time for suite in self.suites.values())
+
+    @property
+    def estimated_wall_time(self) -> float:
+        return self.estimated_time / self.workers
+
+
+def previous_times(stream_path: str) -> Tuple[Dict[str, float], Dict[str, List[float]]]:
+    """Execution time of every job (median of repetitions if it was repeated) in results stream by its key,
+    and all times of every test suite
+    """
+    times, suite_times = {}, defaultdict(list)
+    if not os.path.exists(stream_path):
+        return times, suite_times
+    with open(stream_path) as stream:
+        for line in stream:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not (key := record.get('key')) or not (test_run := record.get('test_run')):
+                continue
+            repetitions = test_run.get('repetitions') or {}
+            time = repetitions.get('median')
+            if time is None:
+                time = (test_run.get('execution_statistics') or {}).get('execution_time')
+            if time is None:
+                continue
+            times[key] = time
+            suite_times[test_run['name']].append(time)
+    return times, suite_times
+
+
+def build_plan(config: BenchmarkConfig, jobs: Iterable[Job], cache: TranslationCache, stream_path: str,
+               workers: int = 1, resume: bool = False) -> Plan:
+    """Plan of keyed jobs. Time of job is its previous time from results stream, otherwise median time of its test
+    suite there, otherwise the timeout, times number of runs (warm-up and measured) of its test suite.
+    With resume, jobs that are already done are not estimated
+    """
+    times, suite_times = previous_times(stream_path)
+    medians = {name: statistics.median(values) for name, values in suite_times.items()}
+    plan = Plan(workers=workers, resume=resume)
+    files: Dict[str, Set[str]] = defaultdict(set)
+    # cache key -> whether it is cached
+    translations: Dict[str, bool] = {}
+    runs: Dict[str, int] = {}
+    for job in jobs:
+        name = job.test_suite.name
+        files[job.test_input.name].add(job.file)
+        suite = plan.suites.setdefault(name, SuitePlan(name))
+        suite.jobs += 1
+
+        keys = []
+        for member_job in member_jobs(job):
+            if (translator := job_translator(member_job, config.translators)) is None:
+                continue
+            key = cache.key(translator, job.file)
+            keys.append(key)
+            if key not in translations:
+                entry = cache.peek(key)
+                translations[key] = entry is not None
+                plan.cached_translations += entry is not None
+                plan.failed_translations += entry is not None and entry.failed
+        if keys:
+            suite.translated += 1
+            suite.cached += all(translations[key] for key in keys)
+
+        done = job.key in times
+        suite.done += done
+        if done and resume:
+            continue
+        if name not in runs:
+            policy = RepetitionPolicy.from_config(config.general, job.test_suite)
+            runs[name] = policy.warmup_runs + policy.repetitions
+        time: Optional[float] = times.get(job.key)
+        suite.known += time is not None
+        if time is None:
+            time = medians.get(name, config.general.test_timeout)
+        suite.estimated_time += time * runs[name]
+
+    plan.inputs = {name: len(paths) for name, paths in files.items()}
+    plan.translations = len(translations)
+    return plan
+
+
+def _duration(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+def format_plan(plan: Plan) -> str:
+    """Human readable plan, one row per test suite"""
+    lines = ['Inputs:']
+    lines += [f'  {name}: {count} files' for name, count in plan.inputs.items()]
+    header = ['test suite', 'jobs', 'done', 'translated', 'cached', 'known', 'estimated']
+    rows = [header] + [[suite.name, str(suite.jobs), str(suite.done), str(suite.translated), str(suite.cached),
+                        str(suite.known), _duration(suite.estimated_time)] for suite in plan.suites.values()]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines += ['  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                        for i, (cell, width) in enumerate(zip(row, widths))) for row in rows]
+    lines.append(f'Translations: {plan.translations} needed, {plan.cached_translations} cached '
+                 f'({plan.failed_translations} of them failed), '
+                 f'{plan.translations - plan.cached_translations} to translate')
+    jobs = sum(suite.jobs - suite.done if plan.resume else suite.jobs for suite in plan.suites.values())
+    lines.append(f'Estimated time: {jobs} tests, {_duration(plan.estimated_time)} of tests on {plan.workers} '
+                 f'workers, {_duration(plan.estimated_wall_time)} wall time (tests without previous result are '
+                 f'estimated with median time of their test suite, or with timeout)')
+    return '\n'.join(lines)
@@ -0,0 +1,97 @@
+"""Portfolio (race) mode: members of portfolio run concurrently on the same input, the first SAT/UNSAT verdict
+wins and the other members are killed
+"""
+import logging
+import threading
+import time
+from typing import Dict, Callable, Optional, Set, List, FrozenSet, Tuple
+
+from provers_benchmark.statistics.stats import SATStatus, ExecutionStatistics, OutputStatistics, \
+    PortfolioStatistics, PortfolioMemberStatistics
+
+logger = logging.getLogger('ProverBenchmark')
+
+ANSWERS = {SATStatus.SATISFIABLE, SATStatus.UNSATISFIABLE}
+"""Verdicts that end the race"""
+
+_STATUS_PRIORITY = [SATStatus.TIMEOUT, SATStatus.OUT_OF_MEMORY, SATStatus.ERROR, SATStatus.UNKOWN]
+"""Status of race without answer: the first of these that some member ended with"""
+
+
+class Race:
+    """Shared state of one race. Members register callbacks that wake up their harness (thread or asyncio task),
+    the first member that answers interrupts all others. Safe to use from several threads
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.winner: Optional[str] = None
+        self.time_to_first_answer: Optional[float] = None
+        self._lock = threading.Lock()
+        self._wake_ups: Dict[str, Callable[[], None]] = {}
+
+    def register(self, name: str, wake_up: Callable[[], None]):
+        """Register member, wake_up is called (from harness of winner) when other member answers"""
+        with self._lock:
+            self._wake_ups[name] = wake_up
+
+    def answer(self, name: str, verdict: SATStatus):
+        """Verdict of member, the first SAT/UNSAT verdict wins the race"""
+        if verdict not in ANSWERS:
+            return
+        with self._lock:
+            if self.winner is not None:
+                return
+            self.winner = name
+            self.time_to_first_answer = time.perf_counter() - self.start_time
+            losers = [wake_up for member, wake_up in self._wake_ups.items() if member != name]
+        for wake_up in losers:
+            wake_up()
+
+    def lost(self, name: str) -> bool:
+        """Whether other member already answered, member should then stop"""
+        with self._lock:
+            return self.winner is not None and self.winner != name
+
+
+def split_cores(cpu_affinity: Optional[FrozenSet[int]], members: int) -> List[Optional[FrozenSet[int]]]:
+    """Cores of each member: disjoint subsets if there are at least as many cores as members, otherwise all members
+    share all cores
+    """
+    if not cpu_affinity or len(cpu_affinity) < members:
+        return [cpu_affinity] * members
+    cores = sorted(cpu_affinity)
+    return [frozenset(cores[i::members]) for i in range(members)]
+
+
+def race_result(race: Race, members: List[Tuple[str, ExecutionStatistics, OutputStatistics]]) \
+        -> Tuple[ExecutionStatistics, OutputStatistics, PortfolioStatistics]:
+    """Statistics of whole race from statistics of its members (name, execution and output statistics).
+    Execution time is time to first answer (or of the longest member if nobody answered), cpu time, memory and io
+    are summed over members, since they ran at once
+    """
+    portfolio = PortfolioStatistics(winner=race.winner, time_to_first_answer=race.time_to_first_answer)
+    execution = ExecutionStatistics(accounting='portfolio')
+    for name, member_execution, member_output in members:
+        portfolio.members.append(PortfolioMemberStatistics(
+            name=name, status=member_output.status, execution_statistics=member_execution,
+            time_to_verdict=member_output.time_to_verdict, lost_race=race.lost(name)))
+        for attribute in ('cpu_time', 'user_time', 'system_time', 'peak_memory', 'disk_reads', 'disk_writes'):
+            if (value := getattr(member_execution, attribute)) is not None:
+                setattr(execution, attribute, (getattr(execution, attribute) or 0) + value)
+        execution.execution_time = max(execution.execution_time, member_execution.execution_time)
+
+    output = OutputStatistics(stdout='', stderr='')
+    if race.winner is not None:
+        execution.execution_time = race.time_to_first_answer
+        output.status = next(member_output.status for name, _, member_output in members if name == race.winner)
+        output.time_to_verdict = race.time_to_first_answer
+        execution.returncode = next(member_execution.returncode
+                                    for name, member_execution, _ in members if name == race.winner)
+    else:
+        statuses: Set[SATStatus] = {member_output.status for _, _, member_output in members}
+        output.status = next((status for status in _STATUS_PRIORITY if status in statuses), SATStatus.UNKOWN)
+    winner = f'won by "{race.winner}" after {race.time_to_first_answer:.2f}"' if race.winner is not None \
+        else 'no member answered'
+    logger.info(f'Portfolio race done: {winner}, SAT: {output.status}')
+    return execution, output, portfolio
@@ -0,0 +1,268 @@
+"""Live progress of running benchmark: jobs done, running and queued, throughput, ETA, status counts and cache hit
+rates. Exposed in Prometheus text format on local HTTP port, as periodically rewritten json status file
+and as periodic log line
+"""
+import datetime
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Callable, Tuple, Iterable, Iterator, List
+
+from provers_benchmark.cache import atomic_write
+from provers_benchmark.config import BenchmarkConfig
+from provers_benchmark.scheduler import Job
+from provers_benchmark.statistics.stats import TestRunStatistics, SATStatus
+
+logger = logging.getLogger('ProverBenchmark')
+
+THROUGHPUT_WINDOW = 600
+"""Jobs per minute are computed from jobs finished in this many last seconds"""
+
+CacheCounts = Callable[[], Tuple[int, int]]
+"""Hits and misses of cache so far"""
+
+
+class Progress:
+    """Counts of jobs updated by scheduler (job_started, job_finished) and read by exporters. Safe to use from
+    several threads. Expected number of jobs of every test suite is estimated (expect) until all jobs were
+    discovered (track), then it is exact
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.start_time = time.time()
+        self.statuses: Counter = Counter()
+        self._lock = threading.Lock()
+        self._expected: Dict[str, int] = {}
+        self._discovered: Counter = Counter()
+        self._exhausted = False
+        self._finished: Counter = Counter()
+        self._job_seconds: Dict[str, float] = Counter()
+        self._running: Dict[int, Tuple[Job, float]] = {}
+        self._recent: deque = deque()
+        self._caches: Dict[str, CacheCounts] = {}
+
+    def expect(self, expected: Dict[str, int]):
+        """Estimated number of jobs of every test suite that will run"""
+        with self._lock:
+            self._expected = dict(expected)
+
+    def track(self, jobs: Iterable[Job]) -> Iterator[Job]:
+        """Yield jobs that will run and count them"""
+        for job in jobs:
+            with self._lock:
+                self._discovered[job.test_suite.name] += 1
+            yield job
+        with self._lock:
+            self._exhausted = True
+
+    def add_cache(self, name: str, counts: CacheCounts):
+        self._caches[name] = counts
+
+    def job_started(self, job: Job):
+        with self._lock:
+            self._running[job.index] = (job, time.time())
+
+    def job_finished(self, job: Job, test_run: TestRunStatistics):
+        now = time.time()
+        with self._lock:
+            _, started = self._running.pop(job.index, (None, None))
+            name = job.test_suite.name
+            self._finished[name] += 1
+            # jobs not started here (e.g. run by distributed workers) count with their execution time
+            self._job_seconds[name] += now - started if started is not None else \
+                test_run.execution_statistics.execution_time
+            self.statuses[test_run.output.status] += 1
+            self._recent.append(now)
+            while self._recent and self._recent[0] < now - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def _expected_jobs(self) -> Dict[str, int]:
+        if self._exhausted:
+            return dict(self._discovered)
+        suites = set(self._expected) | set(self._discovered)
+        return {name: max(self._expected.get(name, 0), self._discovered[name], self._finished[name])
+                for name in suites}
+
+    def snapshot(self) -> Dict:
+        """Current state as json serializable dict"""
+        now = time.time()
+        with self._lock:
+            expected = self._expected_jobs()
+            done = sum(self._finished.values())
+            running = [{'suite': job.test_suite.name, 'file': job.file, 'seconds': now - started}
+                       for job, started in self._running.values()]
+            elapsed_window = min(now - self.start_time, THROUGHPUT_WINDOW)
+            jobs_per_minute = len(self._recent) / elapsed_window * 60 if elapsed_window > 0 else 0
+            total_seconds = sum(self._job_seconds.values())
+            eta = 0.0
+            for name, count in expected.items():
+                remaining = max(count - self._finished[name], 0)
+                if not remaining:
+                    continue
+                finished = self._finished[name]
+                average = self._job_seconds[name] / finished if finished else total_seconds / done if done else None
+                if average is None:
+                    eta = None
+                    break
+                eta += remaining * average
+            suites = {name: {'expected': count, 'done': self._finished[name],
+                             'average_seconds': self._job_seconds[name] / self._finished[name]
+                             if self._finished[name] else None}
+                      for name, count in expected.items()}
+            statuses = {status.value: self.statuses[status] for status in SATStatus}
+            exact = self._exhausted
+        caches = {}
+        for name, counts in self._caches.items():
+            hits, misses = counts()
+            caches[name] = {'hits': hits, 'misses': misses,
+                            'hit_rate': hits / (hits + misses) if hits + misses else None}
+        total = sum(expected.values())
+        return {
+            'time': datetime.datetime.fromtimestamp(now).isoformat(timespec='seconds'),
+            'start_time': datetime.datetime.fromtimestamp(self.start_time).isoformat(timespec='seconds'),
+            'elapsed_seconds': now - self.start_time,
+            'expected': total,
+            'expected_exact': exact,
+            'done': done,
+            'running': len(running),
+            'queued': max(total - done - len(running), 0),
+            'jobs_per_minute': jobs_per_minute,
+            'eta_seconds': eta / self.workers if eta is not None else None,
+            'statuses': statuses,
+            'suites': suites,
+            'caches': caches,
+            'running_jobs': sorted(running, key=lambda running_job: -running_job['seconds']),
+        }
+
+
+def estimate_jobs(config: BenchmarkConfig, files: int, done: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Jobs of every test suite and portfolio: one per input file (files in total, e.g. FileManifest.count),
+    minus done ones (e.g. when resuming)
+    """
+    names = [test_suite.name for test_suite in config.test_suites if test_suite.standalone] + \
+            [portfolio.name for portfolio in config.portfolios]
+    done = done or {}
+    return {name: max(files - done.get(name, 0), 0) for name in names}
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(snapshot: Dict) -> str:
+    """Snapshot in Prometheus text exposition format"""
+    lines: List[str] = []
+
+    def metric(name: str, metric_type: str, help_text: str, samples: Iterable[Tuple[str, Optional[float]]]):
+        lines.append(f'# HELP benchmark_{name} {help_text}')
+        lines.append(f'# TYPE benchmark_{name} {metric_type}')
+        lines.extend(f'benchmark_{name}{labels} {value}' for labels, value in samples if value is not None)
+
+    metric('jobs_expected', 'gauge', 'Jobs expected to run (estimate until all jobs are discovered)',
+           [('', snapshot['expected'])])
+    metric('jobs_done_total', 'counter', 'Finished jobs', [('', snapshot['done'])])
+    metric('jobs_running', 'gauge', 'Running jobs', [('', snapshot['running'])])
+    metric('jobs_queued', 'gauge', 'Jobs not started yet', [('', snapshot['queued'])])
+    metric('jobs_per_minute', 'gauge', f'Jobs finished per minute in last {THROUGHPUT_WINDOW} seconds',
+           [('', snapshot['jobs_per_minute'])])
+    metric('eta_seconds', 'gauge', 'Estimated seconds until all jobs finish', [('', snapshot['eta_seconds'])])
+    metric('oldest_running_job_seconds', 'gauge', 'Seconds since the longest running job started',
+           [('', max((job['seconds'] for job in snapshot['running_jobs']), default=0))])
+    metric('elapsed_seconds', 'gauge', 'Seconds since benchmark started', [('', snapshot['elapsed_seconds'])])
+    metric('test_runs_total', 'counter', 'Finished test runs by status',
+           [(f'{{status="{status}"}}', count) for status, count in snapshot['statuses'].items()])
+    metric('suite_jobs_done_total', 'counter', 'Finished jobs of test suite',
+           [(f'{{suite="{_label(name)}"}}', suite['done']) for name, suite in snapshot['suites'].items()])
+    metric('suite_jobs_expected', 'gauge', 'Jobs of test suite expected to run',
+           [(f'{{suite="{_label(name)}"}}', suite['expected']) for name, suite in snapshot['suites'].items()])
+    metric('suite_job_seconds_average', 'gauge', 'Average seconds per finished job of test suite',
+           [(f'{{suite="{_label(name)}"}}', suite['average_seconds']) for name, suite in snapshot['suites'].items()])
+    metric('cache_hits_total', 'counter', 'Cache hits',
+           [(f'{{cache="{name}"}}', cache['hits']) for name, cache in snapshot['caches'].items()])
+    metric('cache_misses_total', 'counter', 'Cache misses',
+           [(f'{{cache="{name}"}}', cache['misses']) for name, cache in snapshot['caches'].items()])
+    metric('cache_hit_ratio', 'gauge', 'Cache hits per lookup',
+           [(f'{{cache="{name}"}}', cache['hit_rate']) for name, cache in snapshot['caches'].items()])
+    return '\n'.join(lines) + '\n'
+
+
+def format_progress(snapshot: Dict) -> str:
+    eta = str(datetime.timedelta(seconds=round(snapshot['eta_seconds']))) \
+        if snapshot['eta_seconds'] is not None else 'unknown'
+    expected = snapshot['expected'] if snapshot['expected_exact'] else f'~{snapshot["expected"]}'
+    statuses = ', '.join(f'{status} {count}' for status, count in snapshot['statuses'].items() if count)
+    return f'Progress: {snapshot["done"]}/{expected} done, {snapshot["running"]} running, ' \
+           f'{snapshot["queued"]} queued, {snapshot["jobs_per_minute"]:.1f} jobs/min, ETA {eta}' \
+           + (f' ({statuses})' if statuses else '')
+
+
+class ProgressReporter:
+    """Serves metrics of progress on http://host:port/metrics (if port is given), rewrites status_path
+    (if given) and logs progress every interval seconds, until closed
+    """
+
+    def __init__(self, progress: Progress, interval: float = 60, status_path: Optional[str] = None,
+                 host: str = '127.0.0.1', port: Optional[int] = None):
+        self.progress = progress
+        self.interval = interval
+        self.status_path = status_path
+        self._stop = threading.Event()
+        self._server = None
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), self._handler())
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name='benchmark-metrics', daemon=True).start()
+            logger.info(f'Serving metrics on http://{host}:{self._server.server_address[1]}/metrics')
+        self._thread = threading.Thread(target=self._run, name='benchmark-progress', daemon=True)
+        self._thread.start()
+
+    def _handler(self):
+        progress = self.progress
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] == '/metrics':
+                    body = prometheus_text(progress.snapshot()).encode()
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.split('?')[0] == '/status':
+                    body = json.dumps(progress.snapshot(), indent=2).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f'Metrics request: {format % args}')
+
+        return MetricsHandler
+
+    def report(self):
+        snapshot = self.progress.snapshot()
+        if self.status_path is not None:
+            try:
+                atomic_write(self.status_path, json.dumps(snapshot, indent=2))
+            except OSError as e:
+                logger.warning(f'Can not write status file {self.status_path}: {e}')
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            logger.info(format_progress(self.report()))
+
+    def close(self):
+        """Stop reporting, status file is written once more with final state"""
+        self._stop.set()
+        self._thread.join()
+        self.report()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
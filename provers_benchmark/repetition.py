@@ -0,0 +1,154 @@
+"""Repeated measurements: warm-up runs, fixed number of repetitions or adaptive repeating
+until confidence interval of mean execution time is narrow enough
+"""
+import logging
+import math
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Optional, Callable, Tuple, Union, Generator, Awaitable
+
+from provers_benchmark.config import GeneralConfig, TestSuite, Portfolio
+from provers_benchmark.statistics.stats import ExecutionStatistics, OutputStatistics, RepetitionStatistics, SATStatus
+
+logger = logging.getLogger('ProverBenchmark')
+
+_T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+"""Two-sided 95% critical values of Student's t distribution for 1..30 degrees of freedom"""
+
+_LIMIT_STATUSES = {SATStatus.TIMEOUT, SATStatus.OUT_OF_MEMORY}
+
+
+def t_critical_95(degrees_of_freedom: int) -> float:
+    if degrees_of_freedom <= len(_T_95):
+        return _T_95[degrees_of_freedom - 1]
+    if degrees_of_freedom <= 60:
+        return 2.000
+    if degrees_of_freedom <= 120:
+        return 1.980
+    return 1.960
+
+
+def summarize(repetitions: RepetitionStatistics):
+    """Fill mean, median, stdev and 95% confidence interval from samples"""
+    samples = repetitions.samples
+    repetitions.count = len(samples)
+    if not samples:
+        return
+    repetitions.mean = statistics.mean(samples)
+    repetitions.median = statistics.median(samples)
+    if len(samples) > 1:
+        repetitions.stdev = statistics.stdev(samples)
+        half_width = t_critical_95(len(samples) - 1) * repetitions.stdev / math.sqrt(len(samples))
+        repetitions.ci_low = repetitions.mean - half_width
+        repetitions.ci_high = repetitions.mean + half_width
+
+
+def relative_ci_half_width(repetitions: RepetitionStatistics) -> float:
+    if repetitions.ci_high is None or not repetitions.mean:
+        return math.inf
+    return (repetitions.ci_high - repetitions.mean) / repetitions.mean
+
+
+@dataclass
+class RepetitionPolicy:
+    warmup_runs: int = 0
+    repetitions: int = 1
+    max_repetitions: Optional[int] = None
+    target_ci_width: float = 0.02
+    budget: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, general: GeneralConfig, test_suite: Union[TestSuite, Portfolio]) -> 'RepetitionPolicy':
+        """Settings of test suite, where they are not set the general ones (portfolios have only the general ones)"""
+
+        def setting(name: str):
+            value = getattr(test_suite, name, None)
+            return value if value is not None else getattr(general, name)
+
+        return cls(warmup_runs=setting('warmup_runs'), repetitions=setting('repetitions'),
+                   max_repetitions=setting('max_repetitions'), target_ci_width=setting('target_ci_width'),
+                   budget=setting('repetition_budget'))
+
+    @property
+    def adaptive(self) -> bool:
+        return self.max_repetitions is not None
+
+    @property
+    def enabled(self) -> bool:
+        return self.warmup_runs > 0 or self.repetitions > 1 or self.adaptive
+
+    def stop_reason(self, repetitions: RepetitionStatistics, elapsed: float) -> Optional[str]:
+        count = repetitions.count
+        if count >= (self.max_repetitions if self.adaptive else self.repetitions):
+            return 'count'
+        if self.budget is not None and elapsed >= self.budget:
+            return 'budget'
+        if self.adaptive and count >= max(self.repetitions, 2) and \
+                relative_ci_half_width(repetitions) <= self.target_ci_width:
+            return 'ci'
+        return None
+
+
+RunOnce = Callable[[], Tuple[ExecutionStatistics, OutputStatistics]]
+Repeated = Tuple[ExecutionStatistics, OutputStatistics, Optional[RepetitionStatistics]]
+
+
+def _repeat(policy: RepetitionPolicy) -> Generator[None, Tuple[ExecutionStatistics, OutputStatistics], Repeated]:
+    """Runs of test according to policy: yields when test is to be run and is sent its statistics,
+    so that the same policy drives both blocking (run_repeated) and asyncio (run_repeated_async) runs
+    """
+    if not policy.enabled:
+        return (*(yield), None)
+    repetitions = RepetitionStatistics()
+    for _ in range(policy.warmup_runs):
+        repetitions.warmup_runs += 1
+        _, output = yield
+        if output.status in _LIMIT_STATUSES:
+            logger.warning(f'Warm-up run ended with {output.status.value}, skipping remaining warm-up runs')
+            break
+    started = time.perf_counter()
+    while True:
+        execution, output = yield
+        repetitions.samples.append(execution.execution_time)
+        repetitions.cpu_times.append(execution.cpu_time)
+        repetitions.statuses.append(output.status.value)
+        summarize(repetitions)
+        if output.status in _LIMIT_STATUSES:
+            repetitions.stopped_by = 'limit'
+        else:
+            repetitions.stopped_by = policy.stop_reason(repetitions, elapsed=time.perf_counter() - started) or ''
+        if repetitions.stopped_by:
+            break
+    ci = f', 95% CI [{repetitions.ci_low:.3f}, {repetitions.ci_high:.3f}]' if repetitions.ci_low is not None else ''
+    logger.info(f'{repetitions.count} measured run(s), stopped by {repetitions.stopped_by}: '
+                f'median {repetitions.median:.3f}", mean {repetitions.mean:.3f}"{ci}')
+    return execution, output, repetitions
+
+
+def run_repeated(run_once: RunOnce, policy: RepetitionPolicy) -> Repeated:
+    """Run test according to policy. Returns statistics of the last measured run and summary of all of them
+    (None if test was run only once). Run that ends with timeout or out of memory ends repeating,
+    the next runs would most likely end the same way
+    """
+    runs = _repeat(policy)
+    try:
+        next(runs)
+        while True:
+            runs.send(run_once())
+    except StopIteration as result:
+        return result.value
+
+
+async def run_repeated_async(run_once: Callable[[], Awaitable[Tuple[ExecutionStatistics, OutputStatistics]]],
+                             policy: RepetitionPolicy) -> Repeated:
+    """Same as run_repeated, for coroutine run_once"""
+    runs = _repeat(policy)
+    try:
+        next(runs)
+        while True:
+            runs.send(await run_once())
+    except StopIteration as result:
+        return result.value
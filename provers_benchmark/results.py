@@ -0,0 +1,235 @@
+"""Writing results. Every finished test run is appended to a JSON Lines stream (and incremental csv) right away,
+so nothing is lost when benchmark crashes. Aggregate json/csv/npz files are regenerated from the stream at the end
+"""
+from __future__ import annotations
+
+import csv
+import dataclasses
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Iterator, Tuple, List, Optional, Union, Dict, TYPE_CHECKING
+
+from provers_benchmark.statistics.schema import test_run_columns, flat_columns, flat_row, formula_statistics_keys, \
+    column_type, FORMULA_STATISTICS
+from provers_benchmark.statistics.stats import Statistics, TestRunStatistics
+from provers_benchmark.utils import import_numpy
+
+if TYPE_CHECKING:
+    import numpy
+
+logger = logging.getLogger('ProverBenchmark')
+
+CATEGORIES_SUFFIX = '.categories'
+"""Suffix of npz arrays with categories of categorical column"""
+
+
+def save_stats_to_json(stats: Statistics, path: str):
+    out_file = path + '.json'
+    logger.info(f'writing results to {out_file}')
+    with open(out_file, 'w') as outfile:
+        outfile.write(stats.to_json())
+
+
+def save_stats_to_csv(stats: Statistics, path: str):
+    """Not all statistics are saved to csv (outputs are not).
+    Columns are known from schema, only keys of input_formula_statistics are collected before writing rows
+    """
+    out_file = path + '.csv'
+    logger.info(f'writing results to {out_file}')
+    fieldnames = sorted(flat_columns(formula_statistics_keys(stats.test_runs)))
+    with open(out_file, 'w', newline='') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        csv_writer.writeheader()
+        for test_run in stats.test_runs:
+            csv_writer.writerow(flat_row(test_run))
+
+
+def _to_arrays(name: str, values: list) -> Dict[str, numpy.ndarray]:
+    """Numeric and boolean columns become float arrays with NaN for missing values,
+    other columns are stored as categorical: integer codes (-1 for missing value) and array of categories
+    """
+    numpy = import_numpy()
+    value_type = column_type(name)
+    if value_type is None:
+        # keys of input_formula_statistics are not in schema
+        present = [value for value in values if value is not None]
+        value_type = float if all(isinstance(value, (int, float)) for value in present) else str
+    if value_type in (int, float, bool):
+        return {name: numpy.array([numpy.nan if value is None else value for value in values], dtype=numpy.float64)}
+    categories = {}
+    codes = numpy.array([-1 if value is None else categories.setdefault(str(value), len(categories))
+                         for value in values], dtype=numpy.int32)
+    return {name: codes, f'{name}{CATEGORIES_SUFFIX}': numpy.array(list(categories), dtype=numpy.str_)}
+
+
+def test_runs_to_arrays(test_runs: List[TestRunStatistics]) -> Dict[str, numpy.ndarray]:
+    """Columns of flat test run table as numpy arrays, in the form they are saved to npz"""
+    columns = {name: [] for name in flat_columns(formula_statistics_keys(test_runs))}
+    for test_run in test_runs:
+        row = flat_row(test_run)
+        for name, values in columns.items():
+            values.append(row.get(name))
+    arrays = {}
+    for name, values in columns.items():
+        arrays.update(_to_arrays(name, values))
+    return arrays
+
+
+def decode_arrays(arrays: Dict[str, numpy.ndarray]) -> Dict[str, numpy.ndarray]:
+    """Replace categorical columns (codes and categories) with string arrays, empty string for missing value"""
+    numpy = import_numpy()
+    columns = {}
+    for name, array in arrays.items():
+        if name.endswith(CATEGORIES_SUFFIX):
+            continue
+        categories = arrays.get(f'{name}{CATEGORIES_SUFFIX}')
+        if categories is not None:
+            # code -1 (missing value) picks the appended empty string
+            array = numpy.append(categories, '')[array]
+        columns[name] = array
+    return columns
+
+
+def save_stats_to_npz(stats: Statistics, path: str):
+    """Compact columnar export (numpy .npz) of the same columns as csv, loads fast with load_npz"""
+    numpy = import_numpy()
+    if numpy is None:
+        logger.error('numpy is not installed, results can not be saved to npz')
+        return
+    out_file = path + '.npz'
+    logger.info(f'writing results to {out_file}')
+    numpy.savez_compressed(out_file, **test_runs_to_arrays(stats.test_runs))
+
+
+def load_npz(path: str, decode: bool = True) -> Dict[str, numpy.ndarray]:
+    """Load columns saved by save_stats_to_npz. Categorical columns are decoded to string arrays,
+    with decode=False integer codes and categories are returned as saved
+    """
+    numpy = import_numpy()
+    with numpy.load(path) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    return decode_arrays(arrays) if decode else arrays
+
+
+class ResultStream:
+    """Append only JSON Lines file with finished test runs (and optionally csv with the same runs).
+    First line describes run (date, hardware), each next line is one test run with its job index, key
+    and digest of input file
+    """
+
+    def __init__(self, path: str, with_csv: bool = True, fsync_every: int = 10, append: bool = False):
+        """
+        path: results path without extension, stream is written to path.jsonl and path.stream.csv
+        fsync_every: data is flushed after every test run, but synced to disk only after this many runs
+        append: continue existing stream instead of starting a new one
+        """
+        self.path = path + '.jsonl'
+        self.fsync_every = max(fsync_every, 1)
+        self._unsynced = 0
+        self._files = []
+        self._jsonl = open(self.path, 'a' if append else 'w')
+        self._files.append(self._jsonl)
+        self._csv_writer = None
+        if with_csv:
+            csv_path = path + '.stream.csv'
+            write_header = not append or not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            csv_file = open(csv_path, 'a' if append else 'w', newline='')
+            self._files.append(csv_file)
+            self._csv_writer = csv.DictWriter(csv_file, fieldnames=[column.name for column in test_run_columns()])
+            if write_header:
+                self._csv_writer.writeheader()
+
+    def write_header(self, stats: Statistics):
+        header = stats.to_dict(encode_json=True)
+        del header['test_runs']
+        self._write_line({'run': header})
+        self._sync()
+
+    def _write_line(self, record: dict):
+        self._jsonl.write(json.dumps(record) + '\n')
+        self._jsonl.flush()
+
+    def write(self, index: int, test_run: TestRunStatistics, key: str = '', input_digest: str = ''):
+        self._write_line({'index': index, 'key': key, 'input_digest': input_digest,
+                          'test_run': test_run.to_dict(encode_json=True)})
+        if self._csv_writer is not None:
+            row = {column.name: column.get(test_run) for column in test_run_columns()}
+            # keys of input_formula_statistics differ between inputs, csv schema of stream must stay stable
+            row[FORMULA_STATISTICS] = json.dumps(row[FORMULA_STATISTICS])
+            self._csv_writer.writerow(row)
+            self._files[-1].flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _sync(self):
+        for file in self._files:
+            file.flush()
+            os.fsync(file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self._sync()
+        for file in self._files:
+            file.close()
+
+
+def read_stream(path: str) -> Iterator[Union[Statistics, Tuple[int, str, TestRunStatistics, str]]]:
+    """Yield run headers (as Statistics without test runs) and (job index, job key, test run, input digest)
+    from stream file, input digest is empty in streams written before it was recorded.
+    Truncated last line (after crash) is skipped
+    """
+    with open(path) as stream:
+        for line_number, line in enumerate(stream, start=1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f'Skipping corrupted line {line_number} in {path}')
+                continue
+            if 'run' in record:
+                yield Statistics.from_dict(dict(record['run'], test_runs=[]))
+            else:
+                yield record['index'], record.get('key', ''), TestRunStatistics.from_dict(record['test_run']), \
+                    record.get('input_digest', '')
+
+
+def regenerate_results(stream_path: str, result_path: str, each_input_to_separate_file: bool,
+                       as_json: bool, as_csv: bool, as_npz: bool = False, job_indexes: Optional[Dict[str, int]] = None):
+    """Write aggregate json/csv/npz result files from stream, test runs are ordered by job index.
+    If job_indexes (job key -> index) is given, only test runs of these jobs are written (latest run of each job),
+    ordered by index from job_indexes. This merges results of resumed runs and drops results invalidated since
+    """
+    stats = None
+    latest = {}
+    for item in read_stream(stream_path):
+        if isinstance(item, Statistics):
+            # resumed runs append their own header, the first one describes the whole benchmark
+            stats = stats or item
+            continue
+        index, key, test_run, _ = item
+        if job_indexes is None:
+            latest[len(latest)] = (index, test_run)
+        elif key in job_indexes:
+            latest[key] = (job_indexes[key], test_run)
+    stats = stats or Statistics()
+    test_runs = defaultdict(list)
+    for index, test_run in latest.values():
+        test_runs[test_run.minimal_input_statistics.name].append((index, test_run))
+
+    def save(test_runs_to_save: List[Tuple[int, TestRunStatistics]], path: str):
+        stats_copy = dataclasses.replace(stats, test_runs=[test_run for _, test_run in
+                                                           sorted(test_runs_to_save, key=lambda item: item[0])])
+        if as_json:
+            save_stats_to_json(stats_copy, path)
+        if as_csv:
+            save_stats_to_csv(stats_copy, path)
+        if as_npz:
+            save_stats_to_npz(stats_copy, path)
+
+    if each_input_to_separate_file:
+        for input_name, test_runs_for_input in test_runs.items():
+            save(test_runs_for_input, f'{result_path}-{input_name}')
+    else:
+        save([item for test_runs_for_input in test_runs.values() for item in test_runs_for_input], result_path)
@@ -0,0 +1,70 @@
+"""Incremental re-runs: every job gets a key that changes whenever its result could change,
+jobs whose key is already in results stream are not run again
+"""
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Set, Iterable, Iterator, Callable, Union
+
+from provers_benchmark.config import TestSuite, Portfolio
+from provers_benchmark.scheduler import Job
+from provers_benchmark.utils import command_name, which, file_digest
+
+logger = logging.getLogger('ProverBenchmark')
+
+
+@lru_cache(maxsize=None)
+def resolved_command(command: str) -> str:
+    """Command with executable replaced by its real path"""
+    executable = which(command_name(command))
+    if executable is None:
+        return command
+    return ' '.join([os.path.realpath(executable)] + command.split()[1:])
+
+
+def suite_identity(test_suite: Union[TestSuite, Portfolio]) -> list:
+    """Name, version and resolved command of test suite, of portfolio its name, version and identities of members"""
+    if isinstance(test_suite, Portfolio):
+        return [test_suite.name, test_suite.version, [suite_identity(member) for member in test_suite.members]]
+    return [test_suite.name, test_suite.version, resolved_command(test_suite.command)]
+
+
+def job_key(job: Job, timeout: int, input_digest: str) -> str:
+    """Key of job: test suite name, version and resolved command, input format and path, input content and timeout.
+    Path tells apart inputs with the same content, content digest only detects that input changed
+    """
+    key = json.dumps([*suite_identity(job.test_suite), job.test_input.format, os.path.normpath(job.file),
+                      input_digest, timeout])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def with_keys(jobs: Iterable[Job], timeout: int, digest: Callable[[str], str] = file_digest) -> Iterator[Job]:
+    """Yield jobs with assigned keys, digest computes digest of input file (e.g. FileManifest.digest)"""
+    for job in jobs:
+        job.input_digest = digest(job.file)
+        job.key = job_key(job, timeout=timeout, input_digest=job.input_digest)
+        yield job
+
+
+def assign_keys(jobs: Iterable[Job], timeout: int, digest: Callable[[str], str] = file_digest):
+    for _ in with_keys(jobs, timeout, digest):
+        pass
+
+
+def completed_job_keys(stream_path: str) -> Set[str]:
+    """Keys of all test runs in results stream, except runs that failed in the benchmark itself (harness_error)"""
+    keys = set()
+    if not os.path.exists(stream_path):
+        return keys
+    with open(stream_path) as stream:
+        for line in stream:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            output = (record.get('test_run') or {}).get('output') or {}
+            if (key := record.get('key')) and not output.get('harness_error'):
+                keys.add(key)
+    return keys
@@ -0,0 +1,162 @@
+"""Expands config into (test input, test suite, file) jobs and runs them on a bounded pool of workers"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, replace
+from typing import List, Optional, Iterable, Iterator, Callable, FrozenSet, Union
+
+from provers_benchmark.config import BenchmarkConfig, TestInput, TestSuite, Portfolio
+from provers_benchmark.statistics.stats import TestRunStatistics, ExecutionStatistics, OutputStatistics, SATStatus, \
+    MinimalSATStatistics
+from provers_benchmark.utils import executable_name
+
+logger = logging.getLogger('ProverBenchmark')
+
+
+@dataclass
+class Job:
+    index: int
+    """Position of job in serial order (input -> file -> suite), used to keep results ordered"""
+    test_input: TestInput
+    test_suite: Union[TestSuite, Portfolio]
+    file: str
+    key: str = ''
+    """Identifies job across runs, see provers_benchmark.resume"""
+    input_digest: str = ''
+    """Digest of input file content the key was computed from"""
+
+
+def iter_jobs(config: BenchmarkConfig) -> Iterator[Job]:
+    """Expand config into jobs in the same order as they would be run serially. Files of test input are streamed
+    from its patterns as jobs are consumed, all test suites run on a file before the next one is discovered.
+    Portfolios follow test suites, test suites that are not standalone run only within portfolios
+    """
+    test_suites = [test_suite for test_suite in config.test_suites if test_suite.standalone] + config.portfolios
+    index = 0
+    for test_input in config.test_inputs:
+        files = 0
+        for file in test_input.iter_files():
+            files += 1
+            for test_suite in test_suites:
+                yield Job(index=index, test_input=test_input, test_suite=test_suite, file=file)
+                index += 1
+        logger.info(f'Test input {test_input.name}: {files} files')
+
+
+def member_jobs(job: Job) -> List[Job]:
+    """Jobs of members of portfolio job on the same input, the job itself if it is not a portfolio"""
+    if not isinstance(job.test_suite, Portfolio):
+        return [job]
+    return [replace(job, test_suite=member) for member in job.test_suite.members]
+
+
+def failed_test_run(job: Job, error: BaseException) -> TestRunStatistics:
+    """Test run of job whose runner raised, it ends with error so that the job is not missing from results"""
+    test_suite = job.test_suite
+    return TestRunStatistics(name=test_suite.name,
+                             program_name='portfolio' if isinstance(test_suite, Portfolio)
+                             else executable_name(test_suite.command),
+                             program_version=test_suite.version,
+                             command=test_suite.command,
+                             execution_statistics=ExecutionStatistics(),
+                             minimal_input_statistics=MinimalSATStatistics(name=job.test_input.name, path=job.file,
+                                                                           format=job.test_input.format),
+                             output=OutputStatistics(status=SATStatus.ERROR, stderr=str(error),
+                                                     harness_error=f'{type(error).__name__}: {error}'))
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CorePool:
+    """Hands out disjoint sets of cores, so that concurrently running jobs do not compete for the same core.
+    With cores_per_job == 0 jobs are not pinned and only the number of concurrent jobs is limited
+    """
+
+    def __init__(self, workers: int, cores_per_job: int):
+        self._slots = queue.Queue()
+        self.spare: Optional[FrozenSet[int]] = None
+        """Cores not handed out to jobs, None if there are none (or jobs are not pinned)"""
+        if cores_per_job <= 0:
+            for _ in range(max(workers, 1)):
+                self._slots.put(None)
+            self.size = max(workers, 1)
+            return
+
+        cores = available_cores()
+        max_workers = max(len(cores) // cores_per_job, 1)
+        if workers > max_workers:
+            logger.warning(f'{workers} jobs with {cores_per_job} core(s) each do not fit on {len(cores)} cores, '
+                           f'running {max_workers} jobs at once')
+            workers = max_workers
+        for i in range(max(workers, 1)):
+            self._slots.put(frozenset(cores[i * cores_per_job:(i + 1) * cores_per_job] or cores))
+        self.size = max(workers, 1)
+        self.spare = frozenset(cores[self.size * cores_per_job:]) or None
+
+    def acquire(self) -> Optional[FrozenSet[int]]:
+        return self._slots.get()
+
+    def release(self, cores: Optional[FrozenSet[int]]):
+        self._slots.put(cores)
+
+
+JobRunner = Callable[[Job, Optional[FrozenSet[int]]], TestRunStatistics]
+ResultCallback = Callable[[Job, TestRunStatistics], None]
+JobCallback = Callable[[Job], None]
+
+
+class Scheduler:
+    """Run jobs on a pool of worker threads. Each worker only supervises its benchmarked process,
+    so threads are enough - the actual work happens in child processes pinned to cores from CorePool
+    """
+
+    def __init__(self, workers: int = 1, cores_per_job: int = 1):
+        self.cores = CorePool(workers=workers, cores_per_job=cores_per_job)
+        self.workers = self.cores.size
+
+    def _run_one(self, runner: JobRunner, job: Job, on_start: Optional[JobCallback]) -> TestRunStatistics:
+        cores = self.cores.acquire()
+        try:
+            if on_start is not None:
+                on_start(job)
+            return runner(job, cores)
+        finally:
+            self.cores.release(cores)
+
+    def run(self, jobs: Iterable[Job], runner: JobRunner, on_result: ResultCallback,
+            on_start: Optional[JobCallback] = None):
+        """Run all jobs, on_result is called from the calling thread as soon as job finishes, on_start from worker
+        thread when job got its cores. At most 2 * workers jobs are submitted at once, so jobs can be consumed lazily
+        """
+        logger.info(f'Running jobs on {self.workers} worker(s)')
+        max_pending = 2 * self.workers
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='benchmark-worker') as executor:
+            pending = {}
+            jobs = iter(jobs)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    pending[executor.submit(self._run_one, runner, job, on_start)] = job
+
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    try:
+                        test_run = future.result()
+                    except Exception as e:
+                        logger.exception(f'Job "{job.test_suite.name}" with input "{job.file}" failed')
+                        test_run = failed_test_run(job, e)
+                    on_result(job, test_run)
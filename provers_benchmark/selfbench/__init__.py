@@ -0,0 +1,17 @@
+"""Self-benchmark of the harness: fake provers that sleep, allocate memory, burn cpu or flood stdout are run through
+run_benchmark and the schedulers to measure timing and memory attribution error, per-job overhead and throughput.
+Run as python -m provers_benchmark.selfbench
+"""
+from .harness import Scenario, SCENARIOS, ScenarioReport, ThroughputReport, SelfBenchmarkReport, SelfBenchmark, \
+    run_selfbench, install_fake_prover
+
+__all__ = [
+    'Scenario',
+    'SCENARIOS',
+    'ScenarioReport',
+    'ThroughputReport',
+    'SelfBenchmarkReport',
+    'SelfBenchmark',
+    'run_selfbench',
+    'install_fake_prover',
+]
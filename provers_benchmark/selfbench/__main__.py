@@ -0,0 +1,125 @@
+import argparse
+import logging
+import sys
+import tempfile
+from typing import Optional, List
+
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.selfbench.harness import Scenario, SCENARIOS, SelfBenchmarkReport, run_selfbench
+
+MB = 1024 * 1024
+
+
+def parse_scenario(value: str) -> Scenario:
+    """NAME=ARGUMENTS of fake prover, e.g. big=--memory 1024"""
+    name, separator, arguments = value.partition('=')
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f'invalid scenario "{value}", use NAME=ARGUMENTS')
+    return Scenario(name, arguments)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m provers_benchmark.selfbench",
+                                     description="Measure the benchmark harness itself with fake provers: timing and "
+                                                 "memory attribution error, per-job overhead and throughput")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="runs of every scenario (default: 5)")
+    parser.add_argument("--harness", choices=["threads", "asyncio"], default="threads",
+                        help="harness that runs scenarios (default: threads)")
+    parser.add_argument("--sampling-interval", type=float, default=0.1)
+    parser.add_argument("--cgroups", action="store_true", help="account resources with cgroups")
+    parser.add_argument("--scenario", action="append", type=parse_scenario, metavar="NAME=ARGUMENTS",
+                        help="run this scenario instead of the default ones (can be repeated), arguments of fake "
+                             "prover: --memory MB --cpu SECONDS --stdout MB --rate MB_PER_SECOND --sleep SECONDS")
+    parser.add_argument("--only", nargs='+', metavar="NAME", help="run only these default scenarios")
+    parser.add_argument("--throughput-jobs", type=int, default=200,
+                        help="no-op jobs run through both schedulers to measure throughput, 0 to skip (default: 200)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="jobs run at once in throughput test (default: 8)")
+    parser.add_argument("-o", "--output", help="save report to json file")
+    parser.add_argument("--baseline", help="json report to compare with (e.g. of previous version of harness)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every run")
+    return parser.parse_args()
+
+
+def _format(value: Optional[float], unit: str = 's') -> str:
+    if value is None:
+        return '-'
+    if unit == 'MB':
+        return f'{value / MB:+.1f}'
+    return f'{value * 1000:.1f}ms' if unit == 'ms' else f'{value:.3f}'
+
+
+def _table(rows: List[List[str]]) -> List[str]:
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return ['  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                      for i, (cell, width) in enumerate(zip(row, widths))) for row in rows]
+
+
+def format_report(report: SelfBenchmarkReport, baseline: Optional[SelfBenchmarkReport] = None) -> str:
+    """Tables of scenarios and throughput, with baseline values in parentheses"""
+    base_scenarios = {scenario.name: scenario for scenario in baseline.scenarios} if baseline is not None else {}
+    base_throughput = {throughput.harness: throughput for throughput in baseline.throughput} \
+        if baseline is not None else {}
+
+    def compared(value: Optional[float], base, attribute: str, unit: str) -> str:
+        text = _format(value, unit)
+        if base is not None:
+            text += f' ({_format(getattr(base, attribute), unit)})'
+        return text
+
+    lines = [f'Harness: {report.harness}, sampling every {report.sampling_interval}s, '
+             f'{"cgroup" if report.use_cgroups else "rusage"} accounting'
+             + (f', baseline from {baseline.date:%Y-%m-%d %H:%M}' if baseline is not None else '')]
+    rows = [['scenario', 'reference', 'timing error', 'overhead', 'harness cpu', 'cpu error', 'memory error MB',
+             'wrong']]
+    for scenario in report.scenarios:
+        base = base_scenarios.get(scenario.name)
+        rows.append([scenario.name, _format(scenario.reference_time),
+                     compared(scenario.timing_error, base, 'timing_error', 'ms'),
+                     compared(scenario.overhead, base, 'overhead', 'ms'),
+                     compared(scenario.harness_cpu_time, base, 'harness_cpu_time', 'ms'),
+                     compared(scenario.cpu_error, base, 'cpu_error', 'ms'),
+                     compared(scenario.memory_error, base, 'memory_error', 'MB'),
+                     str(scenario.wrong_statuses)])
+    lines += _table(rows)
+    if report.throughput:
+        rows = [['harness', 'jobs', 'workers', 'jobs/s', 'harness cpu/job']]
+        for throughput in report.throughput:
+            base = base_throughput.get(throughput.harness)
+            rows.append([throughput.harness, str(throughput.jobs), str(throughput.workers),
+                         compared(throughput.jobs_per_second, base, 'jobs_per_second', 's'),
+                         compared(throughput.harness_cpu_time, base, 'harness_cpu_time', 'ms')])
+        lines.append('')
+        lines += _table(rows)
+    return '\n'.join(lines)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    logging.getLogger('ProverBenchmark').setLevel(logging.INFO if args.verbose else logging.WARNING)
+    try:
+        scenarios = args.scenario
+        if scenarios is None:
+            scenarios = [scenario for scenario in SCENARIOS if args.only is None or scenario.name in args.only]
+            if args.only is not None and len(scenarios) != len(set(args.only)):
+                known = ', '.join(scenario.name for scenario in SCENARIOS)
+                raise BenchmarkException(f'Unknown scenario in {", ".join(args.only)}, known are: {known}')
+        baseline = None
+        if args.baseline is not None:
+            with open(args.baseline) as baseline_file:
+                baseline = SelfBenchmarkReport.from_json(baseline_file.read())
+        with tempfile.TemporaryDirectory(prefix='selfbench-') as directory:
+            report = run_selfbench(directory, scenarios=scenarios, runs=args.runs, harness=args.harness,
+                                   sampling_interval=args.sampling_interval, use_cgroups=args.cgroups,
+                                   throughput_jobs=args.throughput_jobs, workers=args.jobs)
+        print(format_report(report, baseline))
+        if args.output is not None:
+            with open(args.output, 'w') as output:
+                output.write(report.to_json(indent=2))
+    except BenchmarkException as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Fake prover for measuring the harness itself. It allocates memory, burns cpu, floods stdout and sleeps
+as asked, prints SPASS verdict and reports what it really used as the last line of stderr:
+selfbench {"wall": ..., "cpu": ..., "maxrss": ...}
+Only standard library is imported, so that start of interpreter is as short as possible
+"""
+import argparse
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+_START = time.perf_counter()
+PAGE_SIZE = 4096
+CHUNK_SIZE = 64 * 1024
+REPORT_PREFIX = 'selfbench '
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fake prover for measuring overhead of provers benchmark")
+    parser.add_argument("input", nargs='?', help="input file, ignored")
+    parser.add_argument("--memory", type=float, default=0, help="allocate (and touch) this many MB")
+    parser.add_argument("--cpu", type=float, default=0, help="burn this many seconds of cpu time")
+    parser.add_argument("--stdout", type=float, default=0, help="write this many MB to stdout")
+    parser.add_argument("--rate", type=float, default=None, help="write stdout at most this many MB per second")
+    parser.add_argument("--sleep", type=float, default=0, help="sleep this many seconds at the end")
+    parser.add_argument("--ignore-term", action="store_true", help="ignore SIGTERM")
+    parser.add_argument("--orphans", type=int, default=0,
+                        help="leave behind this many children sleeping for a minute (they ignore SIGTERM as well)")
+    return parser.parse_args()
+
+
+def allocate(megabytes: float) -> bytearray:
+    memory = bytearray(int(megabytes * 1024 * 1024))
+    # pages of zeroed allocation are not resident until they are written to
+    memory[::PAGE_SIZE] = b'\x01' * len(range(0, len(memory), PAGE_SIZE))
+    return memory
+
+
+def burn_cpu(seconds: float):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        sum(range(1000))
+
+
+def flood(megabytes: float, rate: float = None):
+    line = b'x' * (CHUNK_SIZE - 1) + b'\n'
+    total = int(megabytes * 1024 * 1024)
+    start = time.perf_counter()
+    written = 0
+    while written < total:
+        # suffix of line, so that output always ends with whole line
+        chunk = line[-min(CHUNK_SIZE, total - written):]
+        sys.stdout.buffer.write(chunk)
+        written += len(chunk)
+        if rate:
+            delay = start + written / (rate * 1024 * 1024) - time.perf_counter()
+            if delay > 0:
+                sys.stdout.buffer.flush()
+                time.sleep(delay)
+
+
+def leave_orphans(count: int):
+    for _ in range(count):
+        if os.fork() == 0:
+            time.sleep(60)
+            os._exit(0)
+
+
+def main():
+    args = parse_args()
+    if args.ignore_term:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    leave_orphans(args.orphans)
+    print('SPASS V 3.9 (selfbench)', flush=True)
+    memory = allocate(args.memory) if args.memory else None
+    burn_cpu(args.cpu)
+    flood(args.stdout, args.rate)
+    time.sleep(args.sleep)
+    print('SPASS beiseite: Proof found.', flush=True)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    report = {'wall': time.perf_counter() - _START, 'cpu': usage.ru_utime + usage.ru_stime,
+              # ru_maxrss is in kilobytes on linux
+              'maxrss': usage.ru_maxrss * 1024, 'allocated': len(memory) if memory is not None else 0}
+    print(REPORT_PREFIX + json.dumps(report), file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Scenarios of fake prover run through run_benchmark and compared with what the fake prover reported it really used
+and with the same command run by bare subprocess. Throughput is measured by running many short jobs through
+the threaded and asyncio scheduler
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
+
+from dataclasses_json import DataClassJsonMixin
+
+from provers_benchmark.config import TestSuite, TestInput, InputMode, INPUT_PATH_TEMPLATE
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.scheduler import Job, Scheduler
+from provers_benchmark.selfbench.fake_prover import REPORT_PREFIX
+from provers_benchmark.statistics.stats import HardwareStatistics, SATStatus, ExecutionStatistics, OutputStatistics
+
+logger = logging.getLogger('ProverBenchmark')
+
+FAKE_PROVER_NAME = 'SPASS'
+"""Fake prover is installed under this name, so that its verdict is parsed by SPASS parser"""
+
+
+@dataclass
+class Scenario:
+    name: str
+    arguments: str = ''
+    """Arguments of fake prover, see provers_benchmark.selfbench.fake_prover"""
+
+
+SCENARIOS = [
+    Scenario('noop'),
+    Scenario('sleep', '--sleep 1'),
+    Scenario('cpu', '--cpu 1'),
+    Scenario('memory', '--memory 256 --sleep 0.5'),
+    Scenario('flood', '--stdout 64'),
+    Scenario('flood-rate', '--stdout 8 --rate 16'),
+]
+
+
+@dataclass
+class ScenarioReport(DataClassJsonMixin):
+    """Medians over runs of one scenario, errors are measured minus real values"""
+    name: str
+    arguments: str
+    runs: int
+    reference_time: float
+    """Wall time of command run by bare subprocess with output to /dev/null"""
+    execution_time: float
+    """Execution time measured by harness"""
+    timing_error: float
+    """execution_time - reference_time"""
+    job_time: float
+    """Wall time of whole run_benchmark call, including setup and collecting of statistics"""
+    overhead: float
+    """job_time - reference_time"""
+    harness_cpu_time: float
+    """Cpu time of benchmark process itself (all its threads) per run"""
+    cpu_time: Optional[float]
+    reported_cpu_time: float
+    """Cpu time fake prover reported"""
+    cpu_error: Optional[float]
+    peak_memory: Optional[int]
+    reported_memory: int
+    """Peak resident memory fake prover reported"""
+    memory_error: Optional[int]
+    wrong_statuses: int = 0
+    """Runs that did not end as satisfiable"""
+
+
+@dataclass
+class ThroughputReport(DataClassJsonMixin):
+    harness: str
+    """threads or asyncio"""
+    jobs: int
+    workers: int
+    wall_time: float
+    jobs_per_second: float
+    harness_cpu_time: float
+    """Cpu time of benchmark process itself per job"""
+
+
+@dataclass
+class SelfBenchmarkReport(DataClassJsonMixin):
+    date: datetime.datetime = field(default_factory=datetime.datetime.now)
+    hardware: HardwareStatistics = field(default_factory=HardwareStatistics)
+    harness: str = 'threads'
+    sampling_interval: float = 0.1
+    use_cgroups: bool = False
+    scenarios: List[ScenarioReport] = field(default_factory=list)
+    throughput: List[ThroughputReport] = field(default_factory=list)
+
+
+def install_fake_prover(directory: str) -> str:
+    """Copy fake prover to directory as executable named FAKE_PROVER_NAME, run by this interpreter"""
+    path = os.path.join(directory, FAKE_PROVER_NAME)
+    source = os.path.join(os.path.dirname(__file__), 'fake_prover.py')
+    with open(source) as fake_prover, open(path, 'w') as installed:
+        # -S: do not import site, so that start of interpreter is short
+        installed.write(f'#!{sys.executable} -S\n')
+        shutil.copyfileobj(fake_prover, installed)
+    os.chmod(path, 0o755)
+    return path
+
+
+def _harness_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _reported(stderr: Optional[str]) -> Dict:
+    """Usage fake prover reported as the last line of its stderr"""
+    for line in reversed((stderr or '').splitlines()):
+        if line.startswith(REPORT_PREFIX):
+            return json.loads(line[len(REPORT_PREFIX):])
+    raise BenchmarkException(f'Fake prover did not report its usage, stderr: {stderr!r}')
+
+
+def reference_time(command: str) -> float:
+    """Wall time of command run by bare subprocess, with output to /dev/null"""
+    start = time.perf_counter()
+    subprocess.run(command, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def _difference(measured: Optional[float], real: Optional[float]) -> Optional[float]:
+    return measured - real if measured is not None and real is not None else None
+
+
+class SelfBenchmark:
+    """Runs fake prover through the benchmark harness, with the same settings as benchmark would"""
+
+    def __init__(self, directory: str, harness: str = 'threads', sampling_interval: float = 0.1,
+                 use_cgroups: bool = False, timeout: int = 60):
+        """
+        directory: where fake prover and its (empty) input are written
+        harness: threads (run_benchmark) or asyncio (run_benchmark_async)
+        """
+        self.prover = install_fake_prover(directory)
+        self.input_path = os.path.join(directory, 'input.p')
+        open(self.input_path, 'w').close()
+        self.harness = harness
+        self.sampling_interval = sampling_interval
+        self.use_cgroups = use_cgroups
+        self.timeout = timeout
+
+    def test_suite(self, scenario: Scenario) -> TestSuite:
+        return TestSuite(name=scenario.name, command=f'{self.prover} {INPUT_PATH_TEMPLATE} {scenario.arguments}',
+                         required_format='tptp', input_mode=InputMode.ARGUMENT)
+
+    def run(self, test_suite: TestSuite) -> Tuple[ExecutionStatistics, OutputStatistics]:
+        arguments = dict(test_suite=test_suite, input_path=self.input_path, timeout=self.timeout,
+                         sampling_interval=self.sampling_interval, use_cgroups=self.use_cgroups)
+        if self.harness == 'asyncio':
+            from provers_benchmark.async_runner import run_benchmark_async
+            return asyncio.run(run_benchmark_async(**arguments))
+        from provers_benchmark.benchmark import run_benchmark
+        return run_benchmark(**arguments)
+
+    def measure(self, scenario: Scenario, runs: int = 5) -> ScenarioReport:
+        """Run scenario runs times by bare subprocess and by harness, alternately"""
+        test_suite = self.test_suite(scenario)
+        command = test_suite.command.replace(INPUT_PATH_TEMPLATE, self.input_path)
+        references, job_times, harness_cpu_times, executions, reports = [], [], [], [], []
+        wrong_statuses = 0
+        for _ in range(runs):
+            references.append(reference_time(command))
+            cpu_start, start = _harness_cpu_time(), time.perf_counter()
+            execution, output = self.run(test_suite)
+            job_times.append(time.perf_counter() - start)
+            harness_cpu_times.append(_harness_cpu_time() - cpu_start)
+            executions.append(execution)
+            reports.append(_reported(output.stderr))
+            wrong_statuses += output.status != SATStatus.SATISFIABLE
+
+        reference = statistics.median(references)
+        execution_time = statistics.median(execution.execution_time for execution in executions)
+        job_time = statistics.median(job_times)
+        cpu_time = _median([execution.cpu_time for execution in executions])
+        reported_cpu_time = statistics.median(report['cpu'] for report in reports)
+        peak_memory = _median([execution.peak_memory for execution in executions])
+        reported_memory = statistics.median(report['maxrss'] for report in reports)
+        return ScenarioReport(name=scenario.name, arguments=scenario.arguments, runs=runs,
+                              reference_time=reference, execution_time=execution_time,
+                              timing_error=execution_time - reference, job_time=job_time, overhead=job_time - reference,
+                              harness_cpu_time=statistics.median(harness_cpu_times),
+                              cpu_time=cpu_time, reported_cpu_time=reported_cpu_time,
+                              cpu_error=_difference(cpu_time, reported_cpu_time),
+                              peak_memory=int(peak_memory) if peak_memory is not None else None,
+                              reported_memory=int(reported_memory),
+                              memory_error=_difference(peak_memory, reported_memory),
+                              wrong_statuses=wrong_statuses)
+
+    def throughput(self, harness: str, jobs: int = 200, workers: int = 8,
+                   scenario: Scenario = SCENARIOS[0]) -> ThroughputReport:
+        """Run jobs of scenario (no-op by default) through scheduler of harness with workers at once,
+        jobs are not pinned to cores
+        """
+        test_suite = self.test_suite(scenario)
+        test_input = TestInput(patterns=[self.input_path], format='tptp', name='selfbench')
+        all_jobs = (Job(index=i, test_input=test_input, test_suite=test_suite, file=self.input_path)
+                    for i in range(jobs))
+        arguments = dict(test_suite=test_suite, input_path=self.input_path, timeout=self.timeout,
+                         sampling_interval=self.sampling_interval, use_cgroups=self.use_cgroups)
+        done = []
+
+        def on_result(job: Job, result):
+            done.append(job)
+
+        cpu_start, start = _harness_cpu_time(), time.perf_counter()
+        if harness == 'asyncio':
+            from provers_benchmark.async_runner import AsyncScheduler, run_benchmark_async
+            scheduler = AsyncScheduler(workers=workers, cores_per_job=0)
+            scheduler.run(all_jobs, runner=lambda job, cores: run_benchmark_async(**arguments), on_result=on_result)
+        else:
+            from provers_benchmark.benchmark import run_benchmark
+            scheduler = Scheduler(workers=workers, cores_per_job=0)
+            scheduler.run(all_jobs, runner=lambda job, cores: run_benchmark(**arguments), on_result=on_result)
+        wall_time = time.perf_counter() - start
+        if len(done) != jobs:
+            logger.warning(f'Throughput with {harness}: only {len(done)} of {jobs} jobs finished')
+        return ThroughputReport(harness=harness, jobs=len(done), workers=scheduler.workers, wall_time=wall_time,
+                                jobs_per_second=len(done) / wall_time,
+                                harness_cpu_time=(_harness_cpu_time() - cpu_start) / max(len(done), 1))
+
+
+def run_selfbench(directory: str, scenarios: List[Scenario] = None, runs: int = 5, harness: str = 'threads',
+                  sampling_interval: float = 0.1, use_cgroups: bool = False, throughput_jobs: int = 200,
+                  workers: int = 8) -> SelfBenchmarkReport:
+    """Measure every scenario and throughput of both harnesses (unless throughput_jobs is 0)"""
+    bench = SelfBenchmark(directory, harness=harness, sampling_interval=sampling_interval, use_cgroups=use_cgroups)
+    report = SelfBenchmarkReport(harness=harness, sampling_interval=sampling_interval, use_cgroups=use_cgroups)
+    for scenario in scenarios if scenarios is not None else SCENARIOS:
+        logger.info(f'Self-benchmark: scenario {scenario.name}')
+        report.scenarios.append(bench.measure(scenario, runs=runs))
+    if throughput_jobs > 0:
+        for throughput_harness in ('threads', 'asyncio'):
+            logger.info(f'Self-benchmark: throughput of {throughput_harness} harness')
+            report.throughput.append(bench.throughput(throughput_harness, jobs=throughput_jobs, workers=workers))
+    return report
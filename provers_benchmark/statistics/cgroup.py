@@ -0,0 +1,166 @@
+"""Minimal cgroup v2 support: every benchmarked process tree can be run in its own cgroup,
+so that kernel accounts cpu time, peak memory and io of all descendants, even those that were not waited for
+"""
+import itertools
+import logging
+import os
+import time
+from typing import Optional, Dict
+
+logger = logging.getLogger('ProverBenchmark')
+
+_cgroup_ids = itertools.count()
+
+
+def cgroup2_mount_point() -> Optional[str]:
+    try:
+        with open('/proc/self/mounts') as mounts:
+            for line in mounts:
+                _, mount_point, fs_type, *_ = line.split()
+                if fs_type == 'cgroup2':
+                    return mount_point
+    except OSError:
+        pass
+    return None
+
+
+def own_cgroup() -> Optional[str]:
+    """Absolute path of cgroup v2 that current process belongs to"""
+    mount_point = cgroup2_mount_point()
+    if mount_point is None:
+        return None
+    try:
+        with open('/proc/self/cgroup') as cgroups:
+            for line in cgroups:
+                hierarchy, _, path = line.rstrip('\n').split(':', 2)
+                if hierarchy == '0':
+                    return os.path.join(mount_point, path.lstrip('/'))
+    except OSError:
+        pass
+    return None
+
+
+def _read_key_values(path: str) -> Dict[str, int]:
+    values = {}
+    with open(path) as file:
+        for line in file:
+            key, value = line.split()
+            values[key] = int(value)
+    return values
+
+
+class Cgroup:
+    """Cgroup v2 created for one benchmarked process tree"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def create(cls, root: Optional[str] = None) -> Optional['Cgroup']:
+        """Create new cgroup in root (by default in cgroup of current process).
+        Return None if cgroups v2 are not available or not delegated to current user
+        """
+        root = root or own_cgroup()
+        if root is None:
+            return None
+        path = os.path.join(root, f'provers-benchmark-{os.getpid()}-{next(_cgroup_ids)}')
+        try:
+            os.mkdir(path)
+        except OSError as e:
+            logger.debug(f'Can not create cgroup {path}: {e}')
+            return None
+        return cls(path)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def join(self):
+        """Move calling process to cgroup. Safe to call in preexec_fn (uses only raw syscalls)"""
+        fd = os.open(self._file('cgroup.procs'), os.O_WRONLY)
+        try:
+            os.write(fd, b'0')
+        finally:
+            os.close(fd)
+
+    def _write(self, name: str, value: str):
+        with open(self._file(name), 'w') as file:
+            file.write(value)
+
+    def limit_memory(self, limit: int) -> bool:
+        """Set hard limit (memory.max) on memory of whole process tree, when it is exceeded kernel OOM killer kills
+        the whole tree. Swap is disabled, so that limit can not be bypassed.
+        Return False if memory controller is not enabled
+        """
+        try:
+            self._write('memory.max', str(limit))
+        except OSError as e:
+            logger.debug(f'Can not limit memory of cgroup {self.path}: {e}')
+            return False
+        for name, value in (('memory.swap.max', '0'), ('memory.oom.group', '1')):
+            try:
+                self._write(name, value)
+            except OSError:
+                pass
+        return True
+
+    def oom_kills(self) -> int:
+        """Number of processes in cgroup killed by OOM killer (for exceeded memory.max or system-wide OOM)"""
+        try:
+            return _read_key_values(self._file('memory.events')).get('oom_kill', 0)
+        except (OSError, ValueError):
+            return 0
+
+    def memory_peak(self) -> Optional[int]:
+        """Peak memory usage in bytes, None if memory controller is not enabled (or kernel is older than 5.19)"""
+        try:
+            with open(self._file('memory.peak')) as file:
+                return int(file.read())
+        except (OSError, ValueError):
+            return None
+
+    def cpu_stat(self) -> Dict[str, int]:
+        """Content of cpu.stat, times are in microseconds"""
+        try:
+            return _read_key_values(self._file('cpu.stat'))
+        except (OSError, ValueError):
+            return {}
+
+    def io_stat(self) -> Optional[Dict[str, int]]:
+        """Read and written bytes summed over all devices, None if io controller is not enabled"""
+        try:
+            with open(self._file('io.stat')) as file:
+                lines = file.readlines()
+        except OSError:
+            return None
+        total = {'rbytes': 0, 'wbytes': 0}
+        for line in lines:
+            for item in line.split()[1:]:
+                key, _, value = item.partition('=')
+                if key in total:
+                    total[key] += int(value)
+        return total
+
+    def pids(self):
+        try:
+            with open(self._file('cgroup.procs')) as file:
+                return [int(pid) for pid in file.read().split()]
+        except OSError:
+            return []
+
+    def kill(self):
+        """SIGKILL all processes in cgroup (kernel 5.14+), even those that started their own session"""
+        if self.pids() and os.path.exists(self._file('cgroup.kill')):
+            self._write('cgroup.kill', '1')
+
+    def remove(self):
+        """Remove cgroup. Processes that are still inside are killed"""
+        self.kill()
+        for _ in range(100):
+            try:
+                os.rmdir(self.path)
+                return
+            except OSError as e:
+                error = e
+            # killed processes may need a while to exit
+            time.sleep(0.01)
+        logger.warning(f'Can not remove cgroup {self.path}: {error}')
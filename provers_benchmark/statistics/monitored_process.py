@@ -1,34 +1,234 @@
+import logging
+import os
+import select
+import signal
 import subprocess
+import threading
 import time
+from typing import Optional, List, Set
 
 import psutil
 
+from provers_benchmark.statistics.cgroup import Cgroup
 from provers_benchmark.statistics.stats import ExecutionStatistics
+from provers_benchmark.statistics.timeseries import TimeSeries
+
+logger = logging.getLogger('ProverBenchmark')
 
 
 class MonitoredProcess(subprocess.Popen):
-    """Start process that can be monitored by periodic calling poll() in active loop
+    """Start process that can be monitored without active polling
     Note that:
-    poll() must be called at least once to get proper statistics
-    short running process can exit before poll method was executed
+    wait_for_exit() blocks until process exits or timeout elapses, it wakes up as soon as process exits
+    (or when interrupt_wait() is called from other thread)
+    sample() updates resource statistics, it is independent from waiting and can be called at any rate,
+    every sample is also recorded to timeseries if given
+    short running process can exit before sample method was executed, but final cpu time, peak memory and io
+    are taken from kernel accounting (rusage of reaped process or cgroup if given) anyway
     use with context manager to auto stop execution time
+    with start_new_session=True process runs in its own session and process group, signal_tree() then signals
+    all its descendants (that did not start their own session, with cgroup SIGKILL reaches even those)
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, cgroup: Optional[Cgroup] = None, timeseries: Optional[TimeSeries] = None, **kwargs):
         self.exec_stats = ExecutionStatistics()
+        self.cgroup = cgroup
+        self.timeseries = timeseries
+        self.rusage = None
+        if cgroup is not None:
+            kwargs['preexec_fn'] = _join_cgroup(cgroup, kwargs.get('preexec_fn'))
+        self._fork_rss = psutil.Process().memory_info().rss
+        self._own_group = kwargs.get('start_new_session', False)
         super().__init__(*args, **kwargs)
         self._start = time.perf_counter()
+        self._end = None
         self.proc = psutil.Process(self.pid)
-        self.poll()
+        self._descendants: Set[psutil.Process] = set()
+        """Descendants seen by last sample(), they are reparented when process exits, so they are looked for here"""
+        self._pidfd = None
+        self._reaped_in_thread = False
+        # writing to this pipe wakes up wait_for_exit
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._wakeup_lock = threading.Lock()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        if hasattr(os, 'pidfd_open'):
+            try:
+                self._pidfd = os.pidfd_open(self.pid)
+            except OSError:
+                pass
+        if self._pidfd is None:
+            # fallback for systems without pidfd: block in waitpid in separate thread
+            threading.Thread(target=self._wait_in_thread, daemon=True).start()
+        self.sample()
+
+    @property
+    def start_time(self) -> float:
+        """Value of time.perf_counter() when process was started"""
+        return self._start
+
+    def _wait_in_thread(self):
+        super().wait()
+        self._reaped_in_thread = True
+        self.interrupt_wait()
+
+    def interrupt_wait(self):
+        """Wake up wait_for_exit before process exits or timeout elapses. Can be called from any thread"""
+        with self._wakeup_lock:
+            if self._wakeup_write is None:
+                return
+            try:
+                os.write(self._wakeup_write, b'\0')
+            except OSError:
+                pass
+
+    def wakeup_fds(self) -> List[int]:
+        """File descriptors that become readable when wait_for_exit would wake up (process exited or
+        interrupt_wait() was called), so that process can be watched by event loop. Call wait_for_exit(timeout=0)
+        when any of them is readable
+        """
+        fds = [self._wakeup_read]
+        if self._pidfd is not None:
+            fds.append(self._pidfd)
+        return fds
+
+    def wait_for_exit(self, timeout: Optional[float] = None) -> bool:
+        """Block until process exits, timeout (in seconds) elapses or interrupt_wait() is called.
+        Return True if process exited
+        """
+        if self._end is not None:
+            return True
+        poller = select.poll()
+        poller.register(self._wakeup_read, select.POLLIN)
+        if self._pidfd is not None:
+            poller.register(self._pidfd, select.POLLIN)
+        ready = {fd for fd, _ in poller.poll(None if timeout is None else timeout * 1000)}
+        if self._wakeup_read in ready:
+            try:
+                os.read(self._wakeup_read, 4096)
+            except BlockingIOError:
+                pass
+        exited = self._pidfd in ready if self._pidfd is not None else self._reaped_in_thread
+        if exited:
+            self._end = time.perf_counter()
+            self.wait()
+        return exited
+
+    def signal_tree(self, sig: int):
+        """Send signal to whole process group of process (only to process itself if it was not started in new
+        session), SIGKILL also to all processes in its cgroup. Process group outlives its leader, so this reaches
+        descendants even after process exited
+        """
+        if self._own_group:
+            try:
+                os.killpg(self.pid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+        elif self.returncode is None:
+            self.send_signal(sig)
+        if sig == signal.SIGKILL and self.cgroup is not None:
+            self.cgroup.kill()
+
+    def _group_exists(self) -> bool:
+        try:
+            os.killpg(self.pid, 0)
+            return True
+        except (ProcessLookupError, PermissionError):
+            return False
 
-    def poll(self):
-        if super().poll() is not None:
-            return super().poll()
+    def _group_members(self) -> Set[int]:
+        """Pids of processes in process group of process. Its descendants (current ones if it still runs and the
+        ones seen by sample()) are checked, all processes only if group exists but none of them is in it
+        """
+        candidates = set(self._descendants)
+        try:
+            candidates.add(self.proc)
+            candidates.update(self.proc.children(recursive=True))
+        except psutil.NoSuchProcess:
+            pass
+        pids = set()
+        for candidate in candidates:
+            try:
+                if candidate.is_running() and os.getpgid(candidate.pid) == self.pid:
+                    pids.add(candidate.pid)
+            except OSError:
+                continue
+        if not pids and self._group_exists():
+            # descendant started and orphaned between samples
+            for pid in psutil.pids():
+                try:
+                    if os.getpgid(pid) == self.pid:
+                        pids.add(pid)
+                except OSError:
+                    continue
+        return pids
 
-        # can not do it in __exit__, because process no longer not exists there
-        self.exec_stats.update(self.proc)
+    def survivors(self) -> List[int]:
+        """Pids of processes of cgroup (or group) of process that are still running (zombies are not counted).
+        Cgroup holds all descendants, so without cgroup only process group is looked at
+        """
+        if self.cgroup is not None:
+            pids = set(self.cgroup.pids())
+        elif self._own_group:
+            pids = self._group_members()
+        else:
+            pids = set()
+        alive = []
+        for pid in pids:
+            try:
+                if psutil.Process(pid).status() != psutil.STATUS_ZOMBIE:
+                    alive.append(pid)
+            except psutil.NoSuchProcess:
+                continue
+        return alive
 
-        return None
+    def kill_survivors(self, timeout: float = 1) -> int:
+        """Kill descendants of exited process that are still running (e.g. orphaned children of shell), so they do
+        not distort later measurements. Wait at most timeout seconds until they are gone.
+        Return how many of them there were
+        """
+        survivors = self.survivors()
+        if not survivors:
+            return 0
+        logger.debug(f'Killing {len(survivors)} process(es) left behind by "{self.args}": {survivors}')
+        self.signal_tree(signal.SIGKILL)
+        deadline = time.perf_counter() + timeout
+        while (alive := self.survivors()) and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        if alive:
+            logger.warning(f'Processes {alive} left behind by "{self.args}" are still running after SIGKILL')
+        return len(survivors)
+
+    def _wait4(self, pid, wait_flags):
+        pid, status, rusage = os.wait4(pid, wait_flags)
+        if pid == self.pid:
+            self.rusage = rusage
+        return pid, status
+
+    def _try_wait(self, wait_flags):
+        """Reap process with wait4 instead of waitpid to get its rusage"""
+        try:
+            return self._wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+
+    def _internal_poll(self, *args, **kwargs):
+        return super()._internal_poll(*args, _waitpid=self._wait4, **kwargs)
+
+    def sample(self):
+        """Update resource statistics, if process is still running"""
+        if self.poll() is not None:
+            return
+        try:
+            # can not do it in __exit__, because process no longer not exists there
+            children = self.proc.children(recursive=True)
+            self._descendants = set(children)
+            sample = self.exec_stats.update(self.proc, elapsed=time.perf_counter() - self._start,
+                                            children=children)
+            if self.timeseries is not None:
+                self.timeseries.append(sample)
+        except psutil.NoSuchProcess:
+            pass
 
     def stop(self):
         """If not used with contex manager, stop counting execution time"""
@@ -39,5 +239,31 @@ class MonitoredProcess(subprocess.Popen):
         return self.exec_stats
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.exec_stats.execution_time = time.perf_counter() - self._start
+        end = self._end if self._end is not None else time.perf_counter()
+        if exc_type is not None and self.poll() is None:
+            # harness failed (or was interrupted), process must not outlive it
+            self.signal_tree(signal.SIGKILL)
+            self.wait()
+        if self._pidfd is not None:
+            os.close(self._pidfd)
+            self._pidfd = None
+        with self._wakeup_lock:
+            if self._wakeup_read is not None:
+                os.close(self._wakeup_read)
+                os.close(self._wakeup_write)
+                self._wakeup_read = self._wakeup_write = None
+        self.exec_stats.execution_time = end - self._start
         self.exec_stats.returncode = self.returncode
+        if self.rusage is not None:
+            self.exec_stats.update_from_rusage(self.rusage, fork_rss=self._fork_rss)
+        if self.cgroup is not None:
+            self.exec_stats.update_from_cgroup(self.cgroup)
+
+
+def _join_cgroup(cgroup: Cgroup, preexec_fn=None):
+    def preexec():
+        cgroup.join()
+        if preexec_fn is not None:
+            preexec_fn()
+
+    return preexec
@@ -0,0 +1,115 @@
+"""Flat (tabular) schema of statistics, derived once from statistics dataclasses.
+Every column knows path of attributes leading to its value, so rows are built directly from objects
+in one pass, without converting them to nested dicts first
+"""
+import dataclasses
+import typing
+from dataclasses import dataclass, is_dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import List, Tuple, Any, Union, Iterable, Dict, Optional
+
+from provers_benchmark.statistics.stats import TestRunStatistics
+
+FORMULA_STATISTICS = 'input_formula_statistics'
+NOT_IN_TABLES = {'output.stdout', 'output.stderr'}
+"""Columns that are too big to be stored in tables"""
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    """Dotted path, e.g. execution_statistics.peak_memory"""
+    path: Tuple[str, ...]
+    type: Any
+    """Python type of values (int, float, str, bool, dict, list or Enum subclass), None is always allowed"""
+
+    @property
+    def is_numeric(self) -> bool:
+        return self.type in (int, float)
+
+    def get(self, obj) -> Any:
+        for attribute in self.path:
+            if obj is None:
+                return None
+            obj = getattr(obj, attribute)
+        if isinstance(obj, Enum):
+            return obj.value
+        return obj
+
+
+def _unwrap_optional(field_type):
+    if getattr(field_type, '__origin__', None) is Union:
+        args = [arg for arg in field_type.__args__ if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return field_type
+
+
+def _columns(cls: type, path: Tuple[str, ...] = ()) -> List[Column]:
+    columns = []
+    hints = typing.get_type_hints(cls)
+    for field in dataclasses.fields(cls):
+        field_type = _unwrap_optional(hints[field.name])
+        field_path = path + (field.name,)
+        if is_dataclass(field_type):
+            columns.extend(_columns(field_type, field_path))
+        else:
+            origin = getattr(field_type, '__origin__', None)
+            if origin in (dict, typing.Dict):
+                field_type = dict
+            elif origin in (list, typing.List):
+                field_type = list
+            columns.append(Column(name='.'.join(field_path), path=field_path, type=field_type))
+    return columns
+
+
+@lru_cache(maxsize=None)
+def dataclass_columns(cls: type) -> Tuple[Column, ...]:
+    """Columns of all (nested) fields of dataclass"""
+    return tuple(_columns(cls))
+
+
+@lru_cache(maxsize=None)
+def test_run_columns() -> Tuple[Column, ...]:
+    """Columns of test runs, without outputs and lists (e.g. samples of repeated runs)"""
+    return tuple(column for column in dataclass_columns(TestRunStatistics)
+                 if column.name not in NOT_IN_TABLES and column.type is not list)
+
+
+def formula_statistics_keys(test_runs: Iterable[TestRunStatistics]) -> List[str]:
+    """Union of keys of input_formula_statistics (they are different for different input formats)"""
+    keys = {}
+    for test_run in test_runs:
+        keys.update(dict.fromkeys(test_run.input_formula_statistics or {}))
+    return list(keys)
+
+
+def flat_columns(formula_keys: List[str]) -> List[str]:
+    """Names of columns of flat test run table, with input_formula_statistics split to one column per key"""
+    names = [column.name for column in test_run_columns() if column.name != FORMULA_STATISTICS]
+    names.extend(f'{FORMULA_STATISTICS}.{key}' for key in formula_keys)
+    return names
+
+
+def flat_row(test_run: TestRunStatistics) -> Dict[str, Any]:
+    """Test run as flat dict, input_formula_statistics are split to one column per key"""
+    row = {}
+    for column in test_run_columns():
+        value = column.get(test_run)
+        if column.name == FORMULA_STATISTICS:
+            for key, item in (value or {}).items():
+                row[f'{FORMULA_STATISTICS}.{key}'] = item
+        else:
+            row[column.name] = value
+    return row
+
+
+def column_type(name: str) -> Optional[Any]:
+    """Python type of values in column, None if it is not known (input_formula_statistics)"""
+    return _column_types().get(name)
+
+
+@lru_cache(maxsize=None)
+def _column_types() -> Dict[str, Any]:
+    return {column.name: column.type for column in dataclass_columns(TestRunStatistics)}
@@ -1,36 +1,108 @@
 import datetime
 import platform
+import resource
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import List, Dict, Optional, Any
 
 import psutil
 from dataclasses_json import DataClassJsonMixin, dataclass_json
 
+from provers_benchmark.statistics.cgroup import Cgroup
+from provers_benchmark.statistics.timeseries import Sample
+
 
 @dataclass
 class ExecutionStatistics(DataClassJsonMixin):
-    # todo which cpu times do we need?
-    cpu_time = None
+    """Resources used by whole process tree. Values are sampled while process runs
+    and replaced with values accounted by kernel (cgroup or rusage) after it exits"""
+    cpu_time: Optional[float] = None
+    """User + system cpu time in seconds"""
+    user_time: Optional[float] = None
+    system_time: Optional[float] = None
     execution_time: float = 0
     peak_memory: int = None
     disk_reads: int = None
     disk_writes: int = None
     returncode: Optional[int] = None
+    accounting: str = 'sampled'
+    """Source of final values: sampled, rusage or cgroup (portfolio for race, values are sums over its members)"""
+    timeseries_path: Optional[str] = None
+    """File with resource usage over time (see provers_benchmark.statistics.timeseries), if it was recorded"""
+
+    def update(self, proc: psutil.Process, elapsed: float = 0,
+               children: Optional[List[psutil.Process]] = None) -> Sample:
+        """Sample running process and all its descendants (children, if they were already listed),
+        elapsed is time since its start
+        """
+        processes = [proc]
+        if children is not None:
+            processes.extend(children)
+        else:
+            try:
+                processes.extend(proc.children(recursive=True))
+            except psutil.NoSuchProcess:
+                pass
+
+        rss = user_time = system_time = reads = writes = threads = 0
+        io_available = True
+        for p in processes:
+            try:
+                with p.oneshot():
+                    rss += p.memory_info().rss
+                    threads += p.num_threads()
+                    cpu_times = p.cpu_times()
+                    user_time += cpu_times.user + cpu_times.children_user
+                    system_time += cpu_times.system + cpu_times.children_system
+                    if io_available:
+                        try:
+                            io_counters = p.io_counters()
+                            reads += io_counters.read_bytes
+                            writes += io_counters.write_bytes
+                        except (psutil.AccessDenied, AttributeError):
+                            io_available = False
+            except psutil.NoSuchProcess:
+                continue
 
-    def update(self, proc: psutil.Process):
-        try:
-            io_counters = proc.io_counters()
-            self.disk_reads = io_counters.read_bytes + io_counters.read_chars
-            self.disk_writes = io_counters.write_bytes + io_counters.read_chars
-        except psutil.AccessDenied:
-            pass
+        if rss and (self.peak_memory is None or self.peak_memory < rss):
+            self.peak_memory = rss
+        self.user_time, self.system_time, self.cpu_time = user_time, system_time, user_time + system_time
+        if io_available:
+            self.disk_reads, self.disk_writes = reads, writes
+        return Sample(time=elapsed, rss=rss, cpu_time=user_time + system_time, threads=threads,
+                      read_bytes=reads, write_bytes=writes)
 
-        mem_info = proc.memory_info()
-        if self.peak_memory is None or self.peak_memory < mem_info.rss:
-            self.peak_memory = mem_info.rss
+    def update_from_rusage(self, rusage: resource.struct_rusage, fork_rss: int = 0):
+        """Use resources accounted by kernel for exited process and all its waited for descendants.
+        ru_maxrss is the peak of the largest process in tree, not of whole tree. It also includes image of forking
+        process (fork_rss) from before exec, so it is used only if it is larger than that.
+        Descendants of killed process were not waited for, their sampled cpu time is kept if it is larger
+        """
+        if self.cpu_time is None or rusage.ru_utime + rusage.ru_stime >= self.cpu_time:
+            self.user_time, self.system_time = rusage.ru_utime, rusage.ru_stime
+            self.cpu_time = rusage.ru_utime + rusage.ru_stime
+        # ru_maxrss is in kilobytes on linux
+        maxrss = rusage.ru_maxrss * 1024
+        if maxrss > fork_rss and (self.peak_memory is None or self.peak_memory < maxrss):
+            self.peak_memory = maxrss
+        # block counts are in 512 byte units
+        self.disk_reads, self.disk_writes = rusage.ru_inblock * 512, rusage.ru_oublock * 512
+        self.accounting = 'rusage'
 
-        self.cpu_time = proc.cpu_times()
+    def update_from_cgroup(self, cgroup: Cgroup):
+        """Use resources accounted by kernel for all processes that were ever in cgroup"""
+        cpu_stat = cgroup.cpu_stat()
+        if 'usage_usec' not in cpu_stat:
+            return
+        self.user_time = cpu_stat.get('user_usec', 0) / 1e6
+        self.system_time = cpu_stat.get('system_usec', 0) / 1e6
+        self.cpu_time = cpu_stat['usage_usec'] / 1e6
+        if (memory_peak := cgroup.memory_peak()) is not None:
+            self.peak_memory = memory_peak
+        if (io_stat := cgroup.io_stat()) is not None:
+            self.disk_reads, self.disk_writes = io_stat['rbytes'], io_stat['wbytes']
+        self.accounting = 'cgroup'
 
 
 @dataclass_json
@@ -41,22 +113,40 @@ class SATType(Enum):
     THF = "Typed Higher-order Formula"
 
 
+@lru_cache(maxsize=None)
+def probe_hardware() -> Dict[str, Any]:
+    """Hardware of this machine, probed on first use (not on import) and only once per process"""
+    frequency = psutil.cpu_freq()
+    uname = platform.uname()
+    return dict(cpu_name=platform.processor(),
+                min_frequency=frequency.min if frequency is not None else None,
+                max_frequency=frequency.max if frequency is not None else None,
+                logical_threads=psutil.cpu_count(logical=True), physical_threads=psutil.cpu_count(logical=False),
+                system=uname.system, release=uname.release, version=uname.version,
+                total_memory=psutil.virtual_memory().total)
+
+
+def _probed(name: str):
+    """Field whose default is value probed by probe_hardware"""
+    return field(default_factory=lambda: probe_hardware()[name])
+
+
 @dataclass
 class CPUStatistics(DataClassJsonMixin):
-    name: str = platform.processor()
-    min_frequency: float = psutil.cpu_freq().min
-    max_frequency: float = psutil.cpu_freq().max
-    logical_threads: int = psutil.cpu_count(logical=True)
-    physical_threads: int = psutil.cpu_count(logical=False)
+    name: str = _probed('cpu_name')
+    min_frequency: Optional[float] = _probed('min_frequency')
+    max_frequency: Optional[float] = _probed('max_frequency')
+    logical_threads: int = _probed('logical_threads')
+    physical_threads: int = _probed('physical_threads')
 
 
 @dataclass
 class HardwareStatistics(DataClassJsonMixin):
-    system: str = platform.system()
-    release: str = platform.release()
-    version: str = platform.version()
-    cpu: CPUStatistics = CPUStatistics()
-    total_memory: int = psutil.virtual_memory().total
+    system: str = _probed('system')
+    release: str = _probed('release')
+    version: str = _probed('version')
+    cpu: CPUStatistics = field(default_factory=CPUStatistics)
+    total_memory: int = _probed('total_memory')
 
 
 @dataclass
@@ -82,6 +172,72 @@ class OutputStatistics(DataClassJsonMixin):
     status: SATStatus = SATStatus.UNKOWN
     stderr: str = ''
     stdout: str = ''
+    stdout_bytes: int = 0
+    """Size of whole stdout, only head and tail of it are in stdout"""
+    stderr_bytes: int = 0
+    stdout_truncated: bool = False
+    stderr_truncated: bool = False
+    stdout_path: Optional[str] = None
+    """File with whole stdout, if it was spilled"""
+    stderr_path: Optional[str] = None
+    time_to_verdict: Optional[float] = None
+    """Seconds from start until verdict was printed, None if it was not printed (or parser can not stream)"""
+    terminated_after_verdict: bool = False
+    """Process was killed because it was still running TestSuite.terminate_after_verdict seconds after verdict"""
+    limit: Optional[str] = None
+    """Limit that ended the test: wall_time, cpu_time, memory or terminate_after_verdict, None if no limit did"""
+    killed_with: Optional[str] = None
+    """Signal that stopped process killed by harness: SIGTERM, or SIGKILL if it was still running
+    kill_grace_period seconds after SIGTERM
+    """
+    survivors: int = 0
+    """Descendants that were still running after process exited, they were killed"""
+    harness_error: Optional[str] = None
+    """Exception raised by the benchmark itself while running the test (status is then error),
+    such test is run again on resume
+    """
+
+
+@dataclass
+class RepetitionStatistics(DataClassJsonMixin):
+    """Execution time of repeated runs of the same test"""
+    warmup_runs: int = 0
+    samples: List[float] = field(default_factory=list)
+    """Execution time of every measured run"""
+    cpu_times: List[Optional[float]] = field(default_factory=list)
+    statuses: List[str] = field(default_factory=list)
+    count: int = 0
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    stdev: Optional[float] = None
+    ci_low: Optional[float] = None
+    """95% confidence interval of mean execution time (Student's t), None for single run"""
+    ci_high: Optional[float] = None
+    stopped_by: str = ''
+    """Why repeating stopped: count, ci (interval was narrow enough), budget or limit (run ended with timeout
+    or out of memory)
+    """
+
+
+@dataclass
+class PortfolioMemberStatistics(DataClassJsonMixin):
+    """Run of one test suite of portfolio, partial if it was killed because other member answered first"""
+    name: str
+    status: SATStatus = SATStatus.UNKOWN
+    execution_statistics: Optional[ExecutionStatistics] = None
+    time_to_verdict: Optional[float] = None
+    lost_race: bool = False
+    """Member was killed because other member found verdict first"""
+
+
+@dataclass
+class PortfolioStatistics(DataClassJsonMixin):
+    """Race of test suites of portfolio on the same input"""
+    winner: Optional[str] = None
+    """Member that found SAT/UNSAT verdict first, None if no member found it"""
+    time_to_first_answer: Optional[float] = None
+    """Seconds from start of race until the first SAT/UNSAT verdict"""
+    members: List[PortfolioMemberStatistics] = field(default_factory=list)
 
 
 @dataclass
@@ -94,10 +250,19 @@ class TestRunStatistics(DataClassJsonMixin):
     minimal_input_statistics: MinimalSATStatistics = None
     input_formula_statistics: Dict = field(default_factory=dict)
     output: OutputStatistics = None
+    repetitions: Optional[RepetitionStatistics] = None
+    """Only when test was repeated, execution_statistics and output are then from the last measured run"""
+    worker: Optional[str] = None
+    """Worker (host-pid) that ran the test, in distributed mode"""
+    hardware: Optional[HardwareStatistics] = None
+    """Hardware of worker that ran the test, in distributed mode"""
+    portfolio: Optional[PortfolioStatistics] = None
+    """Only for portfolios, execution_statistics and output are then those of the whole race"""
 
 
 @dataclass
 class Statistics(DataClassJsonMixin):
     test_runs: List[TestRunStatistics] = field(default_factory=list)
-    date: datetime.datetime = datetime.datetime.now()
-    hardware: HardwareStatistics = HardwareStatistics()
+    date: datetime.datetime = field(default_factory=datetime.datetime.now)
+    """When benchmark started"""
+    hardware: HardwareStatistics = field(default_factory=HardwareStatistics)
@@ -0,0 +1,98 @@
+"""Resource usage of running process over time, kept in compact arrays of fixed maximal size"""
+import logging
+from array import array
+from typing import NamedTuple, Optional, Dict
+
+from provers_benchmark.utils import import_numpy
+
+logger = logging.getLogger('ProverBenchmark')
+
+
+class Sample(NamedTuple):
+    time: float
+    """Seconds since process start"""
+    rss: int
+    cpu_time: float
+    """Cumulative user + system time of process tree"""
+    threads: int
+    read_bytes: int
+    write_bytes: int
+
+
+def _merge(older: Sample, newer: Sample) -> Sample:
+    """One sample in place of two: cumulative values are taken from the newer one, peaks are kept"""
+    return newer._replace(rss=max(older.rss, newer.rss), threads=max(older.threads, newer.threads))
+
+
+class TimeSeries:
+    """Samples stored column-wise in typed arrays. When max_points is reached, neighbouring samples are merged
+    and from then on every two samples are merged before they are stored (and so on), so long runs are
+    downsampled uniformly while peaks of memory and threads are never lost
+    """
+    COLUMNS = {'time': 'd', 'rss': 'q', 'cpu_time': 'd', 'threads': 'q', 'read_bytes': 'q', 'write_bytes': 'q'}
+
+    def __init__(self, max_points: int = 4096):
+        self.max_points = max(max_points, 2)
+        self.stride = 1
+        """Number of raw samples in each stored sample"""
+        self._columns = {name: array(typecode) for name, typecode in self.COLUMNS.items()}
+        self._pending: Optional[Sample] = None
+        self._pending_count = 0
+
+    def __len__(self):
+        return len(self._columns['time']) + (self._pending is not None)
+
+    def append(self, sample: Sample):
+        self._pending = sample if self._pending is None else _merge(self._pending, sample)
+        self._pending_count += 1
+        if self._pending_count < self.stride:
+            return
+        self._store(self._pending)
+        self._pending, self._pending_count = None, 0
+        if len(self._columns['time']) >= self.max_points:
+            self._halve()
+
+    def _store(self, sample: Sample):
+        for name, value in zip(Sample._fields, sample):
+            self._columns[name].append(value)
+
+    def _halve(self):
+        samples = list(zip(*self._columns.values()))
+        for column in self._columns.values():
+            del column[:]
+        for i in range(0, len(samples) - 1, 2):
+            self._store(_merge(Sample(*samples[i]), Sample(*samples[i + 1])))
+        if len(samples) % 2:
+            self._store(Sample(*samples[-1]))
+        self.stride *= 2
+
+    def flush(self):
+        """Store incomplete last group of samples"""
+        if self._pending is not None:
+            self._store(self._pending)
+            self._pending, self._pending_count = None, 0
+
+    def save(self, path: str) -> Optional[str]:
+        """Save columns to compressed npz file, return its path (None if numpy is not available)"""
+        numpy = import_numpy()
+        if numpy is None:
+            logger.error('numpy is not installed, time series can not be saved')
+            return None
+        self.flush()
+        out_file = path + '.npz'
+        numpy.savez_compressed(out_file, stride=numpy.int64(self.stride),
+                               **{name: numpy.frombuffer(column, dtype=column.typecode)
+                                  for name, column in self._columns.items() if len(column)})
+        return out_file
+
+
+def load_timeseries(path: str) -> Dict[str, 'numpy.ndarray']:
+    """Load time series saved by TimeSeries.save, with cpu_percent (utilization between samples, 100 per core)"""
+    numpy = import_numpy()
+    with numpy.load(path) as npz:
+        columns = {name: npz[name] for name in npz.files}
+    if 'time' in columns:
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            cpu_percent = numpy.diff(columns['cpu_time'], prepend=0) / numpy.diff(columns['time'], prepend=0) * 100
+        columns['cpu_percent'] = numpy.nan_to_num(cpu_percent, nan=0, posinf=0)
+    return columns
@@ -0,0 +1,7 @@
+"""Indexed SQLite database with results of all benchmark runs. Run as python -m provers_benchmark.store"""
+from .database import ResultsDatabase, QUERY_COLUMNS
+
+__all__ = [
+    'ResultsDatabase',
+    'QUERY_COLUMNS',
+]
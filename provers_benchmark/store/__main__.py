@@ -0,0 +1,83 @@
+import argparse
+import csv
+import datetime
+import json
+import logging
+import re
+import sys
+
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.store.database import ResultsDatabase, QUERY_COLUMNS
+
+
+def parse_date(value: str) -> datetime.datetime:
+    """ISO date (2020-01-31 or 2020-01-31T12:00) or relative to now: 30d, 12h"""
+    if match := re.fullmatch(r'(\d+)([dh])', value):
+        amount, unit = int(match.group(1)), match.group(2)
+        return datetime.datetime.now() - datetime.timedelta(**{'days' if unit == 'd' else 'hours': amount})
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid date "{value}", use ISO date or e.g. 30d, 12h')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m provers_benchmark.store",
+                                     description="Database with results of all benchmark runs")
+    parser.add_argument("database", help="SQLite database file, created if it does not exist")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_command = commands.add_parser("import", help="import json results files or jsonl results streams")
+    import_command.add_argument("files", nargs='+')
+
+    query = commands.add_parser("query", help="list test runs")
+    query.add_argument("--suite", help="test suite name (glob pattern)")
+    query.add_argument("--version", help="test suite version")
+    query.add_argument("--input", help="test input name (glob pattern)")
+    query.add_argument("--path", help="input file path (glob pattern)")
+    query.add_argument("--digest", help="sha256 of input file")
+    query.add_argument("--status", help="e.g. satisfiable, timeout")
+    query.add_argument("--since", type=parse_date, help="runs since date (ISO date or e.g. 30d)")
+    query.add_argument("--until", type=parse_date, help="runs before date")
+    query.add_argument("--limit", type=int)
+    query.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    return parser.parse_args()
+
+
+def print_rows(rows, output_format: str):
+    if output_format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(QUERY_COLUMNS)
+        writer.writerows(rows)
+    elif output_format == 'json':
+        json.dump([dict(zip(QUERY_COLUMNS, row)) for row in rows], sys.stdout, indent=1)
+        print()
+    else:
+        cells = [QUERY_COLUMNS] + [['' if cell is None else f'{cell:.3f}' if isinstance(cell, float) else str(cell)
+                                    for cell in row] for row in rows]
+        widths = [max(len(row[i]) for row in cells) for i in range(len(QUERY_COLUMNS))]
+        for row in cells:
+            print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    database = ResultsDatabase(args.database)
+    try:
+        if args.command == 'import':
+            for file in args.files:
+                database.import_file(file)
+        else:
+            print_rows(database.query(suite=args.suite, version=args.version, input_name=args.input, path=args.path,
+                                      digest=args.digest, status=args.status, since=args.since, until=args.until,
+                                      limit=args.limit), args.format)
+    except BenchmarkException as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Results of all benchmark runs in one normalized SQLite database, for queries across runs"""
+import datetime
+import json
+import logging
+import os
+import sqlite3
+from typing import Iterable, Tuple, Optional, List, Dict, Any
+
+from provers_benchmark.errors import BenchmarkException
+from provers_benchmark.results import read_stream
+from provers_benchmark.statistics.stats import Statistics, TestRunStatistics, HardwareStatistics
+
+logger = logging.getLogger('ProverBenchmark')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS hardware (
+    id INTEGER PRIMARY KEY,
+    system TEXT,
+    release TEXT,
+    version TEXT,
+    cpu_name TEXT,
+    min_frequency REAL,
+    max_frequency REAL,
+    logical_threads INTEGER,
+    physical_threads INTEGER,
+    total_memory INTEGER,
+    UNIQUE (system, release, version, cpu_name, min_frequency, max_frequency, logical_threads, physical_threads,
+            total_memory)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    hardware_id INTEGER REFERENCES hardware (id),
+    source TEXT,
+    UNIQUE (date, hardware_id)
+);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (date);
+CREATE TABLE IF NOT EXISTS suites (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    program_name TEXT,
+    program_version TEXT,
+    command TEXT,
+    UNIQUE (name, program_name, program_version, command)
+);
+CREATE INDEX IF NOT EXISTS suites_name ON suites (name, program_version);
+CREATE INDEX IF NOT EXISTS suites_version ON suites (program_name, program_version);
+CREATE TABLE IF NOT EXISTS inputs (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    path TEXT,
+    format TEXT,
+    digest TEXT,
+    UNIQUE (name, path, format, digest)
+);
+CREATE INDEX IF NOT EXISTS inputs_digest ON inputs (digest);
+CREATE TABLE IF NOT EXISTS features (
+    input_id INTEGER NOT NULL REFERENCES inputs (id),
+    name TEXT NOT NULL,
+    value,
+    PRIMARY KEY (input_id, name)
+);
+CREATE TABLE IF NOT EXISTS test_runs (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    suite_id INTEGER NOT NULL REFERENCES suites (id),
+    input_id INTEGER NOT NULL REFERENCES inputs (id),
+    hardware_id INTEGER REFERENCES hardware (id),
+    job_key TEXT,
+    status TEXT,
+    execution_time REAL,
+    median_time REAL,
+    cpu_time REAL,
+    peak_memory INTEGER,
+    disk_reads INTEGER,
+    disk_writes INTEGER,
+    returncode INTEGER,
+    time_to_verdict REAL,
+    translated_with TEXT,
+    worker TEXT,
+    test_run TEXT,
+    UNIQUE (run_id, suite_id, input_id)
+);
+CREATE INDEX IF NOT EXISTS test_runs_suite ON test_runs (suite_id);
+CREATE INDEX IF NOT EXISTS test_runs_input ON test_runs (input_id);
+CREATE INDEX IF NOT EXISTS test_runs_status ON test_runs (status);
+'''
+
+QUERY_COLUMNS = ['date', 'suite', 'version', 'input', 'path', 'status', 'execution_time', 'median_time', 'cpu_time',
+                 'peak_memory', 'worker']
+
+_QUERY = '''
+SELECT runs.date, suites.name AS suite, suites.program_version AS version, inputs.name AS input, inputs.path,
+       test_runs.status, test_runs.execution_time, test_runs.median_time, test_runs.cpu_time, test_runs.peak_memory,
+       test_runs.worker
+FROM test_runs
+JOIN runs ON runs.id = test_runs.run_id
+JOIN suites ON suites.id = test_runs.suite_id
+JOIN inputs ON inputs.id = test_runs.input_id
+'''
+
+
+def _date(date: datetime.datetime) -> str:
+    return date.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ResultsDatabase:
+    """Test runs with their suites, inputs (with formula features), hardware and benchmark run (date).
+    Run is identified by its date and hardware, so importing the same results again does not duplicate anything,
+    test run of suite on input in given run is replaced
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.executescript(_SCHEMA)
+        self._ids: Dict[Tuple, int] = {}
+
+    def _id(self, table: str, **values) -> int:
+        """Id of row with values, inserted if it does not exist yet"""
+        # NULLs are distinct in UNIQUE constraints, so they would be inserted again and again
+        values = {column: '' if value is None else value for column, value in values.items()}
+        cache_key = (table,) + tuple(values.items())
+        if cache_key not in self._ids:
+            columns = ', '.join(values)
+            self._connection.execute(f'INSERT OR IGNORE INTO {table} ({columns}) '
+                                     f'VALUES ({", ".join("?" * len(values))})', tuple(values.values()))
+            condition = ' AND '.join(f'{column} = ?' for column in values)
+            self._ids[cache_key] = self._connection.execute(f'SELECT id FROM {table} WHERE {condition}',
+                                                            tuple(values.values())).fetchone()[0]
+        return self._ids[cache_key]
+
+    def _hardware_id(self, hardware: HardwareStatistics) -> int:
+        return self._id('hardware', system=hardware.system, release=hardware.release, version=hardware.version,
+                        cpu_name=hardware.cpu.name, min_frequency=hardware.cpu.min_frequency,
+                        max_frequency=hardware.cpu.max_frequency, logical_threads=hardware.cpu.logical_threads,
+                        physical_threads=hardware.cpu.physical_threads, total_memory=hardware.total_memory)
+
+    def _input_id(self, test_run: TestRunStatistics, digest: Optional[str]) -> int:
+        """Id of input of test run, digest is the one job key was computed from when test run ran
+        (input file may have changed or moved since then), None if it is not known
+        """
+        minimal = test_run.minimal_input_statistics
+        input_id = self._id('inputs', name=minimal.name, path=minimal.path, format=minimal.format, digest=digest)
+        if test_run.input_formula_statistics:
+            self._connection.executemany('INSERT OR REPLACE INTO features (input_id, name, value) VALUES (?, ?, ?)',
+                                         ((input_id, name, value if isinstance(value, (int, float, str)) else
+                                           json.dumps(value))
+                                          for name, value in test_run.input_formula_statistics.items()))
+        return input_id
+
+    def add_run(self, stats: Statistics, test_runs: Iterable[Tuple[str, TestRunStatistics, Optional[str]]],
+                source: Optional[str] = None) -> int:
+        """Insert test runs (with their job keys and input digests) of benchmark run described by stats
+        in one transaction, return number of inserted test runs
+        """
+        try:
+            with self._connection:
+                return self._insert_run(stats, test_runs, source)
+        except BaseException:
+            # ids of rows inserted in rolled back transaction are no longer valid
+            self._ids.clear()
+            raise
+
+    def _insert_run(self, stats: Statistics, test_runs: Iterable[Tuple[str, TestRunStatistics, Optional[str]]],
+                    source: Optional[str]) -> int:
+        run_hardware_id = self._hardware_id(stats.hardware)
+        self._connection.execute('INSERT OR IGNORE INTO runs (date, hardware_id, source) VALUES (?, ?, ?)',
+                                 (_date(stats.date), run_hardware_id, source))
+        run_id = self._connection.execute('SELECT id FROM runs WHERE date = ? AND hardware_id = ?',
+                                          (_date(stats.date), run_hardware_id)).fetchone()[0]
+        rows = []
+        for key, test_run, digest in test_runs:
+            execution = test_run.execution_statistics
+            output = test_run.output
+            test_run_dict = test_run.to_dict(encode_json=True)
+            # outputs stay only in results files
+            test_run_dict['output'].pop('stdout', None)
+            test_run_dict['output'].pop('stderr', None)
+            rows.append((
+                run_id,
+                self._id('suites', name=test_run.name, program_name=test_run.program_name,
+                         program_version=test_run.program_version, command=test_run.command),
+                self._input_id(test_run, digest),
+                self._hardware_id(test_run.hardware) if test_run.hardware is not None else run_hardware_id,
+                key, output.status.value, execution.execution_time,
+                test_run.repetitions.median if test_run.repetitions is not None else None,
+                execution.cpu_time, execution.peak_memory, execution.disk_reads, execution.disk_writes,
+                execution.returncode, output.time_to_verdict, test_run.minimal_input_statistics.translated_with,
+                test_run.worker, json.dumps(test_run_dict)))
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO test_runs (run_id, suite_id, input_id, hardware_id, job_key, status, '
+            'execution_time, median_time, cpu_time, peak_memory, disk_reads, disk_writes, returncode, '
+            'time_to_verdict, translated_with, worker, test_run) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def import_file(self, path: str) -> int:
+        """Import json results file or jsonl results stream, return number of imported test runs"""
+        source = os.path.abspath(path)
+        if path.endswith('.jsonl'):
+            stats = None
+            latest = {}
+            for item in read_stream(path):
+                if isinstance(item, Statistics):
+                    # resumed runs append their own header, the first one describes the whole benchmark
+                    stats = stats or item
+                    continue
+                _, key, test_run, digest = item
+                latest[key or len(latest)] = (key, test_run, digest or None)
+            count = self.add_run(stats or Statistics(), latest.values(), source=source)
+        elif path.endswith('.json'):
+            with open(path) as file:
+                stats = Statistics.from_json(file.read())
+            # aggregate results have no digests of inputs
+            count = self.add_run(stats, (('', test_run, None) for test_run in stats.test_runs), source=source)
+        else:
+            raise BenchmarkException(f'Unsupported results file {path}, use .json or .jsonl')
+        logger.info(f'Imported {count} test runs from {path} to {self.path}')
+        return count
+
+    def query(self, suite: Optional[str] = None, version: Optional[str] = None, input_name: Optional[str] = None,
+              path: Optional[str] = None, digest: Optional[str] = None, status: Optional[str] = None,
+              since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None,
+              limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        """Test runs (QUERY_COLUMNS) matching all given filters, suite, input_name and path are glob patterns"""
+        conditions, parameters = [], []
+        for condition, value in (('suites.name GLOB ?', suite), ('suites.program_version = ?', version),
+                                 ('inputs.name GLOB ?', input_name), ('inputs.path GLOB ?', path),
+                                 ('inputs.digest = ?', digest), ('test_runs.status = ?', status),
+                                 ('runs.date >= ?', _date(since) if since else None),
+                                 ('runs.date < ?', _date(until) if until else None)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        sql = _QUERY
+        if conditions:
+            sql += 'WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY runs.date, suites.name, inputs.path'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        self._connection.close()
@@ -1,8 +1,18 @@
 from __future__ import annotations
+import hashlib
 import os
 from typing import Optional, List
 
 
+def import_numpy():
+    """numpy, imported on first use (importing it takes tens of milliseconds), None if it is not installed"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
 def is_path_executable(fpath: str):
     return os.path.isfile(fpath) and os.access(fpath, os.X_OK)
 
@@ -44,3 +54,12 @@ def find_translator(from_format: str, to_format: str, available_translators: Lis
     for translator in available_translators:
         if translator.from_format == from_format and translator.to_format == to_format:
             return translator
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 of file content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
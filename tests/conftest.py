@@ -0,0 +1,5 @@
+from provers_benchmark.config import TestInput, TestSuite
+
+# config classes, not test classes
+TestInput.__test__ = False
+TestSuite.__test__ = False
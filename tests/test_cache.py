@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+import pytest
+
+from provers_benchmark.benchmark import translate
+from provers_benchmark.cache import TranslationCache
+from provers_benchmark.config import Translator, InputMode, OutputMode
+from provers_benchmark.errors import TranslationError
+
+
+def store_file(cache: TranslationCache, key: str, size: int, last_used: float):
+    """Store translation of given size as if it was last used at last_used"""
+    os.makedirs(os.path.dirname(cache.output_path(key)), exist_ok=True)
+    with open(cache.output_path(key), 'w') as output:
+        output.write('x' * size)
+    entry = cache.store(key, input_path=f'{key}.p')
+    entry.created = entry.last_used = last_used
+
+
+def translator(command: str) -> Translator:
+    return Translator(from_format='tptp', to_format='ladr', command=command, input_mode=InputMode.STDIN,
+                      output_mode=OutputMode.STDOUT)
+
+
+def test_store_and_lookup(tmp_path):
+    cache = TranslationCache(str(tmp_path))
+    assert cache.lookup('aa1') is None
+    store_file(cache, 'aa1', size=3, last_used=time.time())
+    cache.store('bb1', input_path='bb1.p', error='syntax error')
+    assert cache.lookup('aa1').size == 3
+    assert cache.lookup('bb1').error == 'syntax error'
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.failures) == (1, 1, 1)
+
+    # translated file removed behind the cache's back is a miss
+    os.remove(cache.output_path('aa1'))
+    assert cache.peek('aa1') is None
+    assert cache.lookup('aa1') is None
+    cache.close()
+
+    reopened = TranslationCache(str(tmp_path))
+    assert reopened.peek('aa1') is None
+    assert reopened.peek('bb1').failed
+
+
+def test_failure_expires_after_ttl(tmp_path):
+    cache = TranslationCache(str(tmp_path), failure_ttl=60)
+    cache.store('aa1', input_path='aa1.p', error='syntax error').created -= 30
+    assert cache.lookup('aa1').failed
+    cache.store('aa2', input_path='aa2.p', error='syntax error').created -= 90
+    assert cache.peek('aa2') is None
+    assert cache.lookup('aa2') is None
+
+    forever = TranslationCache(str(tmp_path / 'forever'))
+    forever.store('aa2', input_path='aa2.p', error='syntax error').created -= 10 ** 6
+    assert forever.lookup('aa2').failed
+
+
+def test_evict_by_age_then_least_recently_used(tmp_path):
+    now = time.time()
+    cache = TranslationCache(str(tmp_path), max_size=25, max_age=100)
+    store_file(cache, 'aa1', size=10, last_used=now - 200)  # too old, although small enough to fit
+    store_file(cache, 'aa2', size=10, last_used=now - 50)
+    store_file(cache, 'aa3', size=10, last_used=now - 10)
+    store_file(cache, 'aa4', size=10, last_used=now - 30)
+    cache.evict()
+    # aa1 by age, then aa2 as least recently used: 20 bytes left
+    assert sorted(cache._entries) == ['aa3', 'aa4']
+    assert not os.path.exists(cache.output_path('aa1'))
+    assert not os.path.exists(cache.output_path('aa2'))
+    assert cache.stats.evicted == 2
+
+    cache.lookup('aa4')
+    cache.max_size = 10
+    cache.evict()
+    assert sorted(cache._entries) == ['aa4']
+
+
+def test_key_locks_are_dropped(tmp_path):
+    cache = TranslationCache(str(tmp_path))
+    inside = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with cache.key_lock('aa1'):
+            inside.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    inside.wait()
+    waiter = threading.Thread(target=hold)
+    waiter.start()
+    while cache._key_locks['aa1'][1] < 2:
+        time.sleep(0.01)
+    with cache.key_lock('bb1'):
+        assert set(cache._key_locks) == {'aa1', 'bb1'}
+    assert set(cache._key_locks) == {'aa1'}
+    release.set()
+    holder.join()
+    waiter.join()
+    assert cache._key_locks == {}
+
+
+def test_failed_translation_is_cached(tmp_path):
+    input_file = tmp_path / 'a.p'
+    input_file.write_text('fof(a, axiom, p).\n')
+    cache = TranslationCache(str(tmp_path / 'cache'))
+    with pytest.raises(TranslationError):
+        translate(translator('false'), str(input_file), cache)
+    assert cache.peek(cache.key(translator('false'), str(input_file))).failed
+    assert cache._key_locks == {}
+
+
+def test_translation_killed_by_signal_is_not_cached(tmp_path):
+    input_file = tmp_path / 'a.p'
+    input_file.write_text('fof(a, axiom, p).\n')
+    cache = TranslationCache(str(tmp_path / 'cache'))
+    killed = translator('kill -9 $$')
+    with pytest.raises(TranslationError, match='killed by signal 9'):
+        translate(killed, str(input_file), cache)
+    assert cache.peek(cache.key(killed, str(input_file))) is None
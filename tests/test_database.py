@@ -0,0 +1,38 @@
+from provers_benchmark.config import TestInput, TestSuite, InputMode
+from provers_benchmark.results import ResultStream, read_stream
+from provers_benchmark.resume import with_keys
+from provers_benchmark.scheduler import Job
+from provers_benchmark.store import ResultsDatabase
+from provers_benchmark.statistics.stats import Statistics, TestRunStatistics as RunStatistics, MinimalSATStatistics, \
+    OutputStatistics, SATStatus, ExecutionStatistics
+from provers_benchmark.utils import file_digest
+
+
+def test_import_stores_digest_of_input_that_was_run(tmp_path):
+    path = tmp_path / 'a.p'
+    path.write_text('fof(a, axiom, p).\n')
+    test_input = TestInput(patterns=[str(path)], format='tptp', name='in')
+    test_suite = TestSuite(name='suite', command='true', required_format='tptp', input_mode=InputMode.ARGUMENT)
+    job, = with_keys([Job(index=0, test_input=test_input, test_suite=test_suite, file=str(path))], timeout=10)
+    assert job.input_digest == file_digest(str(path))
+
+    stream = ResultStream(str(tmp_path / 'results'), with_csv=False)
+    stream.write_header(Statistics())
+    stream.write(job.index, RunStatistics(name='suite', program_name='true', program_version='', command='true',
+                                          minimal_input_statistics=MinimalSATStatistics(name='in', path=str(path),
+                                                                                        format='tptp'),
+                                          execution_statistics=ExecutionStatistics(execution_time=1, peak_memory=1000),
+                                          output=OutputStatistics(status=SATStatus.UNSATISFIABLE)),
+                 key=job.key, input_digest=job.input_digest)
+    stream.close()
+    assert [item[3] for item in read_stream(stream.path) if not isinstance(item, Statistics)] == [job.input_digest]
+
+    # input changes after the run, database must keep the digest of what was run
+    path.write_text('fof(b, axiom, q).\n')
+    database = ResultsDatabase(str(tmp_path / 'results.db'))
+    try:
+        assert database.import_file(stream.path) == 1
+        assert len(database.query(digest=job.input_digest)) == 1
+        assert database.query(digest=file_digest(str(path))) == []
+    finally:
+        database.close()
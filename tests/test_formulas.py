@@ -0,0 +1,98 @@
+import pytest
+
+from provers_benchmark.features.counter import FeatureCounter
+from provers_benchmark.features.formulas import FormulaParser, TPTP, tokenize, tptp_features, ladr_features
+
+
+def lines(text: str):
+    return text.strip().splitlines(keepends=True)
+
+
+def test_formula_parser_parenthesized_literal():
+    counter = FeatureCounter()
+    FormulaParser(tokenize(['~ (p(X)) | q(X, a)']), TPTP, counter).formula()
+    assert (counter.formulas, counter.clauses, counter.literals, counter.negative_literals) == (1, 1, 2, 1)
+    assert counter.predicates == {('p', 1): 1, ('q', 2): 1}
+    assert counter.functions == {('a', 0)}
+    assert (counter.variables, counter.variable_occurrences) == (1, 2)
+
+
+def test_tptp_features():
+    features = tptp_features(lines("""
+% comment with cnf(x, axiom, p).
+include('Axioms/SET001-0.ax').
+/* block comment
+   cnf(x, axiom, p). */
+cnf(c1, axiom, p(X) | ~ q(X, f(a))).
+cnf(c2, negated_conjecture, /* inline */ ~ p(b)).
+fof(f1, axiom, ! [X, Y] : (r(X) => X = g(Y)), inference(x, [], [])).
+"""))
+    assert features == {
+        'formulas': 3, 'clauses': 2, 'unit_clauses': 1, 'horn_clauses': 2, 'literals': 3, 'positive_literals': 1,
+        'negative_literals': 2, 'max_clause_length': 2, 'atoms': 5, 'equality_atoms': 1, 'variables': 3,
+        'variable_occurrences': 5, 'max_term_depth': 2, 'quantifiers': 1, 'includes': 1, 'unparsed_formulas': 0,
+        'predicate_symbols': 3, 'function_symbols': 2, 'constant_symbols': 2,
+        'literals_per_clause': pytest.approx(1.5), 'clause_variable_ratio': pytest.approx(2 / 3),
+        'horn_ratio': pytest.approx(1.0), 'equality_ratio': pytest.approx(1 / 5),
+    }
+
+
+def test_tptp_typed_variables_and_unsupported_formulas():
+    features = tptp_features(lines("""
+tff(t1, type, a: $i).
+thf(h1, axiom, p).
+fof(f2, conjecture, ? [X: $i, Y : $i] : p(X, Y)).
+"""))
+    assert {name: features[name] for name in ('formulas', 'clauses', 'atoms', 'quantifiers', 'variables',
+                                              'variable_occurrences', 'predicate_symbols', 'function_symbols',
+                                              'constant_symbols', 'unparsed_formulas')} == {
+        'formulas': 1, 'clauses': 0, 'atoms': 1, 'quantifiers': 1, 'variables': 2, 'variable_occurrences': 2,
+        'predicate_symbols': 1, 'function_symbols': 0, 'constant_symbols': 0, 'unparsed_formulas': 2,
+    }
+
+
+def test_ladr_features():
+    features = ladr_features(lines("""
+set(auto).
+assign(max_seconds, 10).
+formulas(sos).
+(x * y) * z = x * (y * z).
+x' * x = e # label(inverse).
+-(p(x) & q) | r(f(x)).
+all x (p(x) -> exists y q2(x, y)).
+end_of_list.
+formulas(goals).
+(a * b)' = inv(b) * inv(a).
+end_of_list.
+"""))
+    assert features == {
+        'formulas': 5, 'clauses': 3, 'unit_clauses': 3, 'horn_clauses': 3, 'literals': 3, 'positive_literals': 3,
+        'negative_literals': 0, 'max_clause_length': 1, 'atoms': 8, 'equality_atoms': 3, 'variables': 7,
+        'variable_occurrences': 13, 'max_term_depth': 3, 'quantifiers': 2, 'includes': 0, 'unparsed_formulas': 0,
+        # parenthesized terms (x * y) and (a * b) are not predicates
+        'predicate_symbols': 4, 'function_symbols': 4, 'constant_symbols': 3,
+        'literals_per_clause': pytest.approx(1.0), 'clause_variable_ratio': pytest.approx(3 / 7),
+        'horn_ratio': pytest.approx(1.0), 'equality_ratio': pytest.approx(3 / 8),
+    }
+
+
+def test_ladr_unparsed_formula_is_skipped():
+    features = ladr_features(lines("""
+formulas(sos).
+p(x,.
+q(a).
+end_of_list.
+"""))
+    assert features['unparsed_formulas'] == 1
+    assert features['clauses'] == 1
+    assert features['constant_symbols'] == 1
+
+
+def test_tptp_unparsed_formula_is_skipped():
+    features = tptp_features(lines("""
+fof(bad, axiom, p(X,.
+cnf(c1, axiom, q(a)).
+"""))
+    assert features['unparsed_formulas'] == 1
+    assert features['clauses'] == 1
+    assert features['constant_symbols'] == 1
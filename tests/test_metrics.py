@@ -0,0 +1,83 @@
+import numpy
+import pytest
+
+from provers_benchmark.analysis.matrix import build_matrix
+from provers_benchmark.analysis.metrics import par_k, virtual_best, speedups, cactus, solved_counts, penalized_times
+from provers_benchmark.errors import BenchmarkException
+
+TIMEOUT = 10
+
+# suite, instance, status, time; A ran on p0 twice (the later run counts), B did not run on p3
+RUNS = [
+    ('A', 'p0.p', 'satisfiable', 5.0),
+    ('A', 'p1.p', 'unsatisfiable', 2.0),
+    ('A', 'p2.p', 'timeout', 10.0),
+    ('A', 'p3.p', 'satisfiable', 4.0),
+    ('B', 'p0.p', 'satisfiable', 2.0),
+    ('B', 'p1.p', 'timeout', 10.0),
+    ('B', 'p2.p', 'unsatisfiable', 3.0),
+    ('A', 'p0.p', 'satisfiable', 1.0),
+]
+
+
+@pytest.fixture
+def matrix():
+    suites, paths, statuses, times = (numpy.array(column) for column in zip(*RUNS))
+    return build_matrix({
+        'name': suites,
+        'minimal_input_statistics.name': numpy.full(len(RUNS), 'in'),
+        'minimal_input_statistics.path': paths,
+        'execution_statistics.execution_time': times.astype(float),
+        'execution_statistics.peak_memory': numpy.full(len(RUNS), 1024.0),
+        'output.status': statuses,
+    })
+
+
+def test_build_matrix(matrix):
+    assert list(matrix.suites) == ['A', 'B']
+    assert list(matrix.instances) == ['p0.p', 'p1.p', 'p2.p', 'p3.p']
+    assert matrix.time[0, 0] == 1.0
+    assert matrix.status[1, 3] == ''
+    assert numpy.isnan(matrix.time[1, 3])
+    assert matrix.solved.tolist() == [[True, True, False, True], [True, False, True, False]]
+
+
+def test_par_k(matrix):
+    # timed out and missing instances count as k * timeout
+    assert penalized_times(matrix, TIMEOUT)[1].tolist() == [2.0, 20.0, 3.0, 20.0]
+    assert par_k(matrix, TIMEOUT).tolist() == [(1 + 2 + 20 + 4) / 4, (2 + 20 + 3 + 20) / 4]
+    assert par_k(matrix, TIMEOUT, k=10).tolist() == [(1 + 2 + 100 + 4) / 4, (2 + 100 + 3 + 100) / 4]
+    assert solved_counts(matrix).tolist() == [3, 2]
+
+
+def test_virtual_best(matrix):
+    best = virtual_best(matrix)
+    assert best.time.tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert best.suite.tolist() == [0, 0, 1, 0]
+    assert best.fastest.tolist() == [3, 1]
+    # p1 and p3 only by A (B did not run on p3), p2 only by B
+    assert best.unique.tolist() == [2, 1]
+    assert best.solved == 4
+    assert best.par_k(TIMEOUT) == 2.5
+
+
+def test_virtual_best_unsolved_instance(matrix):
+    unsolved = matrix.select(numpy.array([1]))
+    unsolved.status[0, 0] = 'timeout'
+    best = virtual_best(unsolved)
+    assert best.suite.tolist() == [-1]
+    assert numpy.isnan(best.time[0])
+    assert best.par_k(TIMEOUT) == 20.0
+
+
+def test_speedups(matrix):
+    # only p0 is solved by both: A 1s, B 2s
+    values, counts = speedups(matrix, 'A')
+    assert values.tolist() == [1.0, 0.5]
+    assert counts.tolist() == [3, 1]
+    with pytest.raises(BenchmarkException):
+        speedups(matrix, 'C')
+
+
+def test_cactus(matrix):
+    assert [times.tolist() for times in cactus(matrix)] == [[1.0, 2.0, 4.0], [2.0, 3.0]]
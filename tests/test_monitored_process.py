@@ -0,0 +1,27 @@
+import time
+
+import psutil
+
+from provers_benchmark.statistics.monitored_process import MonitoredProcess
+
+
+def test_survivors_are_found_among_sampled_descendants(monkeypatch):
+    with MonitoredProcess('sleep 30 & sleep 30 & sleep 0.5', shell=True, start_new_session=True) as proc:
+        time.sleep(0.2)
+        proc.sample()
+        assert proc.wait_for_exit(timeout=10)
+
+        def no_scan():
+            raise AssertionError('all processes were scanned')
+
+        monkeypatch.setattr(psutil, 'pids', no_scan)
+        assert len(proc.survivors()) == 2
+        assert proc.kill_survivors() == 2
+        assert proc.survivors() == []
+
+
+def test_survivors_started_between_samples():
+    with MonitoredProcess('sleep 30 & sleep 30 & exit 0', shell=True, start_new_session=True) as proc:
+        assert proc.wait_for_exit(timeout=10)
+        assert proc.kill_survivors() == 2
+        assert proc.survivors() == []
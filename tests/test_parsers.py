@@ -0,0 +1,54 @@
+import pytest
+
+from provers_benchmark.parsers.output_parsers.inkresat_parser import InkresatParser
+from provers_benchmark.parsers.output_parsers.prover9_parser import Prover9Parser
+from provers_benchmark.parsers.output_parsers.spass_parser import SpassParser
+from provers_benchmark.statistics.stats import SATStatus
+
+
+@pytest.mark.parametrize('line, verdict', [
+    ('THEOREM PROVED\n', SATStatus.SATISFIABLE),
+    ('------ process 1234 exit (max_proofs) ------\n', SATStatus.SATISFIABLE),
+    # search ended without an answer, parse_output decides from exit code
+    ('------ process 1234 exit (sos_empty) ------\n', None),
+    ('------ process 1234 exit (max_megs) ------\n', None),
+    ('------ process 1234 exit (max_given) ------\n', None),
+    ('------ process 1234 exit (max_kept) ------\n', None),
+    ('------ process 1234 exit (max_seconds) ------\n', None),
+    ('------ process 1234 exit (fatal) ------\n', None),
+    ('SEARCH FAILED\n', None),
+    ('given #12 (I,wt=3): p(x).\n', None),
+])
+def test_prover9_parse_line(line, verdict):
+    assert Prover9Parser.parse_line(line) == verdict
+
+
+@pytest.mark.parametrize('returncode, status', [
+    (0, SATStatus.SATISFIABLE),
+    (1, SATStatus.ERROR),
+    (2, SATStatus.UNSATISFIABLE),
+    (4, SATStatus.TIMEOUT),
+])
+def test_prover9_parse_output(returncode, status):
+    assert Prover9Parser.parse_output(returncode, '', '') == status
+
+
+@pytest.mark.parametrize('line, verdict', [
+    ('SPASS beiseite: Proof found.\n', SATStatus.SATISFIABLE),
+    ('SPASS beiseite: Completion found.\n', SATStatus.UNSATISFIABLE),
+    ('SPASS beiseite: Ran out of time.\n', None),
+    ('Problem: test.dfg\n', None),
+])
+def test_spass_parse_line(line, verdict):
+    assert SpassParser.parse_line(line) == verdict
+
+
+@pytest.mark.parametrize('line, verdict', [
+    ('SATISFIABLE\n', SATStatus.SATISFIABLE),
+    ('UNSATISFIABLE\n', SATStatus.UNSATISFIABLE),
+    ('  UNSATISFIABLE  \n', SATStatus.UNSATISFIABLE),
+    ('time: 9.79900360107e-05\n', None),
+    ('NOT SATISFIABLE\n', None),
+])
+def test_inkresat_parse_line(line, verdict):
+    assert InkresatParser.parse_line(line) == verdict
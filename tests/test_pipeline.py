@@ -0,0 +1,60 @@
+import pytest
+
+from provers_benchmark.cache import TranslationCache
+from provers_benchmark.config import BenchmarkConfig, GeneralConfig, TestInput, TestSuite, Translator, Portfolio, \
+    InputMode, OutputMode
+from provers_benchmark.pipeline import TranslationPipeline
+from provers_benchmark.scheduler import Job, Scheduler, iter_jobs, member_jobs
+
+
+@pytest.fixture
+def config(tmp_path):
+    for name in ('a.p', 'b.p', 'c.p'):
+        (tmp_path / name).write_text(f'fof({name[0]}, axiom, p).\n')
+    return BenchmarkConfig(
+        general=GeneralConfig(result_path=str(tmp_path / 'results')),
+        test_inputs=[TestInput(patterns=[str(tmp_path / '*.p')], format='tptp', name='in')],
+        test_suites=[TestSuite(name='ladr', command='true', required_format='ladr', input_mode=InputMode.STDIN),
+                     TestSuite(name='ladr2', command='true', required_format='ladr', input_mode=InputMode.STDIN,
+                               standalone=False),
+                     TestSuite(name='tptp', command='true', required_format='tptp', input_mode=InputMode.STDIN)],
+        translators=[Translator(from_format='tptp', to_format='ladr', command='cat', input_mode=InputMode.STDIN,
+                                output_mode=OutputMode.STDOUT)],
+        portfolios=[Portfolio(name='race', test_suites=['ladr', 'ladr2'])])
+
+
+@pytest.fixture
+def pipeline(config, tmp_path):
+    cache = TranslationCache(str(tmp_path / 'cache'))
+    pipeline = TranslationPipeline(config, cache, queue_depth=2)
+    yield pipeline
+    pipeline.close()
+    cache.close()
+
+
+def test_consumed_translations_are_forgotten(config, pipeline):
+    for job in pipeline.prefetch(iter_jobs(config)):
+        for member_job in member_jobs(job):
+            assert pipeline.translated_input(member_job).endswith('.p') == (member_job.test_suite.name == 'tptp')
+        pipeline.release(job)
+        assert pipeline.pending <= 3
+    assert pipeline.pending == 0
+
+
+def test_job_that_raised_leaves_nothing_pending(config, pipeline):
+    finished = []
+
+    def runner(job: Job, cores):
+        try:
+            # portfolio fails before its members ask for their inputs
+            if job.test_suite.name == 'race':
+                raise RuntimeError('member failed')
+            for member_job in member_jobs(job):
+                pipeline.translated_input(member_job)
+        finally:
+            pipeline.release(job)
+
+    Scheduler(workers=2, cores_per_job=0).run(pipeline.prefetch(iter_jobs(config)), runner=runner,
+                                              on_result=lambda job, test_run: finished.append(job))
+    assert len(finished) == 9
+    assert pipeline.pending == 0
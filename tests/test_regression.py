@@ -0,0 +1,152 @@
+import itertools
+import math
+import subprocess
+import sys
+
+import numpy
+import pytest
+
+from provers_benchmark.analysis.compare import REGRESSION_EXIT_CODE
+from provers_benchmark.analysis.regression import sign_test, wilcoxon_signed_rank, EXACT_WILCOXON_LIMIT
+from provers_benchmark.results import ResultStream
+from provers_benchmark.statistics.stats import Statistics, TestRunStatistics as RunStatistics, ExecutionStatistics, \
+    OutputStatistics, MinimalSATStatistics, SATStatus
+
+
+def differences(n: int, negative_ranks) -> numpy.ndarray:
+    """Differences 1..n (distinct ranks), the ones with given ranks negative"""
+    values = numpy.arange(1, n + 1, dtype=float)
+    values[[rank - 1 for rank in negative_ranks]] *= -1
+    return values
+
+
+def brute_force_p_value(values) -> float:
+    """Two-sided p-value by enumerating all sign assignments of average ranks"""
+    values = [value for value in values if value != 0]
+    absolute = sorted(abs(value) for value in values)
+    ranks = {value: numpy.mean([i + 1 for i, other in enumerate(absolute) if other == value]) for value in absolute}
+    statistic = sum(ranks[abs(value)] for value in values if value > 0)
+    sums = [sum(ranks[abs(value)] for value, positive in zip(values, signs) if positive)
+            for signs in itertools.product((False, True), repeat=len(values))]
+    lower = sum(s <= statistic for s in sums) / len(sums)
+    upper = sum(s >= statistic for s in sums) / len(sums)
+    return min(1.0, 2 * min(lower, upper))
+
+
+@pytest.mark.parametrize('n', [5, 6])
+def test_wilcoxon_all_positive(n):
+    # the most extreme statistic has probability 1 / 2^n in each tail
+    assert wilcoxon_signed_rank(differences(n, [])) == pytest.approx(2 / 2 ** n)
+
+
+@pytest.mark.parametrize('n, critical', [(6, 0), (7, 2), (8, 3), (9, 5), (10, 8), (20, 52)])
+def test_wilcoxon_critical_values(n, critical):
+    """Published critical values of T (smaller rank sum) for two-sided alpha = 0.05"""
+    ranks = list(range(1, n + 1))
+
+    def negative_ranks(total):
+        # the largest ranks summing up to total
+        chosen = []
+        for rank in reversed(ranks):
+            if rank <= total - sum(chosen):
+                chosen.append(rank)
+        assert sum(chosen) == total
+        return chosen
+
+    if critical:
+        assert wilcoxon_signed_rank(differences(n, negative_ranks(critical))) <= 0.05
+    assert wilcoxon_signed_rank(differences(n, negative_ranks(critical + 1))) > 0.05
+
+
+def test_wilcoxon_exact_p_value():
+    # n = 8, T = 3: 5 of 256 sign assignments have rank sum <= 3
+    assert wilcoxon_signed_rank(differences(8, [1, 2])) == pytest.approx(10 / 256)
+
+
+def test_wilcoxon_ties_get_average_ranks():
+    # ranks 2, 2, 2, 4, positive sum 8: 4 of 16 assignments reach it
+    assert wilcoxon_signed_rank(numpy.array([1.0, 1.0, -1.0, 2.0])) == pytest.approx(0.5)
+    values = [0.5, -0.5, 1.5, 1.5, 1.5, 3.0, -3.0, 4.0, 5.0]
+    assert wilcoxon_signed_rank(numpy.array(values)) == pytest.approx(brute_force_p_value(values))
+
+
+def test_wilcoxon_zero_differences_are_dropped():
+    assert wilcoxon_signed_rank(numpy.array([0.0, 0.0, 1.0, 2.0, 3.0, 4.0, 5.0])) == pytest.approx(2 / 32)
+    assert wilcoxon_signed_rank(numpy.zeros(5)) == 1.0
+    assert wilcoxon_signed_rank(numpy.zeros(0)) == 1.0
+
+
+def test_wilcoxon_normal_approximation():
+    n = EXACT_WILCOXON_LIMIT + 10
+    negative = list(range(1, n + 1, 3))
+    statistic = n * (n + 1) / 2 - sum(negative)
+    mean, variance = n * (n + 1) / 4, n * (n + 1) * (2 * n + 1) / 24
+    z = (abs(statistic - mean) - 0.5) / math.sqrt(variance)
+    assert wilcoxon_signed_rank(differences(n, negative)) == pytest.approx(math.erfc(z / math.sqrt(2)))
+
+
+def test_wilcoxon_normal_approximation_with_ties():
+    values = numpy.array([1.0] * 30 + [-1.0] * 10 + [2.0] * 15 + [-2.0] * 5)
+    n, ties = len(values), numpy.array([40, 20])
+    # ranks: 1..40 -> 20.5, 41..60 -> 50.5
+    statistic = 30 * 20.5 + 15 * 50.5
+    mean = n * (n + 1) / 4
+    variance = n * (n + 1) * (2 * n + 1) / 24 - (ties ** 3 - ties).sum() / 48
+    z = (abs(statistic - mean) - 0.5) / math.sqrt(variance)
+    assert wilcoxon_signed_rank(values) == pytest.approx(math.erfc(z / math.sqrt(2)))
+
+
+@pytest.mark.parametrize('positive, negative, p_value', [
+    (0, 0, 1.0),
+    (0, 5, 2 / 32),
+    (5, 0, 2 / 32),
+    (1, 9, 2 * 11 / 1024),
+    (3, 3, 1.0),
+])
+def test_sign_test(positive, negative, p_value):
+    assert sign_test(positive, negative) == pytest.approx(p_value)
+
+
+def write_results(path: str, suite: str, times, statuses):
+    stream = ResultStream(path, with_csv=False)
+    stream.write_header(Statistics())
+    for i, (time, status) in enumerate(zip(times, statuses)):
+        test_run = RunStatistics(name=suite, program_name=suite, program_version='', command=suite,
+                                 execution_statistics=ExecutionStatistics(execution_time=time, peak_memory=1000),
+                                 minimal_input_statistics=MinimalSATStatistics(name='in', path=f'p{i}.p',
+                                                                               format='tptp'),
+                                 output=OutputStatistics(status=status))
+        stream.write(i, test_run, key=f'{suite}-{i}')
+    stream.close()
+    return stream.path
+
+
+def compare(baseline: str, candidate: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, '-m', 'provers_benchmark.analysis.compare', baseline, '-c', candidate],
+                          capture_output=True, text=True)
+
+
+def test_regression_gate(tmp_path):
+    times = [1.0 + i / 10 for i in range(12)]
+    solved = [SATStatus.UNSATISFIABLE] * 12
+    baseline = write_results(str(tmp_path / 'baseline'), 'prover', times, solved)
+
+    same = write_results(str(tmp_path / 'same'), 'prover', times, solved)
+    result = compare(baseline, same)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    slower = write_results(str(tmp_path / 'slower'), 'prover', [time * 1.5 for time in times], solved)
+    result = compare(baseline, slower)
+    assert result.returncode == REGRESSION_EXIT_CODE
+    assert 'execution_time x1.500' in result.stdout
+
+    conflicting = write_results(str(tmp_path / 'conflicting'), 'prover', times,
+                                [SATStatus.SATISFIABLE] + solved[1:])
+    result = compare(baseline, conflicting)
+    assert result.returncode == REGRESSION_EXIT_CODE
+    assert '1 conflicting answer(s)' in result.stdout
+
+    lost = write_results(str(tmp_path / 'lost'), 'prover', times, [SATStatus.TIMEOUT] * 8 + solved[8:])
+    result = compare(baseline, lost)
+    assert result.returncode == REGRESSION_EXIT_CODE
+    assert '8 instance(s) no longer solved' in result.stdout
@@ -0,0 +1,51 @@
+import json
+
+from provers_benchmark.config import TestInput, TestSuite, InputMode
+from provers_benchmark.results import ResultStream, regenerate_results
+from provers_benchmark.resume import with_keys, completed_job_keys
+from provers_benchmark.scheduler import Job
+from provers_benchmark.statistics.stats import Statistics, TestRunStatistics as RunStatistics, MinimalSATStatistics
+
+
+def jobs_of_identical_files(tmp_path):
+    paths = []
+    for name in ('a.p', 'b.p'):
+        path = tmp_path / name
+        path.write_text('fof(a, axiom, p).\n')
+        paths.append(str(path))
+    test_input = TestInput(patterns=[str(tmp_path / '*.p')], format='tptp', name='in')
+    test_suite = TestSuite(name='suite', command='true', required_format='tptp', input_mode=InputMode.ARGUMENT)
+    jobs = [Job(index=i, test_input=test_input, test_suite=test_suite, file=path) for i, path in enumerate(paths)]
+    return list(with_keys(jobs, timeout=10))
+
+
+def finished_run(job: Job) -> RunStatistics:
+    return RunStatistics(name=job.test_suite.name, program_name='true', program_version='', command='true',
+                         minimal_input_statistics=MinimalSATStatistics(name=job.test_input.name, path=job.file,
+                                                                       format='tptp'))
+
+
+def test_identical_inputs_get_different_keys(tmp_path):
+    first, second = jobs_of_identical_files(tmp_path)
+    assert first.key != second.key
+
+
+def test_identical_inputs_survive_regenerate_and_resume(tmp_path):
+    jobs = jobs_of_identical_files(tmp_path)
+    result_path = str(tmp_path / 'results')
+    stream = ResultStream(result_path, with_csv=False)
+    stream.write_header(Statistics())
+    stream.write(jobs[0].index, finished_run(jobs[0]), key=jobs[0].key)
+    stream.close()
+
+    completed = completed_job_keys(stream.path)
+    assert [job for job in jobs if job.key not in completed] == [jobs[1]]
+
+    stream = ResultStream(result_path, with_csv=False, append=True)
+    stream.write(jobs[1].index, finished_run(jobs[1]), key=jobs[1].key)
+    stream.close()
+    regenerate_results(stream.path, result_path, each_input_to_separate_file=False, as_json=True, as_csv=False,
+                       job_indexes={job.key: job.index for job in jobs})
+    with open(result_path + '.json') as results:
+        test_runs = json.load(results)['test_runs']
+    assert [run['minimal_input_statistics']['path'] for run in test_runs] == [job.file for job in jobs]